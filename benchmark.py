@@ -0,0 +1,406 @@
+# benchmark.py
+"""بنچمارک آفلاین خط لوله دانلود با سرور محلی شبیه TSETMC و TGJU
+
+مثال:
+    python benchmark.py --sizes 10 100 1000 --latency-ms 20 --error-rate 0.01 --history 500
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import INDUSTRY_MAP
+
+# حروف برای ساخت نماد و نام شرکت مصنوعی
+PERSIAN_LETTERS = "ابپتثجچحخدذرزسشصضطظعغفقکگلمنوهی"
+MARKET_CODES = ['300', '303', '309', '313', '400', '403', '404']
+
+# تاریخ پایان ثابت تا داده‌ها در هر اجرا یکسان باشند
+HISTORY_END = datetime(2025, 1, 1)
+
+
+class SyntheticMarket:
+    """تولید قطعی (با seed) نمادها و پاسخ endpointها"""
+
+    def __init__(self, num_symbols: int, history_days: int = 500, seed: int = 1):
+        self.history_days = history_days
+        self.seed = seed
+        rng = random.Random(seed)
+        industries = list(INDUSTRY_MAP.keys())
+
+        self.instruments = []
+        for i in range(num_symbols):
+            symbol = ''.join(rng.choice(PERSIAN_LETTERS) for _ in range(rng.randint(3, 5)))
+            self.instruments.append({
+                'inscode': str(10 ** 16 + i * 7919),
+                'isin': f"IRO1{i:06d}0001",
+                'symbol': f"{symbol}{PERSIAN_LETTERS[i % len(PERSIAN_LETTERS)]}",
+                'company': ' '.join(''.join(rng.choice(PERSIAN_LETTERS) for _ in range(rng.randint(3, 7)))
+                                    for _ in range(rng.randint(2, 4))),
+                'industry': rng.choice(industries),
+                'market': rng.choice(MARKET_CODES),
+                'price': rng.randint(1000, 50000)
+            })
+
+        # روزهای معاملاتی (بدون پنجشنبه و جمعه) از قدیم به جدید
+        days = []
+        day = HISTORY_END
+        while len(days) < history_days:
+            if day.weekday() not in (3, 4):
+                days.append(day)
+            day -= timedelta(days=1)
+        self.trading_days = list(reversed(days))
+
+    def _rng(self, inscode: str, salt: str) -> random.Random:
+        return random.Random(f"{self.seed}:{inscode}:{salt}")
+
+    def market_watch(self) -> str:
+        """پاسخ MarketWatchPlus: بخش‌های جدا شده با @ (کلی، نمادها، بهترین مظنه‌ها، refid)"""
+        rows = []
+        limits = []
+        for inst in self.instruments:
+            price = inst['price']
+            fields = [''] * 26
+            fields[0] = inst['inscode']
+            fields[1] = inst['isin']
+            fields[2] = inst['symbol']
+            fields[3] = inst['company']
+            fields[4] = "122959"
+            fields[5] = fields[6] = fields[7] = fields[13] = str(price)
+            fields[8] = "120"
+            fields[9] = "1000000"
+            fields[10] = str(price * 1000000)
+            fields[11] = str(int(price * 0.97))
+            fields[12] = str(int(price * 1.03))
+            fields[17] = "1"
+            fields[18] = inst['industry']
+            fields[19] = str(int(price * 1.05))
+            fields[20] = str(int(price * 0.95))
+            fields[21] = "1000000000"
+            fields[22] = inst['market']
+            rows.append(','.join(fields))
+            limits.append(f"{inst['inscode']},1,3,5,{price - 10},{price + 10},5000,4000")
+
+        overview = "0,0,0,0,0,0,0,0,0,0"
+        return '@'.join(["", overview, ';'.join(rows), ';'.join(limits), "1000"])
+
+    def client_history(self, inscode: str) -> Dict:
+        """پاسخ GetClientTypeHistory (از قدیم به جدید، هم‌تراز با داده قیمت)"""
+        volume_rng = self._rng(inscode, 'volume')
+        rng = self._rng(inscode, 'client')
+        items = []
+        for day in self.trading_days:
+            volume = volume_rng.randint(10000, 5000000)
+            sell_i = int(volume * rng.uniform(0.3, 0.9))
+            buy_i = int(volume * rng.uniform(0.3, 0.9))
+            items.append({
+                'recDate': int(day.strftime('%Y%m%d')),
+                'insCode': inscode,
+                'buy_I_Volume': buy_i, 'buy_N_Volume': volume - buy_i,
+                'buy_I_Value': buy_i * 1000, 'buy_N_Value': (volume - buy_i) * 1000,
+                'buy_I_Count': rng.randint(10, 500), 'buy_N_Count': rng.randint(0, 10),
+                'sell_I_Volume': sell_i, 'sell_N_Volume': volume - sell_i,
+                'sell_I_Value': sell_i * 1000, 'sell_N_Value': (volume - sell_i) * 1000,
+                'sell_I_Count': rng.randint(10, 500), 'sell_N_Count': rng.randint(0, 10)
+            })
+        return {'clientType': items}
+
+    def price_history(self, inscode: str) -> Dict:
+        """پاسخ GetChartData (از جدید به قدیم)"""
+        volume_rng = self._rng(inscode, 'volume')
+        price_rng = self._rng(inscode, 'price')
+        price = 10000
+        records = []
+        for day in self.trading_days:
+            # همان دنباله حجم client_history تا دو endpoint قابل تطبیق باشند
+            volume = volume_rng.randint(10000, 5000000)
+            yesterday = price
+            price = max(100, int(price * price_rng.uniform(0.95, 1.05)))
+            records.append({
+                'dEven': int((day - datetime(1970, 1, 1)).total_seconds()),
+                'pDrCotVal': price, 'pClosing': price,
+                'priceFirst': yesterday, 'priceYesterday': yesterday,
+                'priceMin': min(price, yesterday), 'priceMax': max(price, yesterday),
+                'priceChange': price - yesterday,
+                'qTotTran5J': volume
+            })
+        records.reverse()
+        return {'closingPriceChartData': records}
+
+    def share_changes(self, inscode: str) -> Dict:
+        """پاسخ GetInstrumentShareChange (0 تا 3 افزایش سرمایه)"""
+        rng = self._rng(inscode, 'shares')
+        changes = []
+        shares = 1000000000
+        for _ in range(rng.randint(0, 3)):
+            day = rng.choice(self.trading_days)
+            new_shares = int(shares * rng.choice([1.2, 1.5, 2.0]))
+            changes.append({
+                'dEven': int(day.strftime('%Y%m%d')),
+                'numberOfShareOld': shares,
+                'numberOfShareNew': new_shares
+            })
+            shares = new_shares
+        return {'instrumentShareChange': changes}
+
+    def tgju_history(self, symbol: str) -> Dict:
+        """پاسخ history سایت TGJU برای دلار یا انس طلا"""
+        rng = random.Random(f"{self.seed}:{symbol}")
+        value = 500000 if 'dollar' in symbol else 2000
+        result = {'s': 'ok', 't': [], 'o': [], 'h': [], 'l': [], 'c': [], 'v': []}
+        for day in self.trading_days:
+            opened = value
+            value = value * rng.uniform(0.98, 1.02)
+            result['t'].append(int(day.timestamp()))
+            result['o'].append(opened)
+            result['h'].append(max(opened, value))
+            result['l'].append(min(opened, value))
+            result['c'].append(value)
+            result['v'].append(0)
+        return result
+
+
+class StandInServer:
+    """سرور HTTP محلی با تأخیر و خطای قابل تنظیم به جای TSETMC و TGJU"""
+
+    ROUTES = [
+        (re.compile(r'^/tsev2/data/MarketWatchPlus\.aspx$'), 'market_watch'),
+        (re.compile(r'^/api/ClientType/GetClientTypeHistory/(\d+)$'), 'client'),
+        (re.compile(r'^/api/ClosingPrice/GetChartData/(\d+)/D$'), 'price'),
+        (re.compile(r'^/api/Instrument/GetInstrumentShareChange/(\d+)$'), 'adjustment'),
+        (re.compile(r'^/v1/tv2/history$'), 'tgju')
+    ]
+
+    def __init__(self, market: SyntheticMarket, latency_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 1):
+        self.market = market
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.request_counts: Dict[str, int] = {}
+        self.httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def settings(self) -> Dict[str, str]:
+        """آدرس‌های تنظیمات برنامه که به این سرور اشاره می‌کنند"""
+        base = self.base_url
+        return {
+            "data_url": f"{base}/tsev2/data/MarketWatchPlus.aspx?h=0&r=0",
+            "client_url": f"{base}/api/ClientType/GetClientTypeHistory/{{inscode}}",
+            "price_url": f"{base}/api/ClosingPrice/GetChartData/{{inscode}}/D",
+            "adjustment_url": f"{base}/api/Instrument/GetInstrumentShareChange/{{inscode}}",
+            "dollar_url": f"{base}/v1/tv2/history?symbol=price_dollar_rl&resolution=1D",
+            "gold_url": f"{base}/v1/tv2/history?symbol=ons&resolution=1D"
+        }
+
+    # خطاها فقط روی endpointهای هر نماد (که دانلودر برایشان تلاش مجدد دارد) تزریق می‌شوند
+    FAILING_ROUTES = ('client', 'price', 'adjustment')
+
+    def _count_and_check_failure(self, name: str) -> bool:
+        with self._lock:
+            self.request_counts[name] = self.request_counts.get(name, 0) + 1
+            if self.error_rate <= 0 or name not in self.FAILING_ROUTES:
+                return False
+            return self._rng.random() < self.error_rate
+
+    def respond(self, path: str, query: Dict[str, List[str]]):
+        """(کد وضعیت، نوع محتوا، بدنه) برای یک مسیر"""
+        for pattern, name in self.ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+
+            if self._count_and_check_failure(name):
+                return 500, 'text/plain', b'stand-in error'
+
+            if name == 'market_watch':
+                return 200, 'text/plain; charset=utf-8', self.market.market_watch().encode('utf-8')
+            if name == 'client':
+                payload = self.market.client_history(match.group(1))
+            elif name == 'price':
+                payload = self.market.price_history(match.group(1))
+            elif name == 'adjustment':
+                payload = self.market.share_changes(match.group(1))
+            else:
+                payload = self.market.tgju_history(query.get('symbol', [''])[0])
+            return 200, 'application/json', json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+        return 404, 'text/plain', b'not found'
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive مثل سرور واقعی
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                parsed = urlparse(self.path)
+                status, content_type, body = server.respond(parsed.path, parse_qs(parsed.query))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_size(config, num_symbols: int, args, work_dir: str) -> Dict:
+    """اجرای کامل خط لوله برای یک اندازه بازار و بازگرداندن نتایج"""
+    from data_loader import DataLoader
+    from downloader import Downloader
+
+    market = SyntheticMarket(num_symbols, history_days=args.history, seed=args.seed)
+    result = {'symbols': num_symbols}
+
+    with StandInServer(market, latency_ms=args.latency_ms, error_rate=args.error_rate, seed=args.seed) as server:
+        config.settings.update(server.settings())
+
+        data_loader = DataLoader(config)
+        start = time.perf_counter()
+        success, message = data_loader.fetch_data()
+        data_loader.wait_for_external_data(timeout=60)
+        result['market_watch_s'] = time.perf_counter() - start
+        if not success:
+            result['error'] = message
+            return result
+
+        downloader = Downloader(config, data_loader)
+        downloader.cache_dir = os.path.join(work_dir, f"cache_{num_symbols}")
+        downloader.setup_cache()
+        if args.request_delay is not None:
+            downloader.delay_between_requests = args.request_delay
+        if args.workers:
+            downloader.max_workers = args.workers
+
+        symbols_data = [(inst['symbol'], inst['inscode']) for inst in market.instruments]
+        output_dir = os.path.join(work_dir, f"output_{num_symbols}")
+
+        if args.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+
+        frames = downloader.download_multiple_symbols(symbols_data, apply_adjustment=not args.no_adjustment)
+        for symbol, df in frames.items():
+            downloader.save_to_csv(df, symbol, output_dir)
+
+        elapsed = time.perf_counter() - start
+        if args.memory:
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+
+        stats = downloader.get_download_stats()
+        downloader.close_session()
+        data_loader.close_session()
+
+        result.update({
+            'seconds': elapsed,
+            'symbols_per_s': num_symbols / elapsed if elapsed else 0.0,
+            'successful': stats['successful'],
+            'failed': stats['failed'],
+            'requests': dict(server.request_counts),
+            'stages': stats['stages'],
+            'stage_table': downloader.format_stage_summary()
+        })
+
+    return result
+
+
+def print_results(results: List[Dict]):
+    """چاپ جدول خلاصه و زمان مراحل هر اندازه"""
+    print()
+    print(f"{'نمادها':>8}{'MarketWatch (s)':>17}{'دانلود (s)':>12}{'نماد/ثانیه':>12}"
+          f"{'حافظه اوج (MB)':>16}{'موفق':>7}{'ناموفق':>8}")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['symbols']:>8}  خطا: {r['error']}")
+            continue
+        peak = f"{r['peak_mb']:.1f}" if 'peak_mb' in r else '-'
+        print(f"{r['symbols']:>8}{r['market_watch_s']:>17.2f}{r['seconds']:>12.2f}{r['symbols_per_s']:>12.1f}"
+              f"{peak:>16}{r['successful']:>7}{r['failed']:>8}")
+
+    for r in results:
+        if 'stage_table' in r:
+            print(f"\nزمان مراحل برای {r['symbols']} نماد:")
+            print(r['stage_table'])
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="بنچمارک آفلاین دانلود داده‌های TSETMC")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help="تعداد نمادهای هر اجرا")
+    parser.add_argument('--history', type=int, default=500, help="تعداد روزهای تاریخچه هر نماد")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="تأخیر هر پاسخ سرور")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="احتمال پاسخ 500")
+    parser.add_argument('--workers', type=int, default=None, help="تعداد thread دانلود")
+    parser.add_argument('--request-delay', type=float, default=None, help="تأخیر بین نتایج (پیش‌فرض دانلودر)")
+    parser.add_argument('--no-adjustment', action='store_true', help="دانلود بدون تعدیل")
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help="بدون tracemalloc (اندازه‌گیری حافظه سرعت را کم می‌کند)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--log-level', default="WARNING")
+    parser.add_argument('--json', dest='json_path', help="ذخیره نتایج در فایل JSON")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+
+    # همه فایل‌ها (تنظیمات، لاگ، کش، خروجی) در پوشه موقت؛ تنظیمات کاربر دست نمی‌خورد
+    work_dir = tempfile.mkdtemp(prefix="tse_bench_")
+    os.chdir(work_dir)
+
+    from config import Config
+    config = Config()
+    config.set_log_level(args.log_level, save=False)
+
+    results = [run_size(config, size, args, work_dir) for size in args.sizes]
+    print_results(results)
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump([{k: v for k, v in r.items() if k != 'stage_table'} for r in results],
+                      f, ensure_ascii=False, indent=2)
+        print(f"\nنتایج در {json_path} ذخیره شد")
+
+    print(f"\nفایل‌های موقت: {work_dir}")
+
+
+if __name__ == "__main__":
+    main()
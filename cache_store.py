@@ -0,0 +1,673 @@
+# cache_store.py
+"""لایه‌های کش پاسخ‌های دانلود نمادها"""
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import zlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from config import atomic_write, checksum_path, read_checksum, verify_checksum
+
+
+class MemoryCache:
+    """کش LRU داخل حافظه با سقف حجم (بایت) جلوی کش دیسک
+
+    مقدارها باید تغییرناپذیر باشند (مثلاً بایت‌های پاسخ) چون بین رشته‌ها مشترک‌اند.
+    max_bytes=0 کش را غیرفعال می‌کند.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # کلید -> (مقدار، حجم)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, is_fresh: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """مقدار کلید و انتقال آن به انتهای LRU؛ مقدار کهنه (is_fresh=False) حذف و miss شمرده می‌شود"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and is_fresh is not None and not is_fresh(entry[0]):
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        """افزودن یا جایگزینی مقدار؛ قدیمی‌ترین مقدارها تا زیر سقف حجم حذف می‌شوند"""
+        if size > self.max_bytes:
+            # مقدار بزرگ‌تر از کل سقف فقط بقیه را بیرون می‌کرد
+            self.pop(key)
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def stats(self) -> Dict[str, Any]:
+        """آمار کش: تعداد، حجم، hit/miss و نرخ hit"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class CacheEntry(NamedTuple):
+    """یک ورودی کش دیسک: کل فایل به همراه فیلدهای سرآیند آن"""
+
+    payload: bytes  # {"timestamp": ..., "etag": ..., "last_modified": ..., "data": <بدنه پاسخ>}
+    timestamp: datetime
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """هدرهای درخواست شرطی برای تجدید این ورودی (خالی اگر سرور validator نداده باشد)"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def body(self) -> bytes:
+        """بدنه اصلی پاسخ (برای نوشتن دوباره ورودی پس از 304)"""
+        # در قالب فشرده خودمان ', "data": ' بدون escape فقط یک بار و پس از سرآیند می‌آید
+        start = self.payload.find(_DATA_MARKER)
+        if self.payload.startswith(b'{"timestamp"') and start != -1 and self.payload.endswith(b'}'):
+            return self.payload[start + len(_DATA_MARKER):-1]
+        return json.dumps(self.data(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def data(self) -> Any:
+        """داده تبدیل شده از JSON"""
+        return json.loads(self.payload).get('data')
+
+
+# سرآیند فایل کش پیش از data می‌آید؛ برای خواندن آن کل JSON تبدیل نمی‌شود
+_HEADER_FIELD_RE = re.compile(rb'"(timestamp|etag|last_modified)":\s*("(?:[^"\\]|\\.)*"|null)')
+_HEADER_SCAN_BYTES = 2048
+_DATA_MARKER = b', "data": '
+
+
+def _header_fields(head: bytes) -> Dict[str, Any]:
+    """فیلدهای سرآیند فقط از بایت‌های پیش از داده؛ کلیدهای هم‌نام داخل بدنه سرآیند را عوض نمی‌کنند"""
+    end = head.find(_DATA_MARKER, 0, _HEADER_SCAN_BYTES)
+    fields: Dict[str, Any] = {}
+    for name, value in _HEADER_FIELD_RE.findall(head, 0, end if end >= 0 else _HEADER_SCAN_BYTES):
+        fields.setdefault(name.decode('ascii'), json.loads(value))
+    return fields
+
+# کدک‌های فشرده‌سازی فایل‌های کش: نام -> (پسوند، سطح پیش‌فرض)
+CACHE_CODECS = {
+    'gzip': ('.json.gz', 5),
+    'zstd': ('.json.zst', 3)
+}
+# فایل‌های بدون فشرده‌سازی نسخه‌های قبل (با indent=2 یا سرآیند فشرده)
+LEGACY_EXTENSION = '.json'
+CACHE_EXTENSIONS = tuple(ext for ext, _ in CACHE_CODECS.values()) + (LEGACY_EXTENSION,)
+
+
+def _load_zstandard():
+    """ماژول zstandard اگر نصب باشد (وابستگی اختیاری)"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+class DiskCache:
+    """فایل‌های فشرده cache/<کلید>.json.gz (یا .json.zst) با نوشتن اتمیک و checksum
+
+    محتوای فایل پس از باز کردن: {"timestamp": ..., "etag": ..., "last_modified": ..., "data": <بدنه پاسخ>}
+    بدون فاصله و indent. فایل‌های قدیمی cache/<کلید>.json (قالب indent=2) هنگام اولین
+    خواندن به قالب جدید منتقل می‌شوند؛ فایل‌های کدک دیگر هم خوانده می‌شوند.
+    """
+
+    def __init__(self, cache_dir: str = "cache", codec: str = "gzip", level: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.logger = logging.getLogger(__name__)
+
+        if codec not in CACHE_CODECS:
+            self.logger.warning(f"کدک کش {codec} شناخته نشد؛ از gzip استفاده می‌شود")
+            codec = 'gzip'
+        if codec == 'zstd' and _load_zstandard() is None:
+            self.logger.warning("بسته zstandard نصب نیست؛ کش با gzip فشرده می‌شود")
+            codec = 'gzip'
+        self.codec = codec
+        self.level = level if level is not None else CACHE_CODECS[codec][1]
+        self.migrated = 0
+
+    @classmethod
+    def from_settings(cls, cache_dir: str = "cache", settings: Optional[dict] = None) -> "DiskCache":
+        """ساخت کش دیسک از تنظیمات (cache_codec و cache_compression_level)"""
+        settings = settings or {}
+        return cls(cache_dir, settings.get("cache_codec", "gzip"), settings.get("cache_compression_level"))
+
+    def path(self, key: str, codec: Optional[str] = None) -> str:
+        return os.path.join(self.cache_dir, f"{key}{CACHE_CODECS[codec or self.codec][0]}")
+
+    def legacy_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{LEGACY_EXTENSION}")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zstd':
+            return _load_zstandard().ZstdCompressor(level=self.level).compress(data)
+        # mtime=0 تا خروجی برای داده یکسان یکسان باشد
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    @staticmethod
+    def _decompress(data: bytes, codec: Optional[str]) -> bytes:
+        if codec is None:
+            return data
+        if codec == 'zstd':
+            zstandard = _load_zstandard()
+            if zstandard is None:
+                raise RuntimeError("برای خواندن کش .zst بسته zstandard لازم است")
+            return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        return gzip.decompress(data)
+
+    def read(self, key: str) -> Optional[CacheEntry]:
+        """ورودی یک کلید (None اگر نباشد یا checksum آن معتبر نباشد)"""
+        codecs = [self.codec] + [codec for codec in CACHE_CODECS if codec != self.codec]
+        for codec in codecs:
+            path = self.path(key, codec)
+            if os.path.exists(path):
+                entry = self._read_file(key, path, codec)
+                if entry is not None:
+                    self._touch(path)
+                return entry
+
+        legacy_path = self.legacy_path(key)
+        if os.path.exists(legacy_path):
+            entry = self._read_file(key, legacy_path, None)
+            if entry is not None:
+                self._migrate(key, entry)
+            return entry
+
+        return None
+
+    def _read_file(self, key: str, path: str, codec: Optional[str]) -> Optional[CacheEntry]:
+        try:
+            with open(path, 'rb') as f:
+                stored = f.read()
+
+            # فایل ناقص (قطع برنامه هنگام نوشتن) با checksum کنارش نمی‌خواند
+            has_checksum = read_checksum(path) is not None
+            if has_checksum and not verify_checksum(path, stored):
+                self.logger.warning(f"checksum کش {key} معتبر نیست؛ داده دوباره دریافت می‌شود")
+                self._remove_file(path)
+                return None
+
+            payload = self._decompress(stored, codec)
+            # فایل بدون checksum (نسخه‌های پیش از checksum): فقط اگر JSON کامل باشد پذیرفته می‌شود
+            if not has_checksum:
+                json.loads(payload)
+            fields = _header_fields(payload)
+            timestamp = fields.get('timestamp')
+            return CacheEntry(
+                payload=payload,
+                timestamp=datetime.fromisoformat(timestamp) if timestamp else datetime(2000, 1, 1),
+                etag=fields.get('etag'),
+                last_modified=fields.get('last_modified')
+            )
+        except Exception as e:
+            self.logger.warning(f"خطا در خواندن کش {key}: {e}")
+            return None
+
+    @staticmethod
+    def _touch(path: str):
+        """جلو بردن زمان تغییر فایل پس از استفاده (ترتیب LRU مدیر کش)"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def read_timestamp(self, path: str) -> Optional[datetime]:
+        """زمان دریافت یک فایل کش از سرآیند آن بدون باز کردن کل داده (برای آمار)"""
+        try:
+            with open(path, 'rb') as f:
+                stored = f.read()
+            if path.endswith(CACHE_CODECS['gzip'][0]):
+                head = zlib.decompressobj(wbits=31).decompress(stored, _HEADER_SCAN_BYTES)
+            elif path.endswith(CACHE_CODECS['zstd'][0]):
+                head = self._decompress(stored, 'zstd')[:_HEADER_SCAN_BYTES]
+            else:
+                head = stored[:_HEADER_SCAN_BYTES]
+            value = _header_fields(head).get('timestamp')
+            if value:
+                timestamp = datetime.fromisoformat(value)
+                # زمان‌های بدون منطقه زمانی به وقت محلی همین سیستم‌اند
+                return timestamp.astimezone().replace(tzinfo=None) if timestamp.tzinfo else timestamp
+        except Exception as e:
+            self.logger.debug("خواندن سرآیند کش %s ممکن نبود: %s", path, e)
+        return None
+
+    def _migrate(self, key: str, entry: CacheEntry):
+        """بازنویسی فایل قدیمی بدون فشرده‌سازی در قالب فشرده (زمان ذخیره حفظ می‌شود)"""
+        try:
+            compact = self.make_entry(entry.body(), entry.etag, entry.last_modified, entry.timestamp)
+            self.store(key, compact)
+            self.migrated += 1
+            self.logger.debug("کش %s به قالب %s منتقل شد", key, self.codec)
+        except Exception as e:
+            self.logger.warning(f"خطا در انتقال کش قدیمی {key}: {e}")
+
+    def migrate_legacy(self) -> int:
+        """انتقال همه فایل‌های قدیمی .json پوشه کش (تعداد فایل‌های منتقل شده)"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        before = self.migrated
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(LEGACY_EXTENSION):
+                self.read(filename[:-len(LEGACY_EXTENSION)])
+        return self.migrated - before
+
+    @staticmethod
+    def make_entry(body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                   timestamp: Optional[datetime] = None) -> CacheEntry:
+        """ساخت ورودی از بدنه خام پاسخ بدون تبدیل JSON آن"""
+        timestamp = timestamp or datetime.now()
+        header = json.dumps({
+            'timestamp': timestamp.isoformat(),
+            'etag': etag,
+            'last_modified': last_modified
+        }, ensure_ascii=False)[:-1]
+        payload = header.encode('utf-8') + _DATA_MARKER + body + b'}'
+        return CacheEntry(payload, timestamp, etag, last_modified)
+
+    def store(self, key: str, entry: CacheEntry) -> int:
+        """نوشتن اتمیک و فشرده ورودی با checksum کنار آن (نسخه‌های دیگر همین کلید حذف می‌شوند)
+
+        خروجی: حجم فایل نوشته شده (بایت)
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(key)
+        data = self._compress(entry.payload)
+        # کش قابل دریافت دوباره است: بدون fsync (checksum فایل ناقص پس از قطع برق را رد می‌کند)
+        atomic_write(path, data, checksum=True, durable=False)
+        for other in self._variant_paths(key):
+            if other != path:
+                self._remove_file(other)
+        return len(data)
+
+    def write(self, key: str, body: bytes, etag: Optional[str] = None,
+              last_modified: Optional[str] = None) -> CacheEntry:
+        entry = self.make_entry(body, etag, last_modified)
+        self.store(key, entry)
+        return entry
+
+    def _variant_paths(self, key: str):
+        return [self.path(key, codec) for codec in CACHE_CODECS] + [self.legacy_path(key)]
+
+    @staticmethod
+    def _remove_file(path: str):
+        for target in (path, checksum_path(path)):
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+
+    def remove(self, key: str):
+        for path in self._variant_paths(key):
+            self._remove_file(path)
+
+
+# بازه‌های هیستوگرام عمر داده‌های کش: (برچسب، حد بالا به ساعت)
+AGE_BUCKETS = (('<1h', 1), ('1-6h', 6), ('6-24h', 24), ('1-7d', 168), ('>7d', None))
+# نتیجه جستجوی کش: memory/disk (hit)، stale (منقضی؛ درخواست شرطی)، miss؛ revalidated زیرمجموعه stale است
+CACHE_OUTCOMES = ('memory', 'disk', 'stale', 'miss', 'revalidated')
+# شمارنده‌های تجمعی hit/miss بین اجراها (پسوند آن جزو CACHE_EXTENSIONS نیست)
+STATS_FILENAME = "cache_stats.dat"
+# فایل موقت نوشتن اتمیکی که پس از این مدت (ثانیه) هنوز مانده، از برنامه قطع شده است
+ORPHAN_TEMP_AGE = 3600
+
+
+def cache_endpoint(key: str) -> str:
+    """نقطه (endpoint) یک کلید کش: پیشوند پیش از اولین _ (client، price، adjustment، tgju)"""
+    return key.split('_', 1)[0]
+
+
+def _empty_stats_row() -> Dict[str, Any]:
+    row = {'entries': 0, 'bytes': 0, 'ages': {label: 0 for label, _ in AGE_BUCKETS}}
+    row.update(dict.fromkeys(CACHE_OUTCOMES, 0))
+    return row
+
+
+class CacheFile(NamedTuple):
+    path: str
+    key: str
+    size: int  # همراه فایل checksum
+    mtime: float  # آخرین نوشتن یا خواندن موفق
+
+
+class CacheManager:
+    """سقف حجم پوشه کش با حذف LRU و آمار به تفکیک نقطه
+
+    ترتیب LRU زمان تغییر فایل است که DiskCache.read با هر خواندن موفق جلو می‌برد.
+    فقط فایل‌های ورودی کش (CACHE_EXTENSIONS) شمرده و حذف می‌شوند؛ snapshot بازار و
+    فایل‌های دیگر پوشه دست نمی‌خورند. max_bytes=0 یعنی بدون سقف.
+    حذف از سقف تا target_ratio سقف ادامه می‌یابد تا هر نوشتن بعدی دوباره حذف راه نیندازد.
+    """
+
+    def __init__(self, disk_cache: DiskCache, max_bytes: int, target_ratio: float = 0.9):
+        self.disk_cache = disk_cache
+        self.max_bytes = max(0, int(max_bytes))
+        self.target_ratio = target_ratio
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._approx_bytes = None  # حجم آخرین پیمایش به علاوه نوشتن‌های بعد از آن
+        self._counters = self._load_counters()  # نقطه -> {نتیجه: تعداد}
+        self._dirty = False
+        self.evicted = 0
+
+    @classmethod
+    def from_settings(cls, disk_cache: DiskCache, settings: Optional[dict] = None) -> "CacheManager":
+        """ساخت مدیر کش از تنظیمات (cache_max_mb)"""
+        settings = settings or {}
+        return cls(disk_cache, float(settings.get("cache_max_mb", 500)) * 1024 * 1024)
+
+    @property
+    def cache_dir(self) -> str:
+        return self.disk_cache.cache_dir
+
+    # ---------- شمارنده‌ها ----------
+
+    def _stats_path(self) -> str:
+        return os.path.join(self.cache_dir, STATS_FILENAME)
+
+    def _load_counters(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(self._stats_path(), 'r', encoding='utf-8') as f:
+                return {endpoint: {outcome: int(counts.get(outcome, 0)) for outcome in CACHE_OUTCOMES}
+                        for endpoint, counts in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning(f"فایل آمار کش خوانده نشد و از صفر شروع می‌شود: {e}")
+            return {}
+
+    def record(self, key: str, outcome: str):
+        """ثبت نتیجه یک جستجوی کش برای نقطه کلید"""
+        with self._lock:
+            counts = self._counters.setdefault(cache_endpoint(key), dict.fromkeys(CACHE_OUTCOMES, 0))
+            counts[outcome] += 1
+            self._dirty = True
+
+    def save_counters(self):
+        """ذخیره شمارنده‌ها برای اجراهای بعد و ابزار خط فرمان"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._counters, ensure_ascii=False).encode('utf-8')
+            self._dirty = False
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            atomic_write(self._stats_path(), data, durable=False)
+        except Exception as e:
+            self.logger.warning(f"خطا در ذخیره آمار کش: {e}")
+
+    def reset_counters(self):
+        with self._lock:
+            self._counters = {}
+            self._dirty = False
+        try:
+            os.remove(self._stats_path())
+        except FileNotFoundError:
+            pass
+
+    # ---------- فایل‌ها ----------
+
+    def _scan(self) -> Tuple[List[CacheFile], List[str]]:
+        """فایل‌های ورودی کش و فایل‌های موقت رها شده پوشه"""
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_file()]
+        except FileNotFoundError:
+            return [], []
+
+        sizes = {}
+        for entry in entries:
+            try:
+                sizes[entry.name] = entry.stat()
+            except FileNotFoundError:
+                pass
+
+        files, orphans = [], []
+        now = time.time()
+        for name, stat in sizes.items():
+            if name.startswith('.'):
+                if '.tmp' in name and now - stat.st_mtime > ORPHAN_TEMP_AGE:
+                    orphans.append(os.path.join(self.cache_dir, name))
+                continue
+            extension = next((ext for ext in CACHE_EXTENSIONS if name.endswith(ext)), None)
+            if extension is None:
+                continue
+            sidecar = sizes.get(os.path.basename(checksum_path(name)))
+            size = stat.st_size + (sidecar.st_size if sidecar is not None else 0)
+            files.append(CacheFile(os.path.join(self.cache_dir, name), name[:-len(extension)],
+                                   size, stat.st_mtime))
+        return files, orphans
+
+    def _remove(self, path: str) -> bool:
+        try:
+            DiskCache._remove_file(path)
+            return True
+        except OSError as e:
+            # فایل باز در رشته دیگر (ویندوز)؛ در نوبت بعد حذف می‌شود
+            self.logger.debug("حذف فایل کش %s ممکن نبود: %s", path, e)
+            return False
+
+    def note_write(self, size: int):
+        """ثبت حجم یک نوشتن؛ عبور از سقف حذف LRU را اجرا می‌کند"""
+        if not self.max_bytes:
+            return
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += size
+                if self._approx_bytes <= self.max_bytes:
+                    return
+        self.enforce_limit()
+
+    def enforce_limit(self) -> Tuple[int, int]:
+        """حذف کم‌استفاده‌ترین ورودی‌ها تا زیر سقف: (تعداد، بایت‌های آزاد شده)"""
+        # اگر رشته دیگری در حال حذف است همان کافی است
+        if not self._evict_lock.acquire(blocking=False):
+            return 0, 0
+        try:
+            files, orphans = self._scan()
+            for path in orphans:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+            total = sum(cache_file.size for cache_file in files)
+            removed = freed = 0
+            if self.max_bytes and total > self.max_bytes:
+                target = self.max_bytes * self.target_ratio
+                for cache_file in sorted(files, key=lambda f: f.mtime):
+                    if total - freed <= target:
+                        break
+                    if self._remove(cache_file.path):
+                        removed += 1
+                        freed += cache_file.size
+                self.logger.info(f"سقف کش ({self.max_bytes / 1024 / 1024:.0f} MB): {removed} فایل کم‌استفاده "
+                                 f"({freed / 1024 / 1024:.1f} MB) حذف شد")
+
+            with self._lock:
+                self._approx_bytes = total - freed
+                self.evicted += removed
+            return removed, freed
+        finally:
+            self._evict_lock.release()
+
+    def remove_older_than(self, hours: float) -> Tuple[int, int]:
+        """حذف ورودی‌هایی که در hours ساعت گذشته نوشته یا خوانده نشده‌اند"""
+        cutoff = time.time() - hours * 3600
+        return self._remove_files([f for f in self._scan()[0] if f.mtime < cutoff])
+
+    def clear(self) -> Tuple[int, int]:
+        """حذف همه ورودی‌های کش دیسک (snapshot بازار و شمارنده‌ها می‌مانند)"""
+        return self._remove_files(self._scan()[0])
+
+    def _remove_files(self, files: List[CacheFile]) -> Tuple[int, int]:
+        removed = freed = 0
+        for cache_file in files:
+            if self._remove(cache_file.path):
+                removed += 1
+                freed += cache_file.size
+        with self._lock:
+            self._approx_bytes = None
+        return removed, freed
+
+    # ---------- آمار ----------
+
+    def stats(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """آمار به تفکیک نقطه: تعداد، حجم، hit/miss و نرخ hit، هیستوگرام عمر داده‌ها"""
+        now = now or datetime.now()
+        endpoints: Dict[str, Dict[str, Any]] = {}
+
+        def row(endpoint):
+            if endpoint not in endpoints:
+                endpoints[endpoint] = _empty_stats_row()
+            return endpoints[endpoint]
+
+        for cache_file in self._scan()[0]:
+            current = row(cache_endpoint(cache_file.key))
+            current['entries'] += 1
+            current['bytes'] += cache_file.size
+            timestamp = self.disk_cache.read_timestamp(cache_file.path)
+            if timestamp is not None:
+                hours = (now - timestamp).total_seconds() / 3600
+                label = next(label for label, limit in AGE_BUCKETS if limit is None or hours < limit)
+                current['ages'][label] += 1
+
+        with self._lock:
+            for endpoint, counts in self._counters.items():
+                row(endpoint).update(counts)
+
+        total = _empty_stats_row()
+        for current in endpoints.values():
+            for name in ('entries', 'bytes') + CACHE_OUTCOMES:
+                total[name] += current[name]
+            for label, count in current['ages'].items():
+                total['ages'][label] += count
+        for current in list(endpoints.values()) + [total]:
+            hits = current['memory'] + current['disk']
+            lookups = hits + current['stale'] + current['miss']
+            current['hits'] = hits
+            current['lookups'] = lookups
+            current['hit_rate'] = hits / lookups if lookups else 0.0
+
+        return {
+            'endpoints': dict(sorted(endpoints.items())),
+            'total': total,
+            'max_bytes': self.max_bytes,
+            'evicted': self.evicted
+        }
+
+
+def format_cache_stats(stats: Dict[str, Any]) -> str:
+    """جدول متنی آمار CacheManager.stats برای لاگ و خط فرمان"""
+    labels = [label for label, _ in AGE_BUCKETS]
+    header = (f"{'endpoint':<12}{'entries':>8}{'MB':>9}{'hit%':>7}{'memory':>8}{'disk':>7}"
+              f"{'stale':>7}{'miss':>7}{'304':>6}" + "".join(f"{label:>7}" for label in labels))
+    lines = [header, "-" * len(header)]
+    rows = list(stats['endpoints'].items()) + [('total', stats['total'])]
+    for endpoint, row in rows:
+        lines.append(
+            f"{endpoint:<12}{row['entries']:>8}{row['bytes'] / 1024 / 1024:>9.2f}{row['hit_rate'] * 100:>7.0f}"
+            f"{row['memory']:>8}{row['disk']:>7}{row['stale']:>7}{row['miss']:>7}{row['revalidated']:>6}"
+            + "".join(f"{row['ages'][label]:>7}" for label in labels))
+    limit = f"{stats['max_bytes'] / 1024 / 1024:.0f} MB" if stats['max_bytes'] else "بدون سقف"
+    lines.append(f"سقف کش: {limit}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="آمار و نگهداری پوشه کش پاسخ‌های TSETMC")
+    parser.add_argument('--cache-dir', default="cache")
+    parser.add_argument('--evict', action='store_true', help="اعمال سقف حجم (حذف LRU)")
+    parser.add_argument('--older-than', type=float, metavar='HOURS',
+                        help="حذف ورودی‌هایی که در این چند ساعت استفاده نشده‌اند")
+    parser.add_argument('--migrate', action='store_true', help="انتقال فایل‌های قدیمی .json به قالب فشرده")
+    parser.add_argument('--clear', action='store_true', help="حذف همه ورودی‌های کش")
+    parser.add_argument('--reset-stats', action='store_true', help="صفر کردن شمارنده‌های hit/miss")
+    parser.add_argument('--max-mb', type=float, help="سقف حجم (پیش‌فرض از تنظیمات)")
+    parser.add_argument('--json', dest='as_json', action='store_true', help="خروجی آمار به شکل JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    from config import Config
+    settings = Config().settings
+    if args.max_mb is not None:
+        settings = dict(settings, cache_max_mb=args.max_mb)
+
+    manager = CacheManager.from_settings(DiskCache.from_settings(args.cache_dir, settings), settings)
+    if args.migrate:
+        print(f"{manager.disk_cache.migrate_legacy()} فایل قدیمی منتقل شد")
+    if args.clear:
+        removed, freed = manager.clear()
+        print(f"{removed} فایل کش ({freed / 1024 / 1024:.1f} MB) حذف شد")
+    if args.older_than is not None:
+        removed, freed = manager.remove_older_than(args.older_than)
+        print(f"{removed} فایل کش قدیمی ({freed / 1024 / 1024:.1f} MB) حذف شد")
+    if args.evict:
+        removed, freed = manager.enforce_limit()
+        print(f"{removed} فایل کش ({freed / 1024 / 1024:.1f} MB) برای رعایت سقف حذف شد")
+    if args.reset_stats:
+        manager.reset_counters()
+
+    stats = manager.stats()
+    if args.as_json:
+        json.dump(stats, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(format_cache_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
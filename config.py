@@ -1,7 +1,15 @@
 # config.py
 import json
 import os
+import atexit
 import logging
+import logging.handlers
+import queue
+import hashlib
+import tempfile
+import importlib
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
 # نگاشت صنایع
@@ -139,6 +147,9 @@ DEFAULT_OUTPUT_COLUMNS = [
     "adjustment_ratio"  # ✅ در انتهای لیست
 ]
 
+# پسوند فایل checksum که کنار هر فایل کش و خروجی نوشته می‌شود
+CHECKSUM_SUFFIX = ".sha256"
+
 class Config:
     def __init__(self):
         self.settings_file = "tsetmc_config.json"
@@ -155,17 +166,46 @@ class Config:
         
         log_file = os.path.join(log_dir, f"tsetmc_{datetime.now().strftime('%Y%m%d')}.log")
         
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format='[%(asctime)s] %(levelname)s: %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
+        formatter = logging.Formatter('[%(asctime)s] %(levelname)s: %(message)s',
+                                      datefmt='%Y-%m-%d %H:%M:%S')
+        
+        # delay=True: فایل لاگ با اولین پیام باز می‌شود، نه پیش از نمایش پنجره
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=self.settings.get("log_max_bytes", 10 * 1024 * 1024),
+            backupCount=self.settings.get("log_backup_count", 5),
+            encoding='utf-8',
+            delay=True
         )
+        stream_handler = logging.StreamHandler()
+        for handler in (file_handler, stream_handler):
+            handler.setFormatter(formatter)
+        
+        # رشته‌های کاری فقط رکورد را در صف می‌گذارند؛ قالب‌بندی و نوشتن در رشته QueueListener انجام می‌شود
+        log_queue = queue.SimpleQueue()
+        self.log_listener = logging.handlers.QueueListener(
+            log_queue, file_handler, stream_handler, respect_handler_level=True)
+        self.log_listener.start()
+        atexit.register(self.log_listener.stop)
+        
+        root_logger = logging.getLogger()
+        root_logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+        self.set_log_level(self.settings.get("log_level", "INFO"), save=False)
+        
         self.logger = logging.getLogger(__name__)
     
+    def set_log_level(self, level, save=True):
+        """تنظیم سطح لاگ (مثلاً "DEBUG" یا "INFO")؛ پیام‌های پایین‌تر اصلاً ساخته نمی‌شوند"""
+        level = str(level).upper()
+        if not isinstance(logging.getLevelName(level), int):
+            level = "INFO"
+        
+        logging.getLogger().setLevel(level)
+        # save=False فقط همین اجرا را تغییر می‌دهد (ذخیره بعدی تنظیمات هم آن را ثبت نمی‌کند)
+        if save:
+            self.settings["log_level"] = level
+            self.save_settings()
+    
     def load_settings(self):
         """بارگذاری تنظیمات با اضافه شدن تنظیمات تعدیل"""
         default = {
@@ -174,12 +214,37 @@ class Config:
             "price_url": "https://cdn.tsetmc.com/api/ClosingPrice/GetChartData/{inscode}/D",
             "dollar_url": "https://dashboard-api.tgju.org/v1/tv2/history?symbol=price_dollar_rl&resolution=1D",
             "gold_url": "https://dashboard-api.tgju.org/v1/tv2/history?symbol=ons&resolution=1D",
+            "adjustment_url": "https://cdn.tsetmc.com/api/Instrument/GetInstrumentShareChange/{inscode}",
             "output_dir": ".",
             "remove_block_trades": True,
             "apply_adjustment": True,  # ✅ تنظیم جدید: اعمال تعدیل روی داده‌ها
             "selected_columns": DEFAULT_OUTPUT_COLUMNS,
             "column_order": DEFAULT_OUTPUT_COLUMNS,
-            "default_markets": ["300", "303", "309", "313", "400", "403", "404"]
+            "default_markets": ["300", "303", "309", "313", "400", "403", "404"],
+            "watch_interval": 5,  # ثانیه بین به‌روزرسانی‌های افزایشی MarketWatch
+            "snapshot_file": os.path.join("cache", "market_watch.pkl.gz"),
+            "startup_budget_ms": 500,  # بودجه زمان نمایش پنجره اصلی
+            "search_debounce_ms": 150,  # تأخیر جستجوی نمادها پس از آخرین کلید
+            "log_level": "INFO",  # سطح لاگ (DEBUG برای عیب‌یابی)
+            "log_max_bytes": 10 * 1024 * 1024,  # حجم هر فایل لاگ پیش از چرخش
+            "log_backup_count": 5,  # تعداد فایل‌های لاگ چرخش‌یافته
+            "http_fixtures_mode": "off",  # off / record / replay (ضبط و پخش پاسخ‌های HTTP)
+            "http_fixtures_file": os.path.join("fixtures", "http_fixtures.jsonl.gz"),
+            "http_fixtures_latency": "recorded",  # recorded یا zero هنگام پخش
+            "cpu_workers": "auto",  # پردازه‌های ترکیب داده نمادها (auto: تعداد هسته‌ها، 0: بدون پردازه)
+            "cpu_min_symbols": 20,  # دسته‌های کوچک‌تر در رشته‌های دانلود ترکیب می‌شوند
+            "pipeline_queue_size": 16,  # ظرفیت صف بین مراحل خط لوله دانلود
+            "write_workers": 2,  # رشته‌های نوشتن فایل‌های خروجی
+            "memory_cache_mb": 128,  # سقف کش حافظه پاسخ‌های نمادها (0: غیرفعال)
+            "market_timezone": "Asia/Tehran",
+            "market_close_time": "12:30",  # پایان جلسه معاملاتی (وقت تهران)
+            "market_settle_minutes": 30,  # فاصله پایان جلسه تا نهایی شدن داده‌های روز
+            "market_trading_weekdays": [5, 6, 0, 1, 2],  # شنبه تا چهارشنبه (دوشنبه=0)
+            "market_holidays": [],  # تعطیلات رسمی به شکل YYYY-MM-DD (میلادی)
+            "cache_codec": "gzip",  # فشرده‌سازی فایل‌های کش: gzip یا zstd (نیازمند بسته zstandard)
+            "cache_compression_level": None,  # None: سطح پیش‌فرض کدک
+            "cache_max_mb": 500,  # سقف حجم پوشه کش؛ کم‌استفاده‌ترین ورودی‌ها حذف می‌شوند (0: بدون سقف)
+            "cache_max_age_days": 30  # حذف ورودی‌هایی که این مدت استفاده نشده‌اند (0: غیرفعال)
         }
         
         if os.path.exists(self.settings_file):
@@ -233,7 +298,19 @@ class Config:
     
     def get_adjustment_url(self, inscode):
         """دریافت URL داده‌های تعدیل"""
-        return f"https://cdn.tsetmc.com/api/Instrument/GetInstrumentShareChange/{inscode}"
+        url = self.settings.get("adjustment_url",
+                                "https://cdn.tsetmc.com/api/Instrument/GetInstrumentShareChange/{inscode}")
+        return url.format(inscode=inscode)
+    
+    def get_cpu_workers(self):
+        """تعداد پردازه‌های ترکیب داده نمادها (0 یعنی ترکیب در همان رشته دانلود)"""
+        value = self.settings.get("cpu_workers", "auto")
+        if value == "auto":
+            return os.cpu_count() or 1
+        try:
+            return max(0, int(value))
+        except (TypeError, ValueError):
+            return 0
     
     def get_adjustment_status(self):
         """دریافت وضعیت تنظیمات تعدیل"""
@@ -273,6 +350,175 @@ class Config:
             return False
 
 # توابع کمکی
+class LazyModule:
+    """ماژولی که فقط با اولین دسترسی به یک خصوصیت import می‌شود
+    
+    برای کتابخانه‌های سنگین (pandas، requests) تا زمان راه‌اندازی پنجره کوتاه بماند.
+    """
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+    
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+def lazy_import(name):
+    """ایجاد ماژول با import تنبل"""
+    return LazyModule(name)
+
+def _fsync_directory(directory):
+    """ثبت تغییر نام در دیسک (در ویندوز پوشه را نمی‌توان fsync کرد)"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def file_sha256(path, block_size=1024 * 1024):
+    """SHA-256 محتوای یک فایل (خواندن بلوکی)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def checksum_path(path):
+    """مسیر فایل checksum کنار یک فایل (قالب sha256sum)"""
+    return f"{path}{CHECKSUM_SUFFIX}"
+
+def read_checksum(path):
+    """checksum ثبت شده برای یک فایل (None اگر وجود نداشته باشد)"""
+    try:
+        with open(checksum_path(path), 'r', encoding='utf-8') as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+def verify_checksum(path, data=None):
+    """آیا محتوای فایل (یا بایت‌های خوانده شده آن) با checksum کنارش یکی است؟"""
+    expected = read_checksum(path)
+    if expected is None:
+        return False
+    actual = hashlib.sha256(data).hexdigest() if data is not None else file_sha256(path)
+    return actual == expected
+
+def _replace_durably(temp_path, path, digest=None, durable=True):
+    """fsync فایل موقت، جایگزینی اتمیک و سپس ثبت checksum (اگر digest داده شود)
+    
+    durable=False بدون fsync فایل و پوشه: جایگزینی همچنان اتمیک است و فقط قطع برق ممکن است
+    فایل ناقص بگذارد که checksum آن را رد می‌کند (برای داده‌های قابل دریافت دوباره مثل کش).
+    """
+    if durable:
+        with open(temp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    if durable:
+        _fsync_directory(os.path.dirname(path) or '.')
+    
+    # checksum پس از داده نوشته می‌شود؛ قطع شدن بین این دو یعنی عدم تطابق و بی‌اعتباری فایل
+    if digest is not None:
+        atomic_write(checksum_path(path), f"{digest}  {os.path.basename(path)}\n".encode('utf-8'),
+                     durable=durable)
+
+def _temp_path_for(path):
+    """فایل موقت در همان پوشه (همان دیسک، پس os.replace اتمیک است) با همان پسوند"""
+    directory = os.path.dirname(path) or '.'
+    name = os.path.basename(path)
+    return tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=f".tmp{os.path.splitext(name)[1]}")
+
+def atomic_write(path, data, checksum=False, durable=True):
+    """نوشتن بایت‌ها در فایل موقت، fsync و جایگزینی یکجا (خواننده هیچ‌گاه فایل نیمه‌کاره نمی‌بیند)"""
+    fd, temp_path = _temp_path_for(path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        _replace_durably(temp_path, path, hashlib.sha256(data).hexdigest() if checksum else None, durable)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+@contextmanager
+def atomic_file(path, checksum=False):
+    """مسیر موقت برای نویسنده‌هایی که مسیر می‌خواهند (Excel، ZIP، gzip)؛ پس از پایان موفق جایگزین path می‌شود
+    
+        with atomic_file(path, checksum=True) as temp_path:
+            df.to_excel(temp_path)
+    """
+    fd, temp_path = _temp_path_for(path)
+    os.close(fd)
+    try:
+        yield temp_path
+        _replace_durably(temp_path, path, file_sha256(temp_path) if checksum else None)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def latest_log_file(log_dir="logs"):
+    """مسیر جدیدترین فایل لاگ (None اگر وجود نداشته باشد)"""
+    if not os.path.isdir(log_dir):
+        return None
+    log_files = sorted([f for f in os.listdir(log_dir) if f.endswith('.log')], reverse=True)
+    return os.path.join(log_dir, log_files[0]) if log_files else None
+
+def read_log_tail(path, max_lines, end=None, block_size=64 * 1024):
+    """خواندن حداکثر max_lines خط پایانی فایل (تا موقعیت بایتی end) با خواندن بلوکی از انتها
+    
+    خروجی (خطوط، موقعیت بایتی شروع اولین خط) است؛ موقعیت 0 یعنی ابتدای فایل.
+    با دادن همین موقعیت به عنوان end صفحه قبلی خوانده می‌شود.
+    """
+    with open(path, 'rb') as f:
+        if end is None:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+        
+        pos = end
+        chunks = []
+        newlines = 0
+        # یک خط بیشتر لازم است چون اولین خط خوانده شده ممکن است ناقص باشد
+        while pos > 0 and newlines <= max_lines:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            chunk = f.read(size)
+            chunks.append(chunk)
+            newlines += chunk.count(b'\n')
+    
+    data = b''.join(reversed(chunks))
+    lines = data.split(b'\n')
+    if lines and lines[-1] == b'':
+        lines.pop()
+    
+    start = pos
+    if pos > 0 and lines:
+        start += len(lines[0]) + 1
+        lines = lines[1:]
+    if len(lines) > max_lines:
+        start += sum(len(line) + 1 for line in lines[:-max_lines])
+        lines = lines[-max_lines:]
+    
+    return [line.decode('utf-8', errors='replace').rstrip('\r') for line in lines], start
+
 def get_industry_name(code):
     """دریافت نام صنعت بر اساس کد"""
     return INDUSTRY_MAP.get(str(code), f"نامشخص ({code})")
@@ -1,10 +1,123 @@
 # data_loader.py
-import requests
-import pandas as pd
 import re
+import os
+import gzip
+import pickle
 import logging
+import threading
+import concurrent.futures
 from datetime import datetime
-from config import INDUSTRY_MAP, MARKET_LABELS
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from cache_store import DiskCache
+from config import INDUSTRY_MAP, MARKET_LABELS, atomic_file, lazy_import, read_checksum, verify_checksum
+
+# کتابخانه‌های سنگین با اولین استفاده (رسیدن داده) بارگذاری می‌شوند
+pd = lazy_import('pandas')
+requests = lazy_import('requests')
+
+# تبدیل حروف عربی و فرم‌های نمایشی به فارسی
+ARABIC_TO_PERSIAN = {
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ﺊ': 'ی', 'ﺋ': 'ی',
+    'ﺌ': 'ی', 'ﻲ': 'ی', 'ﻳ': 'ی', 'ﻴ': 'ی', 'ﻚ': 'ک',
+    'ﻛ': 'ک', 'ﻜ': 'ک', 'ﺆ': 'و', 'ﺂ': 'آ', 'ﺄ': 'ا',
+    'ﺈ': 'ا', 'ﺎ': 'ا', 'ﺍ': 'ا', 'ﺑ': 'ب', 'ﺒ': 'ب',
+    'ﺐ': 'ب', 'ﺏ': 'ب', 'ﺗ': 'ت', 'ﺘ': 'ت', 'ﺖ': 'ت',
+    'ﺕ': 'ت', 'ﺜ': 'ث', 'ﺚ': 'ث', 'ﺛ': 'ث', 'ﺟ': 'ج',
+    'ﺠ': 'ج', 'ﺞ': 'ج', 'ﺝ': 'ج', 'ﺣ': 'ح', 'ﺤ': 'ح',
+    'ﺢ': 'ح', 'ﺡ': 'ح', 'ﺧ': 'خ', 'ﺨ': 'خ', 'ﺦ': 'خ',
+    'ﺥ': 'خ', 'ﺳ': 'س', 'ﺴ': 'س', 'ﺲ': 'س', 'ﺱ': 'س',
+    'ﺷ': 'ش', 'ﺸ': 'ش', 'ﺶ': 'ش', 'ﺵ': 'ش', 'ﺻ': 'ص',
+    'ﺼ': 'ص', 'ﺺ': 'ص', 'ﺹ': 'ص', 'ﺿ': 'ض', 'ﻀ': 'ض',
+    'ﺾ': 'ض', 'ﺽ': 'ض', 'ﻃ': 'ط', 'ﻄ': 'ط', 'ﻂ': 'ط',
+    'ﻁ': 'ط', 'ﻇ': 'ظ', 'ﻈ': 'ظ', 'ﻆ': 'ظ', 'ﻅ': 'ظ',
+    'ﻋ': 'ع', 'ﻌ': 'ع', 'ﻊ': 'ع', 'ﻉ': 'ع', 'ﻏ': 'غ',
+    'ﻐ': 'غ', 'ﻎ': 'غ', 'ﻍ': 'غ', 'ﻓ': 'ف', 'ﻔ': 'ف',
+    'ﻒ': 'ف', 'ﻑ': 'ف', 'ﻗ': 'ق', 'ﻘ': 'ق', 'ﻖ': 'ق',
+    'ﻕ': 'ق', 'ﻛ': 'ک', 'ﻜ': 'ک', 'ﻚ': 'ک', 'ﮐ': 'ک',
+    'ﮑ': 'ک', 'ﻙ': 'ک', 'ﻟ': 'ل', 'ﻠ': 'ل', 'ﻞ': 'ل',
+    'ﻝ': 'ل', 'ﻣ': 'م', 'ﻤ': 'م', 'ﻢ': 'م', 'ﻡ': 'م',
+    'ﻧ': 'ن', 'ﻨ': 'ن', 'ﻦ': 'ن', 'ﻥ': 'ن', 'ﻭ': 'و',
+    'ﻮ': 'و', 'ﻫ': 'ه', 'ﻬ': 'ه', 'ﻪ': 'ه', 'ﻩ': 'ه',
+    'ﻳ': 'ی', 'ﻴ': 'ی', 'ﻲ': 'ی', 'ﻱ': 'ی', 'ﻯ': 'ی',
+    'ﯾ': 'ی', 'ﯿ': 'ی', 'ﯽ': 'ی', 'ﯼ': 'ی', 'ﺀ': '',
+    'ﺁ': 'آ', 'ﺃ': 'ا', 'ﺅ': 'و', 'ﺇ': 'ا', 'ﺉ': 'ی',
+    'ﺊ': 'ی', 'ﺋ': 'ی', 'ﺌ': 'ی', 'ﺎ': 'ا'
+}
+
+# جدول ترجمه یکپارچه: حروف عربی، ارقام فارسی/عربی و نیم‌فاصله (یک بار در زمان import ساخته می‌شود)
+PERSIAN_NORMALIZE_TABLE = str.maketrans({
+    **{arabic: (persian or None) for arabic, persian in ARABIC_TO_PERSIAN.items()},
+    **{digit: str(i % 10) for i, digit in enumerate('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩')},
+    '\u200c': ' ',
+    '\u200d': ' '
+})
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# نسخه قالب فایل snapshot؛ با تغییر ساختار داده افزایش یابد
+SNAPSHOT_VERSION = 1
+
+# ستون‌های بخش 2 پاسخ MarketWatchPlus (ردیف کامل هر نماد)
+MARKET_WATCH_FIELDS = {
+    0: "کد_داخلی",
+    1: "کد_بین_المللی",
+    2: "نماد",
+    3: "نام_شرکت",
+    4: "زمان_آخرین_معامله",
+    5: "اولین_قیمت",
+    6: "قیمت_پایانی",
+    7: "قیمت_آخرین_معامله",
+    8: "تعداد_معاملات",
+    9: "حجم_معاملات",
+    10: "ارزش_معاملات",
+    11: "کمترین_قیمت",
+    12: "بیشترین_قیمت",
+    13: "قیمت_دیروز",
+    14: "EPS",
+    15: "حجم_مبنا",
+    16: "تعداد_بازدید_کننده",
+    17: "بازار_اصلی",
+    18: "گروه_صنعت",
+    19: "حداکثر_قیمت_مجاز",
+    20: "حداقل_قیمت_مجاز",
+    21: "تعداد_کل_سهام",
+    22: "کد_بازار",
+    23: "NAV",
+    24: "موقعیت_های_باز",
+    25: "دسته_بندی_تخصصی"
+}
+
+# ستون‌های ردیف‌های کوتاه بخش 2 در پاسخ افزایشی (فقط مقادیر تغییر کرده)
+MARKET_WATCH_DELTA_FIELDS = {
+    0: "کد_داخلی",
+    1: "زمان_آخرین_معامله",
+    2: "اولین_قیمت",
+    3: "قیمت_پایانی",
+    4: "قیمت_آخرین_معامله",
+    5: "تعداد_معاملات",
+    6: "حجم_معاملات",
+    7: "ارزش_معاملات",
+    8: "کمترین_قیمت",
+    9: "بیشترین_قیمت"
+}
+
+# ستون‌هایی که شمارش نمادها و فیلترهای بازار/صنعت/معاملات بلوکی به آن‌ها وابسته‌اند
+CLASSIFICATION_COLUMNS = ('کد_بازار', 'گروه_صنعت', 'کد_بین_المللی', 'نماد')
+
+# ستون‌های بخش 3 پاسخ MarketWatchPlus (بهترین مظنه‌ها)
+BEST_LIMITS_FIELDS = {
+    0: "کد_داخلی",
+    1: "ردیف_مظنه",
+    2: "تعداد_فروشنده",
+    3: "تعداد_خریدار",
+    4: "قیمت_خرید",
+    5: "قیمت_فروش",
+    6: "حجم_خرید",
+    7: "حجم_فروش"
+}
+
+# ستون‌های لیست نمادها (صفحه 3)
+SYMBOL_COLUMNS = ('نماد', 'نام_شرکت', 'کد_بین_المللی', 'کد_داخلی', 'کد_بازار', 'گروه_صنعت', 'نام_صنعت')
 
 class DataLoader:
     def __init__(self, config):
@@ -21,60 +134,61 @@ class DataLoader:
         # داده‌های جدید: دلار و طلا
         self.dollar_data = None
         self.gold_data = None
+        self.external_data_ready = threading.Event()
+        self.external_data_ready.set()  # تا شروع اولین دریافت، چیزی در انتظار نیست
+        
+        # session مشترک با pool اتصال برای همه درخواست‌ها
+        self.session = None
+        
+        # آخرین پاسخ دلار/طلا با ETag/Last-Modified برای درخواست شرطی
+        self.external_cache = DiskCache.from_settings("cache", config.settings)
+        
+        # سایر بخش‌های MarketWatchPlus (از همان یک درخواست)
+        self.market_overview = []
+        self.best_limits = None
+        self.top_of_book = {}
+        self.market_watch_refid = 0
+        self.market_watch_heven = 0
+        self._inscode_index = {}
+        self.symbol_counts = {}  # (کد بازار, کد صنعت, عادی) -> تعداد نماد
+        
+        # حالت پایش (به‌روزرسانی افزایشی)
+        self._data_lock = threading.RLock()
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
         
         # فیلترها
         self.selected_markets = []
         self.selected_industries = []
         self.selected_symbols = []
+        self.remove_block_trades = True
+        
+        # زمان داده فعلی (None یعنی هنوز داده‌ای نیست) و منبع آن
+        self.snapshot_time = None
+        self.is_warm_start = False
     
     def normalize_text(self, text):
-        """نرمال‌سازی متن فارسی"""
-        if pd.isna(text):
-            return ''
+        """نرمال‌سازی متن فارسی (یک عبور translate با جدول از پیش ساخته شده)
         
-        text = str(text)
-        
-        # تبدیل حروف عربی به فارسی
-        arabic_to_persian = {
-            'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ﺊ': 'ی', 'ﺋ': 'ی',
-            'ﺌ': 'ی', 'ﻲ': 'ی', 'ﻳ': 'ی', 'ﻴ': 'ی', 'ﻚ': 'ک',
-            'ﻛ': 'ک', 'ﻜ': 'ک', 'ﺆ': 'و', 'ﺂ': 'آ', 'ﺄ': 'ا',
-            'ﺈ': 'ا', 'ﺎ': 'ا', 'ﺍ': 'ا', 'ﺑ': 'ب', 'ﺒ': 'ب',
-            'ﺐ': 'ب', 'ﺏ': 'ب', 'ﺗ': 'ت', 'ﺘ': 'ت', 'ﺖ': 'ت',
-            'ﺕ': 'ت', 'ﺜ': 'ث', 'ﺚ': 'ث', 'ﺛ': 'ث', 'ﺟ': 'ج',
-            'ﺠ': 'ج', 'ﺞ': 'ج', 'ﺝ': 'ج', 'ﺣ': 'ح', 'ﺤ': 'ح',
-            'ﺢ': 'ح', 'ﺡ': 'ح', 'ﺧ': 'خ', 'ﺨ': 'خ', 'ﺦ': 'خ',
-            'ﺥ': 'خ', 'ﺳ': 'س', 'ﺴ': 'س', 'ﺲ': 'س', 'ﺱ': 'س',
-            'ﺷ': 'ش', 'ﺸ': 'ش', 'ﺶ': 'ش', 'ﺵ': 'ش', 'ﺻ': 'ص',
-            'ﺼ': 'ص', 'ﺺ': 'ص', 'ﺹ': 'ص', 'ﺿ': 'ض', 'ﻀ': 'ض',
-            'ﺾ': 'ض', 'ﺽ': 'ض', 'ﻃ': 'ط', 'ﻄ': 'ط', 'ﻂ': 'ط',
-            'ﻁ': 'ط', 'ﻇ': 'ظ', 'ﻈ': 'ظ', 'ﻆ': 'ظ', 'ﻅ': 'ظ',
-            'ﻋ': 'ع', 'ﻌ': 'ع', 'ﻊ': 'ع', 'ﻉ': 'ع', 'ﻏ': 'غ',
-            'ﻐ': 'غ', 'ﻎ': 'غ', 'ﻍ': 'غ', 'ﻓ': 'ف', 'ﻔ': 'ف',
-            'ﻒ': 'ف', 'ﻑ': 'ف', 'ﻗ': 'ق', 'ﻘ': 'ق', 'ﻖ': 'ق',
-            'ﻕ': 'ق', 'ﻛ': 'ک', 'ﻜ': 'ک', 'ﻚ': 'ک', 'ﮐ': 'ک',
-            'ﮑ': 'ک', 'ﻙ': 'ک', 'ﻟ': 'ل', 'ﻠ': 'ل', 'ﻞ': 'ل',
-            'ﻝ': 'ل', 'ﻣ': 'م', 'ﻤ': 'م', 'ﻢ': 'م', 'ﻡ': 'م',
-            'ﻧ': 'ن', 'ﻨ': 'ن', 'ﻦ': 'ن', 'ﻥ': 'ن', 'ﻭ': 'و',
-            'ﻮ': 'و', 'ﻫ': 'ه', 'ﻬ': 'ه', 'ﻪ': 'ه', 'ﻩ': 'ه',
-            'ﻳ': 'ی', 'ﻴ': 'ی', 'ﻲ': 'ی', 'ﻱ': 'ی', 'ﻯ': 'ی',
-            'ﯾ': 'ی', 'ﯿ': 'ی', 'ﯽ': 'ی', 'ﯼ': 'ی', 'ﺀ': '',
-            'ﺁ': 'آ', 'ﺃ': 'ا', 'ﺅ': 'و', 'ﺇ': 'ا', 'ﺉ': 'ی',
-            'ﺊ': 'ی', 'ﺋ': 'ی', 'ﺌ': 'ی', 'ﺎ': 'ا'
-        }
-        
-        for arabic, persian in arabic_to_persian.items():
-            text = text.replace(arabic, persian)
-        
-        # تبدیل ارقام فارسی/عربی به انگلیسی
-        persian_digits = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
-        text = text.translate(persian_digits)
-        
-        # حذف نیم‌فاصله و فضاهای اضافی
-        text = text.replace('\u200c', ' ').replace('\u200d', ' ').strip()
-        text = re.sub(r'\s+', ' ', text)
+        مقدارهای خالی (None، NaN، pd.NA، NaT) مثل قبل '' برمی‌گردند.
+        """
+        # متن ورودی کاربر مسیر اصلی است و برای آن pandas بارگذاری نمی‌شود
+        if not isinstance(text, str) and (text is None or pd.isna(text)):
+            return ''
         
-        return text
+        # تبدیل حروف عربی/فرم‌های نمایشی، ارقام و نیم‌فاصله در یک عبور
+        # split/join فضاهای اضافی را حذف و فاصله‌ها را یکی می‌کند
+        return ' '.join(str(text).translate(PERSIAN_NORMALIZE_TABLE).split())
+    
+    def normalize_series(self, series):
+        """نسخه برداری normalize_text برای یک ستون کامل"""
+        return (
+            series.fillna('')
+            .astype(str)
+            .str.translate(PERSIAN_NORMALIZE_TABLE)
+            .str.replace(_WHITESPACE_RE, ' ', regex=True)
+            .str.strip()
+        )
     
     def _interpolate_price(self, df, target_date_str, price_column):
         """درونیابی قیمت برای تاریخ مورد نظر"""
@@ -129,15 +243,38 @@ class DataLoader:
             self.logger.warning(f"خطا در درونیابی قیمت برای تاریخ {target_date_str}: {e}")
             return 0
     
+    def _get_external_json(self, url, cache_key):
+        """دریافت JSON با درخواست شرطی؛ اگر سرور 304 بدهد نسخه کش شده بدون انتقال بدنه استفاده می‌شود"""
+        cached = self.external_cache.read(cache_key)
+        headers = cached.conditional_headers() if cached is not None else {}
+        
+        response = self.get_session().get(url, timeout=30, headers=headers)
+        response.raise_for_status()
+        
+        if response.status_code == 304 and cached is not None:
+            self.logger.info(f"داده {cache_key} تغییری نکرده است (304)")
+            return cached.data()
+        
+        data = response.json()
+        
+        # فقط پاسخ موفق و دارای validator ارزش نگه داشتن دارد
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if data.get('s') == 'ok' and (etag or last_modified):
+            try:
+                self.external_cache.write(cache_key, response.content, etag, last_modified)
+            except Exception as e:
+                self.logger.warning(f"خطا در ذخیره کش {cache_key}: {e}")
+        
+        return data
+    
     def fetch_dollar_data(self):
         """دریافت داده قیمت دلار"""
         try:
             url = self.config.settings["dollar_url"]
             self.logger.info(f"دریافت داده دلار از: {url}")
             
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_external_json(url, "tgju_dollar")
             
             if data.get('s') == 'ok':
                 records = []
@@ -183,9 +320,7 @@ class DataLoader:
             url = self.config.settings["gold_url"]
             self.logger.info(f"دریافت داده طلا از: {url}")
             
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_external_json(url, "tgju_gold")
             
             if data.get('s') == 'ok':
                 records = []
@@ -225,20 +360,40 @@ class DataLoader:
             self.logger.error(f"خطا در دریافت داده طلا: {e}")
             return False, str(e)
     
-    def fetch_external_data(self):
-        """دریافت داده‌های خارجی (دلار و طلا)"""
-        results = []
-        
-        # دریافت داده دلار
-        dollar_success, dollar_message = self.fetch_dollar_data()
-        results.append(f"دلار: {'✅' if dollar_success else '❌'} {dollar_message}")
+    def get_session(self):
+        """دریافت session مشترک با pool اتصال"""
+        if self.session is None:
+            from http_fixtures import create_http_adapter
+            
+            self.session = requests.Session()
+            # در حالت ضبط/پخش تنظیمات، adapter پاسخ‌ها را ضبط یا از آرشیو پخش می‌کند
+            adapter = create_http_adapter(self.config, pool_connections=4, pool_maxsize=8)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+        return self.session
+    
+    def close_session(self):
+        """بستن session"""
+        if self.session:
+            self.session.close()
+            self.session = None
+    
+    def _summarize_external_results(self, dollar_result, gold_result):
+        """ترکیب نتایج دریافت دلار و طلا"""
+        dollar_success, dollar_message = dollar_result
+        gold_success, gold_message = gold_result
         
-        # دریافت داده طلا
-        gold_success, gold_message = self.fetch_gold_data()
-        results.append(f"طلا: {'✅' if gold_success else '❌'} {gold_message}")
+        results = [
+            f"دلار: {'✅' if dollar_success else '❌'} {dollar_message}",
+            f"طلا: {'✅' if gold_success else '❌'} {gold_message}"
+        ]
         
         return all([dollar_success, gold_success]), " | ".join(results)
     
+    def wait_for_external_data(self, timeout=None):
+        """انتظار برای پایان دریافت دلار و طلا"""
+        return self.external_data_ready.wait(timeout)
+    
     def get_dollar_price(self, rec_date):
         """دریافت قیمت دلار برای تاریخ مشخص با درونیابی"""
         if self.dollar_data is None:
@@ -303,13 +458,44 @@ class DataLoader:
         except:
             return 0
     
-    def fetch_data(self):
-        """دریافت داده از TSETMC"""
+    def fetch_data(self, on_market_ready=None):
+        """دریافت همزمان MarketWatch، دلار و طلا
+        
+        on_market_ready به محض آماده شدن داده MarketWatch (پیش از پایان دلار و طلا)
+        با همان (success, message) خروجی فراخوانی می‌شود.
+        """
+        self.external_data_ready.clear()
+        
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                dollar_future = executor.submit(self.fetch_dollar_data)
+                gold_future = executor.submit(self.fetch_gold_data)
+                
+                # MarketWatch در رشته جاری دریافت می‌شود
+                success, message = self._fetch_market_watch()
+                if on_market_ready:
+                    on_market_ready(success, message)
+                
+                external_success, external_message = self._summarize_external_results(
+                    dollar_future.result(), gold_future.result()
+                )
+        finally:
+            self.external_data_ready.set()
+        
+        if external_success:
+            self.logger.info(f"داده‌های خارجی: {external_message}")
+        else:
+            self.logger.warning(f"خطا در دریافت داده‌های خارجی: {external_message}")
+        
+        return success, message
+    
+    def _fetch_market_watch(self):
+        """دریافت و پردازش MarketWatchPlus"""
         try:
             url = self.config.settings["data_url"]
             self.logger.info(f"دریافت داده از: {url}")
             
-            response = requests.get(url, timeout=30)
+            response = self.get_session().get(url, timeout=30)
             response.encoding = 'utf-8'
             text = response.text
             
@@ -330,90 +516,444 @@ class DataLoader:
             if not rows:
                 return False, "هیچ ردیفی در بخش 2 وجود ندارد"
             
-            # ساخت DataFrame
-            data = []
-            field_mapping = {
-                0: "کد_داخلی",
-                1: "کد_بین_المللی",
-                2: "نماد",
-                3: "نام_شرکت",
-                4: "زمان_آخرین_معامله",
-                5: "اولین_قیمت",
-                6: "قیمت_پایانی",
-                7: "قیمت_آخرین_معامله",
-                8: "تعداد_معاملات",
-                9: "حجم_معاملات",
-                10: "ارزش_معاملات",
-                11: "کمترین_قیمت",
-                12: "بیشترین_قیمت",
-                13: "قیمت_دیروز",
-                14: "EPS",
-                15: "حجم_مبنا",
-                16: "تعداد_بازدید_کننده",
-                17: "بازار_اصلی",
-                18: "گروه_صنعت",
-                19: "حداکثر_قیمت_مجاز",
-                20: "حداقل_قیمت_مجاز",
-                21: "تعداد_کل_سهام",
-                22: "کد_بازار",
-                23: "NAV",
-                24: "موقعیت_های_باز",
-                25: "دسته_بندی_تخصصی"
-            }
-            
-            for i, row in enumerate(rows):
-                fields = row.split(',')
-                record = {'ردیف': i + 1}
+            # ساخت DataFrame (خارج از قفل؛ رشته UI در این مدت با داده قبلی کار می‌کند)
+            raw_data = self._parse_instrument_rows(rows)
+            
+            # جایگزینی داده و اعمال دوباره فیلترها یکجا، تا فیلتری که کاربر همزمان
+            # اعمال می‌کند از دست نرود یا روی داده فیلتر نشده نماند
+            with self._data_lock:
+                self.raw_data = raw_data
+                self._reset_inscode_index()
+                self._build_symbol_counts()
+                
+                self.filtered_data = self.raw_data.copy()
                 
-                for idx, name in field_mapping.items():
-                    if idx < len(fields):
-                        value = fields[idx]
-                        # نرمال‌سازی متن
-                        if name in ['نماد', 'نام_شرکت', 'گروه_صنعت']:
-                            value = self.normalize_text(value)
-                        record[name] = value
-                    else:
-                        record[name] = ''
+                self.market_watch_heven = self._max_heven(self.raw_data['زمان_آخرین_معامله'])
                 
-                data.append(record)
+                # پردازش سایر بخش‌ها (وضعیت بازار، بهترین مظنه‌ها، شماره مرجع)
+                self._parse_extra_sections(sections)
+                
+                # داده تازه جایگزین snapshot شد: فیلترهای انتخاب شده دوباره اعمال می‌شوند
+                if self.is_warm_start:
+                    self._reapply_filters()
+                self.is_warm_start = False
+                self.snapshot_time = datetime.now()
             
-            self.raw_data = pd.DataFrame(data)
-            self.filtered_data = self.raw_data.copy()
+            self.logger.info(f"داده بارگذاری شد: {len(raw_data)} نماد")
+            self.save_snapshot()
             
-            # اضافه کردن ستون نام صنعت
-            if 'گروه_صنعت' in self.raw_data.columns:
-                self.raw_data['نام_صنعت'] = self.raw_data['گروه_صنعت'].apply(
-                    lambda x: INDUSTRY_MAP.get(str(x).strip(), str(x))
-                )
-                self.filtered_data['نام_صنعت'] = self.filtered_data['گروه_صنعت'].apply(
-                    lambda x: INDUSTRY_MAP.get(str(x).strip(), str(x))
-                )
+            return True, f"{len(self.raw_data)} نماد بارگذاری شد"
             
-            self.logger.info(f"داده بارگذاری شد: {len(self.raw_data)} نماد")
+        except Exception as e:
+            self.logger.error(f"خطا در دریافت داده: {e}")
+            return False, str(e)
+    
+    def _snapshot_path(self):
+        """مسیر فایل snapshot آخرین MarketWatch"""
+        return self.config.settings.get("snapshot_file", os.path.join("cache", "market_watch.pkl.gz"))
+    
+    def save_snapshot(self):
+        """ذخیره آخرین MarketWatch پردازش شده به صورت باینری فشرده"""
+        if self.raw_data is None:
+            return False
+        
+        path = self._snapshot_path()
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            # پایش زنده raw_data را در محل ویرایش می‌کند؛ pickle باید نسخه یکدست ببیند
+            with self._data_lock:
+                snapshot = self._snapshot_payload()
             
-            # دریافت داده‌های خارجی (دلار و طلا)
-            external_success, external_message = self.fetch_external_data()
-            if external_success:
-                self.logger.info(f"داده‌های خارجی: {external_message}")
-            else:
-                self.logger.warning(f"خطا در دریافت داده‌های خارجی: {external_message}")
+            # نوشتن در فایل موقت، fsync و جایگزینی اتمیک با checksum کنار فایل
+            with atomic_file(path, checksum=True) as temp_path:
+                with gzip.open(temp_path, 'wb', compresslevel=5) as f:
+                    f.write(snapshot)
             
-            return True, f"{len(self.raw_data)} نماد بارگذاری شد"
+            self.logger.debug(f"snapshot بازار ذخیره شد: {path}")
+            return True
+        except Exception as e:
+            self.logger.warning(f"خطا در ذخیره snapshot بازار: {e}")
+            return False
+    
+    def _snapshot_payload(self):
+        """بایت‌های pickle وضعیت فعلی (زیر _data_lock فراخوانی شود)"""
+        return pickle.dumps({
+            'version': SNAPSHOT_VERSION,
+            'timestamp': self.snapshot_time or datetime.now(),
+            'raw_data': self.raw_data,
+            'best_limits': self.best_limits,
+            'market_overview': self.market_overview,
+            'refid': self.market_watch_refid,
+            'heven': self.market_watch_heven
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    def load_snapshot(self):
+        """بارگذاری فوری آخرین snapshot ذخیره شده (warm start)"""
+        path = self._snapshot_path()
+        if not os.path.exists(path):
+            return False, "snapshot ذخیره شده‌ای وجود ندارد"
+        
+        # snapshot ناقص به جای warm start با دریافت کامل جایگزین می‌شود؛ snapshot بدون checksum
+        # (نسخه‌های قبل) پذیرفته می‌شود اگر کامل خوانده شود (CRC فایل gzip و pickle کامل)
+        if read_checksum(path) is not None and not verify_checksum(path):
+            return False, "checksum snapshot معتبر نیست"
+        
+        try:
+            with gzip.open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+            
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                return False, "نسخه snapshot قدیمی است"
+            
+            with self._data_lock:
+                self.raw_data = snapshot['raw_data']
+                self.filtered_data = self.raw_data.copy()
+                self._reset_inscode_index()
+                self._build_symbol_counts()
+                
+                self.best_limits = snapshot.get('best_limits')
+                self.top_of_book = self._build_top_of_book(self.best_limits)
+                self.market_overview = snapshot.get('market_overview', [])
+                self.market_watch_refid = snapshot.get('refid', 0)
+                self.market_watch_heven = snapshot.get('heven', 0)
+                self.snapshot_time = snapshot.get('timestamp')
+                self.is_warm_start = True
+            
+            time_text = self.snapshot_time.strftime('%Y-%m-%d %H:%M') if self.snapshot_time else 'نامشخص'
+            self.logger.info(f"snapshot بازار بارگذاری شد: {len(self.raw_data)} نماد (زمان: {time_text})")
+            return True, f"{len(self.raw_data)} نماد از داده ذخیره شده ({time_text})"
             
         except Exception as e:
-            self.logger.error(f"خطا در دریافت داده: {e}")
+            self.logger.warning(f"خطا در بارگذاری snapshot بازار: {e}")
+            return False, str(e)
+    
+    def _reapply_filters(self):
+        """اعمال مجدد فیلترهای بازار و صنعت روی داده تازه"""
+        if self.selected_markets:
+            self.apply_market_filter(self.selected_markets, self.remove_block_trades)
+            if self.selected_industries:
+                self.apply_industry_filter(self.selected_industries)
+    
+    def _parse_instrument_rows(self, rows, start_row=1):
+        """تبدیل ردیف‌های کامل بخش 2 به DataFrame با متن نرمال‌شده"""
+        data = []
+        for i, row in enumerate(rows):
+            fields = row.split(',')
+            record = {'ردیف': i + start_row}
+            
+            for idx, name in MARKET_WATCH_FIELDS.items():
+                record[name] = fields[idx] if idx < len(fields) else ''
+            
+            data.append(record)
+        
+        df = pd.DataFrame(data, columns=['ردیف'] + list(MARKET_WATCH_FIELDS.values()))
+        
+        # نرمال‌سازی متن به صورت برداری (یک عبور برای هر ستون)
+        for name in ['نماد', 'نام_شرکت', 'گروه_صنعت']:
+            df[name] = self.normalize_series(df[name])
+        
+        # اضافه کردن ستون نام صنعت
+        df['نام_صنعت'] = df['گروه_صنعت'].map(lambda x: INDUSTRY_MAP.get(x.strip(), x))
+        
+        return df
+    
+    def _reset_inscode_index(self):
+        """ساخت نگاشت کد داخلی به برچسب ایندکس raw_data"""
+        self._inscode_index = dict(zip(self.raw_data['کد_داخلی'], self.raw_data.index))
+    
+    def _regular_symbol_mask(self, df):
+        """ماسک نمادهای عادی (غیر بلوکی)"""
+        # نمادهایی که شناسه بین‌المللی به 0001 ختم نمی‌شود
+        mask = df['کد_بین_المللی'].astype(str).str.endswith('0001')
+        # همچنین حذف نمادهایی که با عدد پایان می‌یابند
+        return mask & ~df['نماد'].astype(str).str[-1].str.isdigit()
+    
+    def _build_symbol_counts(self):
+        """شمارش یک‌باره نمادها به تفکیک بازار × صنعت × عادی/بلوکی"""
+        df = self.raw_data
+        if df is None or 'کد_بازار' not in df.columns or 'گروه_صنعت' not in df.columns:
+            self.symbol_counts = {}
+            return
+        
+        keys = pd.DataFrame({
+            'market': df['کد_بازار'].astype(str),
+            'industry': df['گروه_صنعت'].astype(str),
+            'regular': self._regular_symbol_mask(df)
+        })
+        counts = keys.groupby(['market', 'industry', 'regular'], sort=False).size()
+        self.symbol_counts = {key: int(count) for key, count in counts.items()}
+    
+    def count_symbols(self, markets=None, industries=None, remove_block_trades=False):
+        """تعداد نمادهای باقی‌مانده برای ترکیبی از فیلترها (بدون پیمایش داده)
+        
+        None برای markets یا industries یعنی بدون فیلتر آن بخش.
+        """
+        markets = set(markets) if markets is not None else None
+        industries = set(industries) if industries is not None else None
+        
+        total = 0
+        for (market, industry, regular), count in self.symbol_counts.items():
+            if markets is not None and market not in markets:
+                continue
+            if industries is not None and industry not in industries:
+                continue
+            if remove_block_trades and not regular:
+                continue
+            total += count
+        return total
+    
+    def _parse_extra_sections(self, sections):
+        """پردازش بخش‌های 1، 3 و 4 پاسخ MarketWatchPlus"""
+        # بخش 1: اطلاعات کلی بازار
+        self.market_overview = sections[1].split(',') if len(sections) > 1 and sections[1] else []
+        
+        # بخش 3: بهترین مظنه‌های خرید و فروش (تا 5 ردیف برای هر نماد)
+        if len(sections) > 3:
+            self.best_limits = self._parse_best_limits(sections[3])
+            self.top_of_book = self._build_top_of_book(self.best_limits)
+            self.logger.info(f"بهترین مظنه‌ها: {len(self.best_limits)} ردیف برای {len(self.top_of_book)} نماد")
+        else:
+            self.best_limits = pd.DataFrame(columns=list(BEST_LIMITS_FIELDS.values()))
+            self.top_of_book = {}
+        
+        # بخش 4: شماره مرجع آخرین تغییر (برای به‌روزرسانی افزایشی)
+        if len(sections) > 4 and sections[4].strip().lstrip('-').isdigit():
+            self.market_watch_refid = int(sections[4].strip())
+    
+    def _parse_best_limits(self, section):
+        """تبدیل بخش بهترین مظنه‌ها به DataFrame با ایندکس (کد_داخلی، ردیف_مظنه)"""
+        data = []
+        for row in section.split(';'):
+            fields = row.strip().split(',')
+            if len(fields) < len(BEST_LIMITS_FIELDS):
+                continue
+            
+            record = {'کد_داخلی': fields[0]}
+            for idx, name in BEST_LIMITS_FIELDS.items():
+                if idx > 0:
+                    record[name] = self._to_number(fields[idx])
+            data.append(record)
+        
+        df = pd.DataFrame(data, columns=list(BEST_LIMITS_FIELDS.values()))
+        if not df.empty:
+            df = df.sort_values(['کد_داخلی', 'ردیف_مظنه']).set_index(['کد_داخلی', 'ردیف_مظنه'])
+        return df
+    
+    def _build_top_of_book(self, best_limits):
+        """ساخت نگاشت کد داخلی به سطر اول مظنه‌ها"""
+        if best_limits is None or best_limits.empty:
+            return {}
+        
+        try:
+            top = best_limits.xs(1, level='ردیف_مظنه', drop_level=True)
+        except KeyError:
+            return {}
+        return top.to_dict(orient='index')
+    
+    def _to_number(self, value):
+        """تبدیل امن مقدار متنی بخش‌های MarketWatch به عدد"""
+        try:
+            number = float(value)
+            return int(number) if number.is_integer() else number
+        except (ValueError, TypeError):
+            return 0
+    
+    def get_top_of_book(self, inscode):
+        """دریافت بهترین مظنه خرید و فروش یک نماد"""
+        return self.top_of_book.get(str(inscode))
+    
+    def get_top_of_book_columns(self, inscodes):
+        """بهترین قیمت خرید و فروش برای لیستی از کدهای داخلی (مقدار '' برای نماد بدون مظنه)"""
+        with self._data_lock:
+            tops = [self.top_of_book.get(str(code)) or {} for code in inscodes]
+        return {
+            'قیمت_خرید': [top.get('قیمت_خرید', '') for top in tops],
+            'قیمت_فروش': [top.get('قیمت_فروش', '') for top in tops]
+        }
+    
+    def _max_heven(self, values):
+        """بیشترین زمان (HHMMSS) در یک مجموعه مقدار متنی"""
+        hevens = [int(v) for v in values if str(v).isdigit()]
+        return max(hevens, default=self.market_watch_heven)
+    
+    def _market_watch_url(self, heven, refid):
+        """ساخت آدرس MarketWatchPlus با پارامترهای h و r"""
+        parts = urlsplit(self.config.settings["data_url"])
+        query = dict(parse_qsl(parts.query))
+        query['h'] = str(heven)
+        query['r'] = str(refid)
+        return urlunsplit(parts._replace(query=urlencode(query)))
+    
+    def refresh_market_watch(self):
+        """به‌روزرسانی افزایشی raw_data با ردیف‌های تغییر کرده از آخرین h/r"""
+        # بدون داده پایه فقط MarketWatch کامل دریافت می‌شود (دلار و طلا ربطی به پایش ندارند)
+        if self.raw_data is None:
+            return self._fetch_market_watch()
+        
+        try:
+            url = self._market_watch_url(self.market_watch_heven, self.market_watch_refid)
+            response = self.get_session().get(url, timeout=30)
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            
+            sections = response.text.split('@')
+            if len(sections) < 3:
+                return False, "داده ناقص است"
+            
+            rows = [r.strip() for r in sections[2].split(';') if r.strip()]
+            
+            with self._data_lock:
+                changed = self._apply_instrument_changes(rows)
+                
+                if len(sections) > 3 and sections[3].strip():
+                    self._apply_best_limit_changes(self._parse_best_limits(sections[3]))
+                
+                if len(sections) > 4 and sections[4].strip().isdigit():
+                    self.market_watch_refid = int(sections[4].strip())
+            
+            self.logger.debug(f"به‌روزرسانی افزایشی: {changed} نماد، {len(response.content)} بایت")
+            return True, f"{changed} نماد به‌روزرسانی شد"
+            
+        except Exception as e:
+            self.logger.error(f"خطا در به‌روزرسانی افزایشی: {e}")
             return False, str(e)
     
+    def _apply_instrument_changes(self, rows):
+        """اعمال ردیف‌های کوتاه (تغییر قیمت) و کامل (نماد جدید یا تغییر یافته) روی raw_data"""
+        delta_labels = []
+        delta_records = []
+        full_rows = []
+        hevens = []
+        
+        for row in rows:
+            fields = row.split(',')
+            if len(fields) > len(MARKET_WATCH_DELTA_FIELDS):
+                full_rows.append(row)
+                hevens.append(fields[4])
+            elif len(fields) == len(MARKET_WATCH_DELTA_FIELDS):
+                hevens.append(fields[1])
+                label = self._inscode_index.get(fields[0])
+                if label is None:
+                    continue
+                delta_labels.append(label)
+                delta_records.append({name: fields[idx] for idx, name in MARKET_WATCH_DELTA_FIELDS.items() if idx > 0})
+        
+        changes = []
+        if delta_records:
+            changes.append(pd.DataFrame(delta_records, index=delta_labels))
+        
+        new_rows = None
+        reclassified = False
+        if full_rows:
+            full = self._parse_instrument_rows(full_rows, start_row=len(self.raw_data) + 1)
+            known = full['کد_داخلی'].isin(self._inscode_index.keys())
+            
+            existing = full[known].drop(columns=['ردیف'])
+            existing.index = existing['کد_داخلی'].map(self._inscode_index)
+            changes.append(existing)
+            
+            # تغییر بازار، صنعت یا نماد یک ردیف موجود شمارش‌ها و فیلترها را عوض می‌کند
+            if not existing.empty:
+                before = self.raw_data.loc[existing.index, list(CLASSIFICATION_COLUMNS)].astype(str)
+                reclassified = not before.equals(existing[list(CLASSIFICATION_COLUMNS)].astype(str))
+            
+            new_rows = full[~known]
+        
+        if changes:
+            update = pd.concat(changes)
+            update = update[~update.index.duplicated(keep='last')]
+            
+            # ویرایش در محل؛ filtered_data زیرمجموعه‌ای از همان برچسب‌هاست
+            self.raw_data.update(update)
+            if self.filtered_data is not None:
+                self.filtered_data.update(update)
+        
+        added = new_rows is not None and not new_rows.empty
+        if added:
+            start = self.raw_data.index.max() + 1
+            new_rows.index = range(start, start + len(new_rows))
+            self.raw_data = pd.concat([self.raw_data, new_rows])
+            self._reset_inscode_index()
+        
+        if added or reclassified:
+            self._build_symbol_counts()
+            # عضویت filtered_data با فیلترهای فعلی از نو ساخته می‌شود (نماد جدید یا جابه‌جا شده)
+            if self.filtered_data is not None:
+                self.filtered_data = self.raw_data[self._filter_mask(self.raw_data)].copy()
+        
+        self.market_watch_heven = self._max_heven(hevens)
+        
+        return len(delta_records) + len(full_rows)
+    
+    def _apply_best_limit_changes(self, changes):
+        """ادغام ردیف‌های تغییر کرده مظنه با جدول فعلی"""
+        if changes is None or changes.empty:
+            return
+        
+        if self.best_limits is None or self.best_limits.empty:
+            self.best_limits = changes
+        else:
+            self.best_limits = changes.combine_first(self.best_limits)[self.best_limits.columns]
+        
+        self.top_of_book.update(self._build_top_of_book(changes))
+    
+    def is_watching(self):
+        return (self._watch_thread is not None and self._watch_thread.is_alive()
+                and not self._watch_stop.is_set())
+    
+    def start_watch(self, interval=None, on_update=None):
+        """شروع حالت پایش: به‌روزرسانی افزایشی دوره‌ای در رشته جداگانه"""
+        if self.is_watching():
+            return False
+        
+        if interval is None:
+            interval = self.config.settings.get("watch_interval", 5)
+        
+        # هر دور پایش رویداد توقف خودش را دارد تا شروع دوباره منتظر پایان درخواست دور قبل نماند
+        stop = threading.Event()
+        
+        def watch_loop():
+            while not stop.wait(interval):
+                success, message = self.refresh_market_watch()
+                if on_update and not stop.is_set():
+                    on_update(success, message)
+        
+        self._watch_stop = stop
+        self._watch_thread = threading.Thread(target=watch_loop, daemon=True)
+        self._watch_thread.start()
+        self.logger.info(f"حالت پایش فعال شد (هر {interval} ثانیه)")
+        return True
+    
+    def stop_watch(self, timeout=5):
+        """توقف حالت پایش (timeout=0: بدون انتظار برای پایان درخواست در جریان)"""
+        self._watch_stop.set()
+        if self._watch_thread is not None and timeout:
+            self._watch_thread.join(timeout=timeout)
+        self.logger.info("حالت پایش متوقف شد")
+    
+    def _filter_mask(self, df):
+        """ماسک ردیف‌هایی از df که از فیلترهای فعلی بازار، معاملات بلوکی و صنعت عبور می‌کنند"""
+        mask = pd.Series(True, index=df.index)
+        if self.selected_markets:
+            mask &= df['کد_بازار'].astype(str).isin(self.selected_markets)
+            if self.remove_block_trades:
+                mask &= self._regular_symbol_mask(df)
+            if self.selected_industries:
+                mask &= df['گروه_صنعت'].astype(str).isin(self.selected_industries)
+        return mask
+    
     def get_market_codes(self):
         """دریافت لیست کدهای بازار"""
         if self.raw_data is None or 'کد_بازار' not in self.raw_data.columns:
             return []
         
-        market_counts = self.raw_data['کد_بازار'].value_counts()
+        market_counts = {}
+        for (market, _, _), count in self.symbol_counts.items():
+            market_counts[market] = market_counts.get(market, 0) + count
+        
         result = []
         
-        for code, count in market_counts.items():
-            code_str = str(code)
+        for code_str, count in market_counts.items():
             label = MARKET_LABELS.get(code_str, 'نامشخص')
             bold = code_str in ['300', '303', '309', '313', '400', '403', '404']
             default_selected = code_str in self.config.settings.get('default_markets', [])
@@ -421,7 +961,7 @@ class DataLoader:
             result.append({
                 'code': code_str,
                 'label': label,
-                'count': int(count),
+                'count': count,
                 'bold': bold,
                 'default_selected': default_selected
             })
@@ -431,33 +971,30 @@ class DataLoader:
         return result
     
     def get_industries(self):
-        """دریافت لیست صنایع"""
+        """دریافت لیست صنایع (تعداد نمادها در محدوده فیلتر بازار فعلی)"""
         if self.raw_data is None or 'گروه_صنعت' not in self.raw_data.columns:
             return []
         
-        industries = []
+        markets = set(self.selected_markets) if self.selected_markets else None
+        remove_block = self.remove_block_trades and markets is not None
+        
+        industry_counts = {}
+        for (market, industry, regular), count in self.symbol_counts.items():
+            if markets is not None and market not in markets:
+                continue
+            if remove_block and not regular:
+                continue
+            industry_counts[industry] = industry_counts.get(industry, 0) + count
         
-        # گروه‌بندی بر اساس کد صنعت
-        for code, name in INDUSTRY_MAP.items():
-            count = len(self.raw_data[self.raw_data['گروه_صنعت'] == code])
-            if count > 0:
-                industries.append({
-                    'code': code,
-                    'name': name,
-                    'count': count
-                })
-        
-        # اضافه کردن صنایع دیگر که در نگاشت نیستند
-        unique_codes = self.raw_data['گروه_صنعت'].unique()
-        for code in unique_codes:
-            code_str = str(code)
-            if code_str not in INDUSTRY_MAP and code_str.strip():
-                count = len(self.raw_data[self.raw_data['گروه_صنعت'] == code])
-                industries.append({
-                    'code': code_str,
-                    'name': code_str,
-                    'count': count
-                })
+        industries = []
+        for code, count in industry_counts.items():
+            if not code.strip():
+                continue
+            industries.append({
+                'code': code,
+                'name': INDUSTRY_MAP.get(code, code),
+                'count': count
+            })
         
         # مرتب‌سازی بر اساس نام
         industries.sort(key=lambda x: x['name'])
@@ -465,61 +1002,69 @@ class DataLoader:
     
     def apply_market_filter(self, selected_codes, remove_block_trades=True):
         """اعمال فیلتر بازار"""
-        if self.raw_data is None:
-            return False, "داده‌ای وجود ندارد"
-        
-        self.selected_markets = selected_codes
-        
-        # فیلتر بر اساس کد بازار
-        self.filtered_data = self.raw_data[
-            self.raw_data['کد_بازار'].astype(str).isin(selected_codes)
-        ].copy()
-        
-        # حذف معاملات بلوکی
-        if remove_block_trades:
-            # نمادهایی که شناسه بین‌المللی به 0001 ختم نمی‌شود
-            mask = self.filtered_data['کد_بین_المللی'].astype(str).str.endswith('0001')
-            # همچنین حذف نمادهایی که با عدد پایان می‌یابند
-            mask = mask & ~self.filtered_data['نماد'].astype(str).str[-1].str.isdigit()
-            self.filtered_data = self.filtered_data[mask]
+        with self._data_lock:
+            if self.raw_data is None:
+                return False, "داده‌ای وجود ندارد"
+            
+            self.selected_markets = selected_codes
+            self.remove_block_trades = remove_block_trades
+            
+            # فیلتر بر اساس کد بازار
+            self.filtered_data = self.raw_data[
+                self.raw_data['کد_بازار'].astype(str).isin(selected_codes)
+            ].copy()
+            
+            # حذف معاملات بلوکی
+            if remove_block_trades:
+                self.filtered_data = self.filtered_data[self._regular_symbol_mask(self.filtered_data)]
+            
+            count = len(self.filtered_data)
         
-        self.logger.info(f"پس از فیلتر بازار: {len(self.filtered_data)} نماد")
-        return True, f"{len(self.filtered_data)} نماد"
+        self.logger.info(f"پس از فیلتر بازار: {count} نماد")
+        return True, f"{count} نماد"
     
     def apply_industry_filter(self, selected_industries):
         """اعمال فیلتر صنعت"""
-        if self.filtered_data is None:
-            return False, "ابتدا فیلتر بازار را اعمال کنید"
-        
-        self.selected_industries = selected_industries
+        with self._data_lock:
+            if self.filtered_data is None:
+                return False, "ابتدا فیلتر بازار را اعمال کنید"
+            
+            self.selected_industries = selected_industries
+            
+            if selected_industries:
+                self.filtered_data = self.filtered_data[
+                    self.filtered_data['گروه_صنعت'].astype(str).isin(selected_industries)
+                ].copy()
+            
+            count = len(self.filtered_data)
         
-        if selected_industries:
-            self.filtered_data = self.filtered_data[
-                self.filtered_data['گروه_صنعت'].astype(str).isin(selected_industries)
-            ].copy()
+        self.logger.info(f"پس از فیلتر صنعت: {count} نماد")
+        return True, f"{count} نماد"
+    
+    def get_symbol_columns(self, columns=SYMBOL_COLUMNS):
+        """دریافت ستون‌های لیست نمادها به صورت لیست (یک لیست برای هر ستون)"""
+        with self._data_lock:
+            df = self.filtered_data
+        if df is None:
+            return {}
         
-        self.logger.info(f"پس از فیلتر صنعت: {len(self.filtered_data)} نماد")
-        return True, f"{len(self.filtered_data)} نماد"
+        # هر ستون با یک فراخوانی tolist خوانده می‌شود (بدون پیمایش ردیف به ردیف)
+        result = {'ردیف': (df.index + 1).tolist()}
+        for column in columns:
+            if column in df.columns:
+                result[column] = df[column].fillna('').tolist()
+            else:
+                result[column] = [''] * len(df)
+        return result
     
     def get_symbols(self):
         """دریافت لیست نمادها"""
-        if self.filtered_data is None:
+        columns = self.get_symbol_columns()
+        if not columns:
             return []
         
-        symbols = []
-        for idx, row in self.filtered_data.iterrows():
-            symbols.append({
-                'ردیف': idx + 1,
-                'نماد': row.get('نماد', ''),
-                'نام_شرکت': row.get('نام_شرکت', ''),
-                'کد_بین_المللی': row.get('کد_بین_المللی', ''),
-                'کد_داخلی': row.get('کد_داخلی', ''),
-                'کد_بازار': row.get('کد_بازار', ''),
-                'گروه_صنعت': row.get('گروه_صنعت', ''),
-                'نام_صنعت': row.get('نام_صنعت', '')
-            })
-        
-        return symbols
+        keys = list(columns.keys())
+        return [dict(zip(keys, values)) for values in zip(*columns.values())]
     
     def get_symbol_info(self, symbol):
         """دریافت اطلاعات کامل یک نماد"""
@@ -0,0 +1,243 @@
+# download_pipeline.py
+"""خط لوله دانلود نمادها با صف‌های محدود بین مراحل
+
+    دریافت (رشته‌های I/O) ← ترکیب (پردازه‌ها یا رشته‌ها) ← انتخاب ستون‌ها ← نوشتن
+
+هر مرحله کارگرهای خودش را دارد و صف بین مراحل اندازه محدود دارد؛ اگر دیسک
+یا CPU کند باشد put مرحله قبل منتظر می‌ماند و داده در حافظه انباشته نمی‌شود.
+"""
+import queue
+import logging
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import lazy_import
+
+pd = lazy_import('pandas')
+
+# نشانه پایان ورودی یک مرحله
+_DONE = object()
+
+# مراحلی که با stop لغو می‌شوند (نوشتن‌های در جریان کامل می‌شوند)
+_CANCELLABLE_STAGES = ('fetch', 'transform')
+
+# مهلت get/put صف‌ها تا کارگر منتظر هم توقف را ببیند (ثانیه)
+_QUEUE_POLL = 0.1
+
+
+class SymbolJob:
+    """وضعیت یک نماد در طول خط لوله"""
+
+    __slots__ = ('symbol', 'internal_code', 'payloads', 'frame', 'message', 'error', 'cancelled')
+
+    def __init__(self, symbol: str, internal_code: str):
+        self.symbol = symbol
+        self.internal_code = internal_code
+        self.payloads = None  # پاسخ‌های خام: نوع -> (منبع، بایت‌ها)
+        self.frame = None  # DataFrame یا آرایه‌های ستونی پردازه ترکیب
+        self.message = None  # پیام مرحله نوشتن
+        self.error = None
+        self.cancelled = False
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and not self.cancelled
+
+
+class DownloadPipeline:
+    """اجرای مراحل دانلود برای لیستی از (نماد، کد داخلی)
+
+    columns: ستون‌های خروجی (None یعنی همه ستون‌ها)
+    writer: تابع (نماد، DataFrame) -> پیام؛ None یعنی بدون مرحله نوشتن
+    خروجی run به ترتیب پایان نمادها است و نمادهای لغو شده را شامل نمی‌شود.
+    """
+
+    def __init__(self, downloader, symbols_data: List[Tuple[str, str]], apply_adjustment: bool = True,
+                 columns: Optional[List[str]] = None, writer: Optional[Callable] = None):
+        self.downloader = downloader
+        self.symbols_data = symbols_data
+        self.apply_adjustment = apply_adjustment
+        self.columns = columns
+        self.writer = writer
+        self.logger = logging.getLogger(__name__)
+
+        settings = downloader.config.settings if downloader.config is not None else {}
+        self.queue_size = max(1, int(settings.get("pipeline_queue_size", 16)))
+        self.fetch_workers = max(1, downloader.max_workers)
+        # ارسال به پردازه‌ها (pickle داده‌ها) فقط برای دسته‌های بزرگ می‌ارزد
+        use_processes = len(symbols_data) > 1 and len(symbols_data) >= downloader.get_cpu_min_symbols()
+        self.pool_workers = downloader.get_cpu_workers() if use_processes else 0
+        self.cpu_workers = min(self.pool_workers, len(symbols_data))
+        self.transform_workers = self.cpu_workers or self.fetch_workers
+        self.write_workers = max(1, int(settings.get("write_workers", 2)))
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._cpu_pool = None
+
+    def stop(self):
+        """لغو نمادهایی که هنوز دریافت یا ترکیب نشده‌اند؛ نوشتن‌های در جریان کامل می‌شوند"""
+        self._stop.set()
+
+    # ---------- مراحل ----------
+
+    def _fetch(self, job: SymbolJob):
+        job.payloads = self.downloader.fetch_symbol_payloads(job.symbol, job.internal_code,
+                                                             self.apply_adjustment, cancel=self._stop)
+        # تاخیر بین درخواست‌ها فقط وقتی واقعاً به شبکه رفته‌ایم (پاسخ کامل یا 304)؛ stop آن را قطع می‌کند
+        if any(source in ('network', 'revalidated') for source, _ in job.payloads.values()):
+            self._stop.wait(self.downloader.delay_between_requests)
+
+    def _transform(self, job: SymbolJob):
+        payloads, job.payloads = job.payloads, None
+        if self._cpu_pool is None:
+            success, result = self.downloader.assemble_payloads(job.symbol, job.internal_code,
+                                                                payloads, self.apply_adjustment)
+        else:
+            from downloader import assemble_in_worker
+            future = self._cpu_pool.submit(assemble_in_worker, job.symbol, job.internal_code,
+                                           payloads, self.apply_adjustment)
+            success, result, timings = future.result()
+            for name, seconds in timings.items():
+                self.downloader._record_stage(name, seconds, job.symbol)
+
+        if not success:
+            job.error = result
+            return
+        job.frame = result
+
+    def _select(self, job: SymbolJob):
+        frame = job.frame
+        if isinstance(frame, dict):
+            # آرایه‌های ستونی پردازه ترکیب؛ فقط ستون‌های لازم به DataFrame تبدیل می‌شوند
+            columns = frame['columns']
+            if self.columns is not None:
+                wanted = set(self.columns)
+                columns = [col for col in columns if col in wanted]
+            arrays = dict(zip(frame['columns'], frame['arrays']))
+            with self.downloader.stage('dataframe', job.symbol):
+                frame = pd.DataFrame({col: arrays[col] for col in columns}, columns=columns)
+
+        if self.columns is not None:
+            available_columns = [col for col in self.columns if col in frame.columns]
+            if available_columns:
+                frame = frame[available_columns]
+            else:
+                self.logger.warning("هیچ ستون انتخابی برای %s موجود نیست", job.symbol)
+
+        if frame.empty:
+            job.error = "داده‌ای دریافت نشد"
+            return
+        job.frame = frame
+
+    def _write(self, job: SymbolJob):
+        job.message = self.writer(job.symbol, job.frame)
+
+    # ---------- اجرا ----------
+
+    def _cancel_if_stopped(self, name: str, job: SymbolJob) -> bool:
+        """لغو نماد در مراحل قابل لغو پس از stop (نماد لغو شده به مرحله بعد نمی‌رود)"""
+        if name in _CANCELLABLE_STAGES and self._stop.is_set():
+            job.cancelled = True
+        return job.cancelled
+
+    def _put(self, name: str, outbox: queue.Queue, job: SymbolJob):
+        """put روی صف پر تا خالی شدن جا صبر می‌کند (فشار برگشتی)، مگر اینکه در این مدت لغو شود"""
+        while True:
+            try:
+                outbox.put(job, timeout=_QUEUE_POLL)
+                return
+            except queue.Full:
+                if self._cancel_if_stopped(name, job):
+                    return
+
+    def _run_stage(self, name: str, func: Callable, inbox: queue.Queue, outbox: queue.Queue,
+                   remaining: Dict[str, int], next_workers: int):
+        """کارگر یک مرحله؛ آخرین کارگر پایان را به همه کارگرهای مرحله بعد اعلام می‌کند"""
+        while True:
+            # ورودی fetch از پیش پر است؛ پس از stop بقیه آن برداشته نمی‌شود
+            if name == 'fetch' and self._stop.is_set():
+                break
+            try:
+                job = inbox.get(timeout=_QUEUE_POLL)
+            except queue.Empty:
+                continue
+            if job is _DONE:
+                break
+
+            if self._cancel_if_stopped(name, job):
+                continue
+            if job.success:
+                try:
+                    func(job)
+                except Exception as e:
+                    self.logger.error(f"خطا در مرحله {name} برای {job.symbol}: {e}")
+                    job.error = f"خطا: {str(e)}"
+
+            # نمادی که حین دریافت یا ترکیب لغو شد نتیجه ناقص دارد
+            if self._cancel_if_stopped(name, job):
+                continue
+            self._put(name, outbox, job)
+
+        with self._lock:
+            remaining[name] -= 1
+            last = remaining[name] == 0
+        if last:
+            # مرحله بعد همیشه تا _DONE مصرف می‌کند؛ put بدون مهلت امن است
+            for _ in range(next_workers):
+                outbox.put(_DONE)
+
+    def run(self) -> Iterator[SymbolJob]:
+        """اجرای خط لوله و بازگرداندن نمادها به ترتیب پایان"""
+        stages = [
+            ('fetch', self._fetch, self.fetch_workers),
+            ('transform', self._transform, self.transform_workers),
+            ('select', self._select, 1),
+        ]
+        if self.writer is not None:
+            stages.append(('write', self._write, self.write_workers))
+
+        # ورودی از قبل در حافظه است؛ صف‌های بعدی محدودند
+        inbox = queue.Queue()
+        for symbol, internal_code in self.symbols_data:
+            inbox.put(SymbolJob(symbol, internal_code))
+        for _ in range(self.fetch_workers):
+            inbox.put(_DONE)
+
+        queues = [inbox] + [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        remaining = {name: workers for name, _, workers in stages}
+
+        if self.cpu_workers > 0:
+            # pool مشترک دانلودر؛ پردازه‌ها بین دسته‌ها زنده می‌مانند
+            self._cpu_pool = self.downloader.get_cpu_pool(self.pool_workers)
+
+        threads = []
+        for index, (name, func, workers) in enumerate(stages):
+            next_workers = stages[index + 1][2] if index + 1 < len(stages) else 1
+            for number in range(workers):
+                thread = threading.Thread(
+                    target=self._run_stage,
+                    args=(name, func, queues[index], queues[index + 1], remaining, next_workers),
+                    name=f"pipeline-{name}-{number}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        try:
+            results = queues[-1]
+            while True:
+                job = results.get()
+                if job is _DONE:
+                    break
+                if not job.cancelled:
+                    yield job
+        finally:
+            # توقف زودهنگام مصرف‌کننده: بقیه نمادها لغو و صف خروجی تخلیه می‌شود
+            self._stop.set()
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    queues[-1].get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._cpu_pool = None
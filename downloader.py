@@ -1,139 +1,98 @@
 # downloader.py
 import requests
 import pandas as pd
+import numpy as np
 import json
 import time
 import os
 import re
 from datetime import datetime, timedelta
 import logging
+import threading
+from contextlib import contextmanager
 from typing import Dict, List, Tuple, Optional, Any
 import concurrent.futures
+import multiprocessing
 from tqdm import tqdm
 import warnings
+from cache_store import CacheEntry, CacheManager, DiskCache, MemoryCache, format_cache_stats
+from config import atomic_file, atomic_write
+from download_pipeline import DownloadPipeline
+from market_calendar import MarketCalendar
 warnings.filterwarnings('ignore')
 
-class Downloader:
-    def __init__(self, config, data_loader):
-        self.config = config
-        self.data_loader = data_loader
-        self.logger = logging.getLogger(__name__)
-        self.is_downloading = False
-        self.session = None
-        self.cache_dir = "cache"
-        self.setup_cache()
-        
-        # تنظیمات دانلود
-        self.max_retries = 3
-        self.timeout = 30
-        self.delay_between_requests = 0.1  # ثانیه
-        self.max_workers = 5  # حداکثر thread برای دانلود موازی
-        
-        # آمار دانلود
-        self.download_stats = {
-            'total': 0,
-            'successful': 0,
-            'failed': 0,
-            'skipped': 0,
-            'start_time': None,
-            'end_time': None
-        }
-    
-    def setup_cache(self):
-        """راه‌اندازی سیستم کش"""
-        if not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
-    
-    def get_session(self):
-        """دریافت session برای اتصالات مکرر"""
-        if self.session is None:
-            self.session = requests.Session()
-            # تنظیم headers برای شبیه‌سازی مرورگر
-            self.session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'application/json, text/plain, */*',
-                'Accept-Language': 'fa-IR,fa;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-            })
-        return self.session
+# مراحل زمان‌سنجی خط لوله دانلود (به ترتیب نمایش در جدول خلاصه)
+STAGE_LABELS = {
+    'cache_lookup': 'جستجوی کش',
+    'network_client': 'شبکه - حقیقی/حقوقی',
+    'network_price': 'شبکه - قیمت',
+    'network_adjustment': 'شبکه - تعدیل',
+    'json_decode': 'تبدیل JSON',
+    'cache_write': 'ذخیره کش',
+    'parse': 'پردازش داده خام',
+    'alignment': 'تطبیق',
+    'adjustment': 'تعدیل',
+    'currency_columns': 'ستون‌های دلار و طلا',
+    'records': 'ساخت رکوردها',
+    'dataframe': 'ساخت DataFrame',
+    'file_write': 'نوشتن فایل'
+}
+
+# نقاط دریافت داده هر نماد: نوع -> (پیشوند کش، مرحله شبکه، عنوان)
+# اعتبار کش همه نقاط تا پایان جلسه معاملاتی بعدی است (MarketCalendar)
+SYMBOL_ENDPOINTS = {
+    'client': ('client', 'network_client', 'حقیقی/حقوقی'),
+    'price': ('price', 'network_price', 'قیمت'),
+    'adjustment': ('adjustment', 'network_adjustment', 'تعدیل')
+}
+
+class SymbolAssembler:
+    """مرحله CPU دانلود یک نماد: پردازش، تطبیق، تعدیل و ساخت DataFrame بدون شبکه و کش
     
-    def close_session(self):
-        """بستن session"""
-        if self.session:
-            self.session.close()
-            self.session = None
+    فقط داده دلار و طلا (DataLoader یا CurrencySnapshot) را می‌گیرد تا پردازه‌های ترکیب
+    بدون ساختن پوشه کش، session و آمار کش راه‌اندازی شوند.
+    """
     
-    def _retry_request(self, url, max_retries=None, method='GET', **kwargs):
-        """درخواست با قابلیت تلاش مجدد"""
-        if max_retries is None:
-            max_retries = self.max_retries
+    def __init__(self, currency):
+        self.currency = currency
+        self.logger = logging.getLogger(__name__)
         
-        session = self.get_session()
+        # زمان‌سنجی مراحل: مجموع هر مرحله و ریز زمان هر نماد
+        self._stage_context = threading.local()
+        self._timing_lock = threading.Lock()
+        self.stage_totals = {}  # مرحله -> [مجموع ثانیه، تعداد]
+        self.symbol_timings = {}  # نماد -> {مرحله: ثانیه}
         
-        for attempt in range(max_retries):
-            try:
-                if method.upper() == 'GET':
-                    response = session.get(url, timeout=self.timeout, **kwargs)
-                elif method.upper() == 'POST':
-                    response = session.post(url, timeout=self.timeout, **kwargs)
-                else:
-                    raise ValueError(f"Method {method} not supported")
-                
-                response.raise_for_status()
-                return response
-                
-            except requests.exceptions.Timeout:
-                self.logger.warning(f"Timeout در تلاش {attempt + 1}/{max_retries} برای {url}")
-                if attempt == max_retries - 1:
-                    raise
-                time.sleep(2 ** attempt)  # افزایش تاخیر به صورت نمایی
-                
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"خطا در تلاش {attempt + 1}/{max_retries} برای {url}: {e}")
-                if attempt == max_retries - 1:
-                    raise
-                time.sleep(1)
-        
-        return None
+        # آرایه‌های مرتب دلار و طلا: ستون قیمت -> (DataFrame مبدأ، تاریخ‌ها، قیمت‌ها)
+        self._currency_arrays = {}
     
-    def _get_cached_data(self, cache_key: str, expiration_hours: int = 24) -> Optional[Any]:
-        """دریافت داده از کش"""
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-        
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                
-                # بررسی تاریخ انقضا
-                cache_time = datetime.fromisoformat(cache_data.get('timestamp', '2000-01-01'))
-                if datetime.now() - cache_time < timedelta(hours=expiration_hours):
-                    return cache_data.get('data')
-                else:
-                    self.logger.debug(f"داده کش {cache_key} منقضی شده است")
-                    os.remove(cache_file)
-                    
-            except Exception as e:
-                self.logger.warning(f"خطا در خواندن کش {cache_key}: {e}")
-        
-        return None
+    def reset_stage_timings(self):
+        """پاک کردن زمان‌سنجی مراحل برای یک اجرای جدید"""
+        with self._timing_lock:
+            self.stage_totals = {}
+            self.symbol_timings = {}
     
-    def _save_to_cache(self, cache_key: str, data: Any):
-        """ذخیره داده در کش"""
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-        
+    def _record_stage(self, name: str, seconds: float, symbol: Optional[str] = None):
+        """ثبت زمان یک مرحله (نماد پیش‌فرض: نماد در حال پردازش همین رشته)"""
+        if symbol is None:
+            symbol = getattr(self._stage_context, 'symbol', None)
+        
+        with self._timing_lock:
+            total = self.stage_totals.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+            if symbol:
+                stages = self.symbol_timings.setdefault(symbol, {})
+                stages[name] = stages.get(name, 0.0) + seconds
+    
+    @contextmanager
+    def stage(self, name: str, symbol: Optional[str] = None):
+        """زمان‌سنجی یک مرحله: with self.stage('alignment'): ..."""
+        start = time.perf_counter()
         try:
-            cache_data = {
-                'timestamp': datetime.now().isoformat(),
-                'data': data
-            }
-            
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            self.logger.warning(f"خطا در ذخیره کش {cache_key}: {e}")
+            yield
+        finally:
+            self._record_stage(name, time.perf_counter() - start, symbol)
     
     def _deven_to_yyyymmdd(self, deven: int) -> str:
         """تبدیل dEven به تاریخ میلادی YYYYMMDD"""
@@ -298,7 +257,7 @@ class Downloader:
                         if self._check_volume_match(next_client_vol, price_vol, 0.95):
                             # حذف از client
                             for _ in range(offset):
-                                self.logger.debug(f"حذف ردیف {i} از client برای {symbol}")
+                                self.logger.debug("حذف ردیف %d از client برای %s", i, symbol)
                                 i += 1
                             matched_client.append(client_items[i])
                             matched_price.append(price_item)
@@ -313,7 +272,7 @@ class Downloader:
                         if self._check_volume_match(client_vol, next_price_vol, 0.95):
                             # حذف از price
                             for _ in range(offset):
-                                self.logger.debug(f"حذف ردیف {j} از price برای {symbol}")
+                                self.logger.debug("حذف ردیف %d از price برای %s", j, symbol)
                                 j += 1
                             matched_client.append(client_item)
                             matched_price.append(price_records[j])
@@ -324,7 +283,7 @@ class Downloader:
                 
                 if not found:
                     # اگر تطابقی پیدا نشد، هر دو را رد کنیم
-                    self.logger.debug(f"رد ردیف‌های {i},{j} برای {symbol}")
+                    self.logger.debug("رد ردیف‌های %d,%d برای %s", i, j, symbol)
                     i += 1
                     j += 1
         
@@ -358,50 +317,12 @@ class Downloader:
             perfect_percent = (perfect_matches / total) * 100
             good_percent = (good_matches / total) * 100
             
-            self.logger.info(f"نماد {symbol}: تطابق عالی {perfect_percent:.1f}% ({perfect_matches}/{total})")
-            self.logger.info(f"نماد {symbol}: تطابق خوب {good_percent:.1f}% ({good_matches}/{total})")
+            self.logger.info("نماد %s: تطابق عالی %.1f%% (%d/%d)", symbol, perfect_percent, perfect_matches, total)
+            self.logger.info("نماد %s: تطابق خوب %.1f%% (%d/%d)", symbol, good_percent, good_matches, total)
             
             if perfect_percent < 50:
                 self.logger.warning(f"کیفیت تطابق برای {symbol} پایین است")
     
-    def download_adjustment_data(self, internal_code: str, use_cache: bool = True) -> Optional[Dict]:
-        """دانلود داده‌های تعدیل سهام"""
-        cache_key = f"adjustment_{internal_code}"
-        
-        if use_cache:
-            cached_data = self._get_cached_data(cache_key, expiration_hours=168)  # 7 روز کش
-            if cached_data is not None:
-                self.logger.debug(f"داده تعدیل {internal_code} از کش بازیابی شد")
-                return cached_data
-        
-        try:
-            url = f"https://cdn.tsetmc.com/api/Instrument/GetInstrumentShareChange/{internal_code}"
-            self.logger.debug(f"دریافت داده تعدیل از: {url}")
-            
-            response = self._retry_request(url)
-            
-            if response is None:
-                self.logger.error(f"خطا در دریافت داده تعدیل برای {internal_code}")
-                return None
-            
-            data = response.json()
-            
-            # ذخیره در کش
-            if use_cache and data:
-                self._save_to_cache(cache_key, data)
-            
-            return data
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"خطا در دریافت داده تعدیل برای {internal_code}: {e}")
-            return None
-        except json.JSONDecodeError as e:
-            self.logger.error(f"خطا در پردازش JSON تعدیل برای {internal_code}: {e}")
-            return None
-        except Exception as e:
-            self.logger.error(f"خطای ناشناخته در دریافت داده تعدیل برای {internal_code}: {e}")
-            return None
-    
     def _parse_adjustment_data(self, adjustment_data: Dict) -> List[Dict]:
         """پردازش داده‌های تعدیل - اصلاح شده"""
         if not adjustment_data or 'instrumentShareChange' not in adjustment_data:
@@ -501,82 +422,6 @@ class Downloader:
             self.logger.error(f"خطا در اعمال تعدیل به رکورد: {e}")
             return record
     
-    def download_client_type_data(self, internal_code: str, use_cache: bool = True) -> Optional[Dict]:
-        """دانلود داده حقیقی/حقوقی با قابلیت کش"""
-        cache_key = f"client_{internal_code}"
-        
-        if use_cache:
-            cached_data = self._get_cached_data(cache_key, expiration_hours=6)
-            if cached_data is not None:
-                self.logger.debug(f"داده حقیقی/حقوقی {internal_code} از کش بازیابی شد")
-                return cached_data
-        
-        try:
-            url = self.config.settings["client_url"].format(inscode=internal_code)
-            self.logger.debug(f"دریافت داده حقیقی/حقوقی از: {url}")
-            
-            response = self._retry_request(url)
-            
-            if response is None:
-                self.logger.error(f"خطا در دریافت داده حقیقی/حقوقی برای {internal_code}")
-                return None
-            
-            data = response.json()
-            
-            # ذخیره در کش
-            if use_cache and data:
-                self._save_to_cache(cache_key, data)
-            
-            return data
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"خطا در دریافت داده حقیقی/حقوقی برای {internal_code}: {e}")
-            return None
-        except json.JSONDecodeError as e:
-            self.logger.error(f"خطا در پردازش JSON برای {internal_code}: {e}")
-            return None
-        except Exception as e:
-            self.logger.error(f"خطای ناشناخته در دریافت داده حقیقی/حقوقی برای {internal_code}: {e}")
-            return None
-    
-    def download_price_data(self, internal_code: str, use_cache: bool = True) -> Optional[Dict]:
-        """دانلود داده قیمت با قابلیت کش"""
-        cache_key = f"price_{internal_code}"
-        
-        if use_cache:
-            cached_data = self._get_cached_data(cache_key, expiration_hours=6)
-            if cached_data is not None:
-                self.logger.debug(f"داده قیمت {internal_code} از کش بازیابی شد")
-                return cached_data
-        
-        try:
-            url = self.config.settings["price_url"].format(inscode=internal_code)
-            self.logger.debug(f"دریافت داده قیمت از: {url}")
-            
-            response = self._retry_request(url)
-            
-            if response is None:
-                self.logger.error(f"خطا در دریافت داده قیمت برای {internal_code}")
-                return None
-            
-            data = response.json()
-            
-            # ذخیره در کش
-            if use_cache and data:
-                self._save_to_cache(cache_key, data)
-            
-            return data
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"خطا در دریافت داده قیمت برای {internal_code}: {e}")
-            return None
-        except json.JSONDecodeError as e:
-            self.logger.error(f"خطا در پردازش JSON برای {internal_code}: {e}")
-            return None
-        except Exception as e:
-            self.logger.error(f"خطای ناشناخته در دریافت داده قیمت برای {internal_code}: {e}")
-            return None
-    
     def _parse_price_data(self, price_data: Dict) -> List[Dict]:
         """پردازش داده قیمت و استخراج اطلاعات"""
         if not price_data or 'closingPriceChartData' not in price_data:
@@ -699,48 +544,93 @@ class Downloader:
         
         return metrics
     
-    def _calculate_new_columns(self, rec_date: str, pl_price: float) -> Dict:
-        """محاسبه ستون‌های جدید (دلار، طلا، 1000 دلار، 1 انس)"""
-        result = {
-            'dollar': 0,
-            'ounces_gold': 0,
-            'thousand_dollar': 0,
-            'one_ounce': 0
-        }
+    def _currency_series(self, df: pd.DataFrame, price_column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """تاریخ‌های مرتب و یکتا و قیمت‌های دلار یا طلا (تا تغییر DataFrame دوباره ساخته نمی‌شود)"""
+        cached = self._currency_arrays.get(price_column)
+        if cached is not None and cached[0] is df:
+            return cached[1], cached[2]
+        
+        dates = df['recDate'].astype(np.int64).to_numpy()
+        prices = df[price_column].to_numpy(dtype=np.float64)
+        order = np.argsort(dates, kind='stable')
+        dates, prices = dates[order], prices[order]
+        
+        # از تاریخ‌های تکراری اولین رکورد می‌ماند (مانند جستجوی دقیق DataLoader)
+        unique = np.ones(len(dates), dtype=bool)
+        unique[1:] = dates[1:] != dates[:-1]
+        dates, prices = dates[unique], prices[unique]
+        
+        self._currency_arrays[price_column] = (df, dates, prices)
+        return dates, prices
+    
+    def _currency_prices(self, df: Optional[pd.DataFrame], price_column: str,
+                         targets: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """قیمت همه تاریخ‌ها با یک searchsorted؛ همان نتیجه DataLoader.get_dollar_price برای هر تاریخ
+
+        تاریخ موجود: همان قیمت، بین دو تاریخ: درونیابی خطی، قبل از اولین یا بعد از آخرین تاریخ: نزدیک‌ترین قیمت
+        """
+        result = np.zeros(len(targets), dtype=np.int64)
+        if df is None or df.empty:
+            return result
+        
+        dates, prices = self._currency_series(df, price_column)
+        count = len(dates)
+        position = np.searchsorted(dates, targets)
+        after = np.minimum(position, count - 1)
+        before = np.maximum(position - 1, 0)
+        
+        exact = (position < count) & (dates[after] == targets)
+        span = dates[after] - dates[before]
+        ratio = (targets - dates[before]) / np.where(span > 0, span, 1)
+        values = prices[before] + ratio * (prices[after] - prices[before])
+        values = np.where(exact | (position == 0), prices[after], values)
+        values = np.where(position == count, prices[count - 1], values)
+        
+        # قیمت نامعتبر یا تاریخ غیرعددی مانند خطای جستجوی تکی صفر می‌شود
+        usable = valid & np.isfinite(values)
+        result[usable] = np.trunc(values[usable]).astype(np.int64)
+        return result
+    
+    def _calculate_new_columns(self, rec_dates: List, pl_prices: List[float]) -> Dict[str, List[int]]:
+        """محاسبه ستون‌های جدید (دلار، طلا، 1000 دلار، 1 انس) برای همه تاریخ‌ها با هم"""
+        count = len(rec_dates)
+        columns = ('dollar', 'ounces_gold', 'thousand_dollar', 'one_ounce')
         
         try:
-            # دریافت قیمت دلار برای تاریخ داده شده
-            dollar_price = self.data_loader.get_dollar_price(rec_date)
-            
-            # دریافت قیمت طلا برای تاریخ داده شده
-            gold_price = self.data_loader.get_gold_price(rec_date)
+            targets = np.zeros(count, dtype=np.int64)
+            valid = np.ones(count, dtype=bool)
+            for i, rec_date in enumerate(rec_dates):
+                try:
+                    targets[i] = int(str(rec_date))
+                except (ValueError, TypeError, OverflowError):
+                    valid[i] = False
             
-            # محاسبه ستون‌ها
-            result['dollar'] = int(dollar_price) if dollar_price else 0
-            result['ounces_gold'] = int(gold_price) if gold_price else 0
+            dollar = self._currency_prices(getattr(self.currency, 'dollar_data', None), 'dollar_close', targets, valid)
+            gold = self._currency_prices(getattr(self.currency, 'gold_data', None), 'gold_close', targets, valid)
+            pl = np.asarray(pl_prices, dtype=np.float64)
+            positive_pl = pl > 0
+            divisor = np.where(positive_pl, pl, 1.0)
             
             # محاسبه thousand_dollar: (دلار * 1000) / pl (گرد کردن به پایین)
-            if dollar_price > 0 and pl_price > 0:
-                result['thousand_dollar'] = int((dollar_price * 1000) // pl_price)
+            has_dollar = (dollar > 0) & positive_pl
+            thousand_dollar = np.where(has_dollar, (dollar * 1000) // divisor, 0).astype(np.int64)
             
             # محاسبه one_ounce: (طلا * دلار) / pl (گرد کردن به پایین)
-            if dollar_price > 0 and gold_price > 0 and pl_price > 0:
-                result['one_ounce'] = int((gold_price * dollar_price) // pl_price)
+            has_gold = has_dollar & (gold > 0)
+            one_ounce = np.where(has_gold, (gold * dollar) // divisor, 0).astype(np.int64)
+            
+            values = (dollar, gold, thousand_dollar, one_ounce)
+            return {name: column.tolist() for name, column in zip(columns, values)}
             
         except Exception as e:
-            self.logger.warning(f"خطا در محاسبه ستون‌های جدید برای تاریخ {rec_date}: {e}")
-        
-        return result
+            self.logger.warning(f"خطا در محاسبه ستون‌های جدید: {e}")
+            return {name: [0] * count for name in columns}
     
-    def download_symbol_data(self, symbol: str, internal_code: str, apply_adjustment: bool = True) -> Tuple[bool, Any]:
-        """دانلود و ترکیب داده‌های یک نماد با منطق صحیح تعدیل"""
+    def assemble_symbol_data(self, symbol: str, internal_code: str, client_data: Optional[Dict],
+                             price_data: Optional[Dict], adjustment_data: Optional[Dict],
+                             apply_adjustment: bool = True) -> Tuple[bool, Any]:
+        """ترکیب داده‌های دریافت شده یک نماد (بدون شبکه): پردازش، تطبیق، تعدیل و ساخت DataFrame"""
         try:
-            self.logger.info(f"شروع دانلود داده‌های {symbol} (کد: {internal_code}) - حالت تعدیل: {apply_adjustment}")
-            
-            # دانلود داده‌های اصلی
-            client_data = self.download_client_type_data(internal_code)
-            price_data = self.download_price_data(internal_code)
-            
             # بررسی دریافت داده‌ها
             if not client_data or 'clientType' not in client_data:
                 self.logger.error(f"داده حقیقی/حقوقی برای {symbol} دریافت نشد")
@@ -753,19 +643,20 @@ class Downloader:
             # دریافت و پردازش داده‌های تعدیل اگر فعال باشد
             adjustments = []
             if apply_adjustment:
-                adjustment_data = self.download_adjustment_data(internal_code)
                 if adjustment_data and 'instrumentShareChange' in adjustment_data:
-                    adjustments = self._parse_adjustment_data(adjustment_data)
+                    with self.stage('parse'):
+                        adjustments = self._parse_adjustment_data(adjustment_data)
                     if adjustments:
-                        self.logger.info(f"داده‌های تعدیل برای {symbol} بارگذاری شد: {len(adjustments)} رکورد")
+                        self.logger.info("داده‌های تعدیل برای %s بارگذاری شد: %d رکورد", symbol, len(adjustments))
                     else:
-                        self.logger.info(f"داده تعدیل برای {symbol} یافت نشد یا قابل پردازش نیست")
+                        self.logger.info("داده تعدیل برای %s یافت نشد یا قابل پردازش نیست", symbol)
                 else:
-                    self.logger.info(f"داده تعدیل برای {symbol} در دسترس نیست")
+                    self.logger.info("داده تعدیل برای %s در دسترس نیست", symbol)
             
             # پردازش داده‌ها
             client_items = client_data['clientType']
-            price_records = self._parse_price_data(price_data)
+            with self.stage('parse'):
+                price_records = self._parse_price_data(price_data)
             
             if not client_items:
                 self.logger.error(f"لیست حقیقی/حقوقی برای {symbol} خالی است")
@@ -776,9 +667,11 @@ class Downloader:
                 return False, "لیست قیمت خالی است"
             
             # تطبیق داده‌ها
-            self.logger.info(f"تطبیق داده‌های {symbol} ({len(client_items)} رکورد حقیقی/حقوقی، {len(price_records)} رکورد قیمت)")
+            self.logger.info("تطبیق داده‌های %s (%d رکورد حقیقی/حقوقی، %d رکورد قیمت)",
+                             symbol, len(client_items), len(price_records))
             
-            matched_client, matched_price = self._find_best_alignment(client_items, price_records, symbol)
+            with self.stage('alignment'):
+                matched_client, matched_price = self._find_best_alignment(client_items, price_records, symbol)
             
             if not matched_client or not matched_price:
                 self.logger.error(f"تطابقی برای {symbol} یافت نشد")
@@ -788,6 +681,18 @@ class Downloader:
             records = []
             min_length = min(len(matched_client), len(matched_price))
             
+            # ستون‌های دلار، طلا، 1000 دلار و 1 انس همه ردیف‌ها با یک جستجو
+            with self.stage('currency_columns'):
+                currency_columns = self._calculate_new_columns(
+                    [item.get('recDate', '') for item in matched_client[:min_length]],
+                    [item.get('pDrCotVal', 0) for item in matched_price[:min_length]]
+                )
+            
+            # زمان تعدیل داخل حلقه به صورت محلی جمع و یک بار ثبت می‌شود
+            perf_counter = time.perf_counter
+            adjustment_time = 0.0
+            records_start = perf_counter()
+            
             for i in range(min_length):
                 client_item = matched_client[i]
                 price_item = matched_price[i]
@@ -822,17 +727,14 @@ class Downloader:
                 }
                 
                 # اضافه کردن ستون‌های جدید (دلار، طلا، 1000 دلار، 1 انس)
-                new_columns = self._calculate_new_columns(
-                    client_record['recDate'], 
-                    price_item.get('pDrCotVal', 0)
-                )
-                record.update(new_columns)
+                record.update({name: column[i] for name, column in currency_columns.items()})
                 
                 # مقدار پیش‌فرض برای ضریب تعدیل
                 adjustment_ratio = 1.0
                 
                 # اعمال تعدیل اگر فعال باشد و داده‌های تعدیل وجود داشته باشند
                 if apply_adjustment and adjustments:
+                    stage_start = perf_counter()
                     rec_date = record['recDate']
                     
                     # محاسبه ضرایب تعدیل برای این تاریخ
@@ -840,8 +742,8 @@ class Downloader:
                     
                     if price_ratio != 1.0 or volume_ratio != 1.0:
                         self.logger.debug(
-                            f"اعمال تعدیل به {symbol} برای تاریخ {rec_date}: "
-                            f"price×{price_ratio:.6f}, volume×{volume_ratio:.6f}"
+                            "اعمال تعدیل به %s برای تاریخ %s: price×%.6f, volume×%.6f",
+                            symbol, rec_date, price_ratio, volume_ratio
                         )
                         
                         # اعمال تعدیل به رکورد
@@ -849,6 +751,8 @@ class Downloader:
                         
                         # ذخیره ضریب تعدیل
                         adjustment_ratio = price_ratio
+                    
+                    adjustment_time += perf_counter() - stage_start
                 
                 # همیشه ستون adjustment_ratio را اضافه می‌کنیم (حتی اگر 1.0 باشد)
                 record['adjustment_ratio'] = adjustment_ratio
@@ -859,8 +763,14 @@ class Downloader:
                 
                 records.append(record)
             
+            records_time = perf_counter() - records_start
+            if apply_adjustment and adjustments:
+                self._record_stage('adjustment', adjustment_time)
+            self._record_stage('records', records_time - adjustment_time)
+            
             # ایجاد DataFrame
             if records:
+                dataframe_start = perf_counter()
                 df = pd.DataFrame(records)
                 
                 # ترتیب ستون‌ها - adjustment_ratio در انتها
@@ -892,30 +802,48 @@ class Downloader:
                         df[col] = None
                 
                 df = df[output_columns]
+                self._record_stage('dataframe', perf_counter() - dataframe_start)
                 
                 # لاگ نتایج تعدیل
                 if apply_adjustment and adjustments:
                     # اطمینان از وجود ستون adjustment_ratio
                     if 'adjustment_ratio' in df.columns:
                         adjusted_rows = df[df['adjustment_ratio'] != 1.0]
-                        if not adjusted_rows.empty:
+                        if not adjusted_rows.empty and self.logger.isEnabledFor(logging.INFO):
                             self.logger.info(
-                                f"تعدیل برای {symbol}: {len(adjusted_rows)} ردیف از {len(df)} ردیف تعدیل شدند. "
-                                f"ضریب‌های تعدیل: {adjusted_rows['adjustment_ratio'].unique()[:3]}"
+                                "تعدیل برای %s: %d ردیف از %d ردیف تعدیل شدند. ضریب‌های تعدیل: %s",
+                                symbol, len(adjusted_rows), len(df), adjusted_rows['adjustment_ratio'].unique()[:3]
                             )
                     else:
                         self.logger.warning(f"ستون adjustment_ratio برای {symbol} وجود ندارد")
                 
-                self.logger.info(f"دانلود {symbol} کامل شد: {len(df)} رکورد")
+                self.logger.info("دانلود %s کامل شد: %d رکورد", symbol, len(df))
                 return True, df
             else:
                 self.logger.error(f"هیچ رکوردی برای {symbol} ایجاد نشد")
                 return False, "هیچ رکوردی ایجاد نشد"
                 
         except Exception as e:
-            self.logger.error(f"خطا در دانلود داده {symbol}: {str(e)}", exc_info=True)
+            self.logger.error(f"خطا در ترکیب داده {symbol}: {str(e)}", exc_info=True)
             return False, f"خطا: {str(e)}"
 
+    def assemble_payloads(self, symbol: str, internal_code: str, payloads: Dict[str, Tuple[str, bytes]],
+                          apply_adjustment: bool = True) -> Tuple[bool, Any]:
+        """مرحله CPU یک نماد: تبدیل JSON پاسخ‌های خام fetch_symbol_payloads و ترکیب آن‌ها"""
+        self._stage_context.symbol = symbol
+        try:
+            with self.stage('json_decode'):
+                decoded = {kind: _decode_payload(payload) for kind, payload in payloads.items()}
+            return self.assemble_symbol_data(
+                symbol, internal_code, decoded.get('client'), decoded.get('price'),
+                decoded.get('adjustment'), apply_adjustment
+            )
+        except Exception as e:
+            self.logger.error(f"خطا در پردازش JSON برای {symbol}: {e}")
+            return False, f"خطا: {str(e)}"
+        finally:
+            self._stage_context.symbol = None
+    
     def _create_adjustment_cache(self, adjustments: List[Dict]) -> Dict[str, Tuple[float, float]]:
         """ایجاد کش برای ضرایب تعدیل برای افزایش سرعت"""
         cache = {}
@@ -1084,6 +1012,454 @@ class Downloader:
             self.logger.error(f"خطا در اعمال تعدیل به رکورد: {e}")
             return record
 
+
+class Downloader(SymbolAssembler):
+    def __init__(self, config, data_loader):
+        super().__init__(data_loader)
+        self.config = config
+        self.data_loader = data_loader
+        self.is_downloading = False
+        self.session = None
+        self.cache_dir = "cache"
+        self.setup_cache()
+        self.disk_cache = DiskCache.from_settings(self.cache_dir, config.settings if config is not None else None)
+        # سقف حجم پوشه کش (حذف LRU) و آمار hit/miss به تفکیک نقطه
+        self.cache_manager = CacheManager.from_settings(self.disk_cache,
+                                                        config.settings if config is not None else None)
+        
+        # تنظیمات دانلود
+        self.max_retries = 3
+        self.timeout = 30
+        self.delay_between_requests = 0.1  # ثانیه
+        self.max_workers = 5  # حداکثر thread برای دانلود موازی
+        
+        # آمار دانلود
+        self.download_stats = {
+            'total': 0,
+            'successful': 0,
+            'failed': 0,
+            'skipped': 0,
+            'start_time': None,
+            'end_time': None
+        }
+        
+        # درخواست‌های در جریان: (نوع، کد داخلی، use_cache) -> Future مشترک همه فراخوان‌ها
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.coalesced_requests = 0
+        self.revalidated_requests = 0  # پاسخ‌های 304 که ورودی کش را بدون انتقال بدنه تمدید کردند
+        
+        # کش حافظه جلوی کش دیسک: کلید کش -> CacheEntry
+        memory_cache_mb = config.settings.get("memory_cache_mb", 128) if config is not None else 0
+        self.memory_cache = MemoryCache(float(memory_cache_mb) * 1024 * 1024)
+        
+        # انقضای کش بر اساس تقویم معاملاتی تهران
+        self.market_calendar = MarketCalendar.from_settings(config.settings if config is not None else None)
+        
+        # pool پردازه‌های ترکیب: یک بار ساخته و بین دسته‌های دانلود استفاده می‌شود
+        self._cpu_pool = None
+        self._cpu_pool_key = None  # (تعداد پردازه، داده دلار، داده طلا) هنگام ساخت pool
+        self._cpu_pool_lock = threading.Lock()
+    
+    def get_stage_summary(self) -> List[Dict]:
+        """خلاصه زمان مراحل به ترتیب STAGE_LABELS"""
+        with self._timing_lock:
+            totals = {name: tuple(value) for name, value in self.stage_totals.items()}
+        
+        grand_total = sum(seconds for seconds, _ in totals.values()) or 1.0
+        order = list(STAGE_LABELS) + sorted(set(totals) - set(STAGE_LABELS))
+        
+        summary = []
+        for name in order:
+            if name not in totals:
+                continue
+            seconds, count = totals[name]
+            summary.append({
+                'stage': name,
+                'label': STAGE_LABELS.get(name, name),
+                'seconds': seconds,
+                'count': count,
+                'avg_ms': seconds / count * 1000 if count else 0.0,
+                'percent': seconds / grand_total * 100
+            })
+        return summary
+    
+    def format_stage_summary(self) -> str:
+        """جدول متنی خلاصه زمان مراحل"""
+        summary = self.get_stage_summary()
+        if not summary:
+            return "زمان‌سنجی مراحل ثبت نشده است"
+        
+        lines = [f"{'مرحله':<22}{'مجموع (s)':>12}{'تعداد':>8}{'میانگین (ms)':>14}{'سهم':>8}"]
+        for row in summary:
+            lines.append(f"{row['label']:<22}{row['seconds']:>12.2f}{row['count']:>8}"
+                         f"{row['avg_ms']:>14.1f}{row['percent']:>7.1f}%")
+        return "\n".join(lines)
+    
+    def format_memory_cache_stats(self) -> str:
+        """یک خط خلاصه کش حافظه برای لاگ"""
+        stats = self.memory_cache.stats()
+        return (f"کش حافظه: {stats['hits']} hit، {stats['misses']} miss ({stats['hit_rate'] * 100:.0f}%)، "
+                f"{stats['entries']} مورد، {stats['bytes'] / 1024 / 1024:.1f} از "
+                f"{stats['max_bytes'] / 1024 / 1024:.0f} MB")
+    
+    def format_cache_stats(self) -> str:
+        """جدول آمار کش دیسک به تفکیک نقطه"""
+        return format_cache_stats(self.cache_manager.stats())
+    
+    def maintain_cache(self):
+        """پس از هر دانلود: ذخیره شمارنده‌های کش، حذف ورودی‌های استفاده نشده و اعمال سقف حجم"""
+        self.cache_manager.save_counters()
+        max_age_days = self.config.settings.get("cache_max_age_days", 30) if self.config is not None else 0
+        if max_age_days:
+            self.cleanup_cache(older_than_hours=float(max_age_days) * 24)
+        self.cache_manager.enforce_limit()
+    
+    def clear_cache(self) -> Tuple[int, int]:
+        """حذف همه ورودی‌های کش دیسک و حافظه: (تعداد فایل، بایت آزاد شده)"""
+        self.memory_cache.clear()
+        return self.cache_manager.clear()
+    
+    def setup_cache(self):
+        """راه‌اندازی سیستم کش"""
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+    
+    def get_session(self):
+        """دریافت session برای اتصالات مکرر"""
+        if self.session is None:
+            self.session = requests.Session()
+            # تنظیم headers برای شبیه‌سازی مرورگر
+            self.session.headers.update({
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                'Accept': 'application/json, text/plain, */*',
+                'Accept-Language': 'fa-IR,fa;q=0.9,en-US;q=0.8,en;q=0.7',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'Connection': 'keep-alive',
+            })
+            
+            # ضبط/پخش پاسخ‌ها برای آزمون‌های کارایی قابل تکرار (در حالت off بدون تغییر)
+            if self.config.settings.get("http_fixtures_mode", "off") != "off":
+                from http_fixtures import mount_fixture_adapter
+                mount_fixture_adapter(self.session, self.config)
+        return self.session
+    
+    def close_session(self):
+        """بستن session"""
+        if self.session:
+            self.session.close()
+            self.session = None
+        self.shutdown_cpu_pool()
+    
+    def _retry_request(self, url, max_retries=None, method='GET', **kwargs):
+        """درخواست با قابلیت تلاش مجدد"""
+        if max_retries is None:
+            max_retries = self.max_retries
+        
+        session = self.get_session()
+        
+        for attempt in range(max_retries):
+            try:
+                if method.upper() == 'GET':
+                    response = session.get(url, timeout=self.timeout, **kwargs)
+                elif method.upper() == 'POST':
+                    response = session.post(url, timeout=self.timeout, **kwargs)
+                else:
+                    raise ValueError(f"Method {method} not supported")
+                
+                response.raise_for_status()
+                return response
+                
+            except requests.exceptions.Timeout:
+                self.logger.warning(f"Timeout در تلاش {attempt + 1}/{max_retries} برای {url}")
+                if attempt == max_retries - 1:
+                    raise
+                if not self._retry_delay(2 ** attempt):  # افزایش تاخیر به صورت نمایی
+                    return None
+                
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"خطا در تلاش {attempt + 1}/{max_retries} برای {url}: {e}")
+                if attempt == max_retries - 1:
+                    raise
+                if not self._retry_delay(1):
+                    return None
+        
+        return None
+    
+    def _is_cancelled(self) -> bool:
+        """آیا دانلود رشته جاری (خط لوله) لغو شده است؟"""
+        cancel = getattr(self._stage_context, 'cancel', None)
+        return cancel is not None and cancel.is_set()
+    
+    def _retry_delay(self, seconds: float) -> bool:
+        """انتظار پیش از تلاش بعدی؛ False اگر دانلود در این مدت لغو شود"""
+        cancel = getattr(self._stage_context, 'cancel', None)
+        if cancel is None:
+            time.sleep(seconds)
+            return True
+        if cancel.wait(seconds):
+            self.logger.debug("تلاش مجدد به دلیل لغو دانلود انجام نشد")
+            return False
+        return True
+    
+    def _is_fresh(self, cache_time: datetime) -> bool:
+        """آیا داده ذخیره شده در cache_time هنوز معتبر است؟ (تا پایان جلسه معاملاتی بعدی)"""
+        return self.market_calendar.is_fresh(cache_time)
+    
+    def _save_raw_to_cache(self, cache_key: str, body: bytes, etag: Optional[str] = None,
+                           last_modified: Optional[str] = None) -> CacheEntry:
+        """ذخیره پاسخ خام و validatorهای آن در کش دیسک و حافظه بدون تبدیل JSON"""
+        entry = self.disk_cache.make_entry(body, etag, last_modified)
+        
+        try:
+            self.cache_manager.note_write(self.disk_cache.store(cache_key, entry))
+        except Exception as e:
+            self.logger.warning(f"خطا در ذخیره کش {cache_key}: {e}")
+        
+        self.memory_cache.put(cache_key, entry, len(entry.payload))
+        return entry
+    
+    def download_adjustment_data(self, internal_code: str, use_cache: bool = True) -> Optional[Dict]:
+        """دانلود داده‌های تعدیل سهام"""
+        return self._download_json('adjustment', internal_code, use_cache)
+    
+    def download_client_type_data(self, internal_code: str, use_cache: bool = True) -> Optional[Dict]:
+        """دانلود داده حقیقی/حقوقی با قابلیت کش"""
+        return self._download_json('client', internal_code, use_cache)
+    
+    def download_price_data(self, internal_code: str, use_cache: bool = True) -> Optional[Dict]:
+        """دانلود داده قیمت با قابلیت کش"""
+        return self._download_json('price', internal_code, use_cache)
+    
+    def _endpoint_url(self, kind: str, internal_code: str) -> str:
+        """آدرس یکی از نقاط SYMBOL_ENDPOINTS برای یک نماد"""
+        if kind == 'adjustment':
+            return self.config.get_adjustment_url(internal_code)
+        return self.config.settings[f"{kind}_url"].format(inscode=internal_code)
+    
+    def _single_flight(self, key: Tuple, func):
+        """اجرای func یک بار برای هر کلید در جریان؛ فراخوان‌های همزمان همان نتیجه را می‌گیرند"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = concurrent.futures.Future()
+            else:
+                self.coalesced_requests += 1
+        
+        if not leader:
+            self.logger.debug("درخواست %s به درخواست در جریان پیوست", key)
+            return future.result()
+        
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+    
+    def _fetch_raw(self, kind: str, internal_code: str, use_cache: bool = True) -> Optional[Tuple[str, bytes]]:
+        """دریافت بایت‌های یک نقطه از کش یا شبکه: (منبع، بایت‌ها)
+        
+        منبع 'network' یعنی بدنه خام پاسخ؛ 'memory'، 'cache' و 'revalidated' (پاسخ 304)
+        یعنی قالب فایل کش که داده در کلید data آن است.
+        
+        درخواست‌های همزمان یک نقطه و نماد به یک درخواست HTTP و یک نوشتن کش تبدیل می‌شوند؛
+        فراخوان use_cache=False فقط به درخواست دیگری با همین شرط می‌پیوندد (نه به جستجوی کش).
+        """
+        return self._single_flight((kind, internal_code, use_cache),
+                                   lambda: self._load_raw(kind, internal_code, use_cache))
+    
+    def _load_raw(self, kind: str, internal_code: str, use_cache: bool = True) -> Optional[Tuple[str, bytes]]:
+        """دریافت بدون هماهنگی بین رشته‌ها (فقط از طریق _fetch_raw)"""
+        prefix, network_stage, label = SYMBOL_ENDPOINTS[kind]
+        cache_key = f"{prefix}_{internal_code}"
+        
+        # ورودی منقضی با validator برای درخواست شرطی نگه داشته می‌شود
+        stale = None
+        if use_cache:
+            with self.stage('cache_lookup'):
+                # ابتدا کش حافظه (بدون I/O و بررسی checksum)، سپس کش دیسک
+                entry = self.memory_cache.get(cache_key, lambda cached: self._is_fresh(cached.timestamp))
+                source, outcome = 'memory', 'memory'
+                if entry is None:
+                    source, outcome = 'cache', 'disk'
+                    entry = self.disk_cache.read(cache_key)
+                    if entry is None:
+                        outcome = 'miss'
+                    elif not self._is_fresh(entry.timestamp):
+                        self.logger.debug("داده کش %s منقضی شده است", cache_key)
+                        stale, entry, outcome = entry, None, 'stale'
+                    else:
+                        self.memory_cache.put(cache_key, entry, len(entry.payload))
+                self.cache_manager.record(cache_key, outcome)
+            if entry is not None:
+                self.logger.debug("داده %s %s از کش بازیابی شد", label, internal_code)
+                return source, entry.payload
+        
+        try:
+            url = self._endpoint_url(kind, internal_code)
+            self.logger.debug("دریافت داده %s از: %s", label, url)
+            
+            conditional_headers = stale.conditional_headers() if stale is not None else {}
+            with self.stage(network_stage):
+                if conditional_headers:
+                    response = self._retry_request(url, headers=conditional_headers)
+                else:
+                    response = self._retry_request(url)
+            
+            if response is None:
+                if not self._is_cancelled():
+                    self.logger.error(f"خطا در دریافت داده {label} برای {internal_code}")
+                return None
+            
+            # 304: داده تغییر نکرده؛ همان ورودی با زمان جدید تمدید می‌شود
+            if response.status_code == 304 and stale is not None:
+                with self._timing_lock:
+                    self.revalidated_requests += 1
+                self.cache_manager.record(cache_key, 'revalidated')
+                self.logger.debug("داده %s %s تغییری نکرده است (304)", label, internal_code)
+                with self.stage('cache_write'):
+                    entry = self._save_raw_to_cache(
+                        cache_key, stale.body(),
+                        response.headers.get('ETag') or stale.etag,
+                        response.headers.get('Last-Modified') or stale.last_modified
+                    )
+                return 'revalidated', entry.payload
+            
+            body = response.content
+            
+            # فقط بدنه JSON غیرخالی در کش ذخیره می‌شود (صفحه خطای HTML یا {} نه)
+            stripped = body.strip()
+            if use_cache and stripped[:1] in (b'{', b'[') and stripped not in (b'{}', b'[]'):
+                with self.stage('cache_write'):
+                    self._save_raw_to_cache(cache_key, body, response.headers.get('ETag'),
+                                            response.headers.get('Last-Modified'))
+            
+            return 'network', body
+            
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"خطا در دریافت داده {label} برای {internal_code}: {e}")
+            return None
+        except Exception as e:
+            self.logger.error(f"خطای ناشناخته در دریافت داده {label} برای {internal_code}: {e}")
+            return None
+    
+    def _download_json(self, kind: str, internal_code: str, use_cache: bool = True) -> Optional[Dict]:
+        """دریافت و تبدیل JSON یک نقطه (همان مسیر کش و هماهنگی fetch_symbol_payloads)"""
+        payload = self._fetch_raw(kind, internal_code, use_cache)
+        if payload is None:
+            return None
+        
+        try:
+            with self.stage('json_decode'):
+                return _decode_payload(payload)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"خطا در پردازش JSON {SYMBOL_ENDPOINTS[kind][2]} برای {internal_code}: {e}")
+            return None
+    
+    def fetch_symbol_payloads(self, symbol: str, internal_code: str, apply_adjustment: bool = True,
+                              use_cache: bool = True,
+                              cancel: Optional[threading.Event] = None) -> Dict[str, Tuple[str, bytes]]:
+        """مرحله I/O یک نماد: پاسخ‌های خام بدون تبدیل JSON (نوع ناموفق در خروجی نیست)
+        
+        با set شدن cancel درخواست بعدی و انتظار تلاش‌های مجدد انجام نمی‌شود.
+        """
+        self._stage_context.symbol = symbol
+        self._stage_context.cancel = cancel
+        try:
+            payloads = {}
+            for kind in ('client', 'price'):
+                if self._is_cancelled():
+                    return payloads
+                payload = self._fetch_raw(kind, internal_code, use_cache)
+                if payload is not None:
+                    payloads[kind] = payload
+            
+            # داده تعدیل فقط وقتی دریافت می‌شود که داده‌های اصلی رسیده باشند
+            if apply_adjustment and 'client' in payloads and 'price' in payloads and not self._is_cancelled():
+                payload = self._fetch_raw('adjustment', internal_code, use_cache)
+                if payload is not None:
+                    payloads['adjustment'] = payload
+            
+            return payloads
+        finally:
+            self._stage_context.symbol = None
+            self._stage_context.cancel = None
+    
+    def download_symbol_data(self, symbol: str, internal_code: str, apply_adjustment: bool = True) -> Tuple[bool, Any]:
+        """دانلود و ترکیب داده‌های یک نماد با منطق صحیح تعدیل"""
+        # مراحل این رشته به نام همین نماد ثبت می‌شوند
+        self._stage_context.symbol = symbol
+        try:
+            self.logger.info("شروع دانلود داده‌های %s (کد: %s) - حالت تعدیل: %s", symbol, internal_code, apply_adjustment)
+            
+            # دانلود داده‌های اصلی
+            client_data = self.download_client_type_data(internal_code)
+            price_data = self.download_price_data(internal_code)
+            
+            # داده تعدیل فقط وقتی دریافت می‌شود که داده‌های اصلی رسیده باشند
+            adjustment_data = None
+            if apply_adjustment and client_data and 'clientType' in client_data and price_data:
+                adjustment_data = self.download_adjustment_data(internal_code)
+            
+            return self.assemble_symbol_data(symbol, internal_code, client_data, price_data,
+                                             adjustment_data, apply_adjustment)
+        except Exception as e:
+            self.logger.error(f"خطا در دانلود داده {symbol}: {str(e)}", exc_info=True)
+            return False, f"خطا: {str(e)}"
+        finally:
+            self._stage_context.symbol = None
+    
+    def get_cpu_workers(self) -> int:
+        """تعداد پردازه‌های ترکیب از تنظیمات (0: ترکیب در رشته‌های دانلود)"""
+        return self.config.get_cpu_workers() if self.config is not None else 0
+    
+    def get_cpu_min_symbols(self) -> int:
+        """کمترین تعداد نماد یک دسته برای ترکیب در پردازه‌ها (برای دسته کوچک‌تر راه‌اندازی نمی‌ارزد)"""
+        return int(self.config.settings.get("cpu_min_symbols", 20)) if self.config is not None else 0
+    
+    def get_currency_snapshot(self) -> 'CurrencySnapshot':
+        """نسخه قابل ارسال داده‌های دلار و طلا برای پردازه‌های ترکیب"""
+        return CurrencySnapshot(self.data_loader.dollar_data, self.data_loader.gold_data)
+    
+    def get_cpu_pool(self, workers: int) -> concurrent.futures.ProcessPoolExecutor:
+        """pool مشترک پردازه‌های ترکیب
+        
+        پردازه‌ها (و import pandas در هر کدام) فقط یک بار راه‌اندازی می‌شوند؛ pool فقط وقتی
+        دوباره ساخته می‌شود که تعداد پردازه‌ها یا داده دلار/طلا (بارگذاری مجدد) تغییر کند.
+        """
+        key = (workers, self.data_loader.dollar_data, self.data_loader.gold_data)
+        with self._cpu_pool_lock:
+            current = self._cpu_pool_key
+            if self._cpu_pool is not None and (current[0] != key[0] or current[1] is not key[1]
+                                               or current[2] is not key[2]):
+                self._cpu_pool.shutdown(wait=False)
+                self._cpu_pool = None
+            
+            if self._cpu_pool is None:
+                # spawn در همه سیستم‌عامل‌ها: fork با رشته‌های فعال (صف لاگ، UI) امن نیست
+                self._cpu_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_cpu_worker,
+                    initargs=(self.get_currency_snapshot(),)
+                )
+                self._cpu_pool_key = key
+            return self._cpu_pool
+    
+    def shutdown_cpu_pool(self):
+        """توقف پردازه‌های ترکیب (هنگام خروج)"""
+        with self._cpu_pool_lock:
+            if self._cpu_pool is not None:
+                self._cpu_pool.shutdown()
+                self._cpu_pool = None
+                self._cpu_pool_key = None
     
     def download_multiple_symbols(self, symbols_data: List[Tuple[str, str]], 
                                  progress_callback=None, apply_adjustment: bool = True) -> Dict[str, pd.DataFrame]:
@@ -1097,58 +1473,32 @@ class Downloader:
             'end_time': None,
             'apply_adjustment': apply_adjustment
         }
+        self.reset_stage_timings()
         
         results = {}
         failed_symbols = []
         
         self.logger.info(f"شروع دانلود {len(symbols_data)} نماد - حالت تعدیل: {apply_adjustment}")
         
-        # استفاده از ThreadPoolExecutor برای دانلود موازی
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # ارسال همه کارها
-            future_to_symbol = {
-                executor.submit(self.download_symbol_data, symbol, internal_code, apply_adjustment): (symbol, internal_code)
-                for symbol, internal_code in symbols_data
-            }
-            
-            # پردازش نتایج
-            for future in tqdm(concurrent.futures.as_completed(future_to_symbol), 
-                             total=len(symbols_data), 
-                             desc="دانلود نمادها"):
-                symbol, internal_code = future_to_symbol[future]
-                
-                try:
-                    success, result = future.result(timeout=60)
-                    
-                    if success and isinstance(result, pd.DataFrame) and not result.empty:
-                        results[symbol] = result
-                        self.download_stats['successful'] += 1
-                        
-                        if progress_callback:
-                            progress_callback(symbol, True, f"دانلود {symbol} کامل شد (تعدیل: {apply_adjustment})")
-                    else:
-                        failed_symbols.append((symbol, result))
-                        self.download_stats['failed'] += 1
-                        
-                        if progress_callback:
-                            progress_callback(symbol, False, f"خطا در {symbol}: {result}")
-                
-                except concurrent.futures.TimeoutError:
-                    failed_symbols.append((symbol, "Timeout"))
-                    self.download_stats['failed'] += 1
-                    
-                    if progress_callback:
-                        progress_callback(symbol, False, f"Timeout در {symbol}")
+        # خط لوله دریافت ← ترکیب ← انتخاب ستون (بدون مرحله نوشتن؛ DataFrameها برگردانده می‌شوند)
+        pipeline = DownloadPipeline(self, symbols_data, apply_adjustment)
+        if pipeline.cpu_workers > 0:
+            self.logger.info("ترکیب داده نمادها در %d پردازه", pipeline.cpu_workers)
+        
+        for job in tqdm(pipeline.run(), total=len(symbols_data), desc="دانلود نمادها"):
+            symbol = job.symbol
+            if job.success:
+                results[symbol] = job.frame
+                self.download_stats['successful'] += 1
                 
-                except Exception as e:
-                    failed_symbols.append((symbol, str(e)))
-                    self.download_stats['failed'] += 1
-                    
-                    if progress_callback:
-                        progress_callback(symbol, False, f"خطا در {symbol}: {str(e)}")
+                if progress_callback:
+                    progress_callback(symbol, True, f"دانلود {symbol} کامل شد (تعدیل: {apply_adjustment})")
+            else:
+                failed_symbols.append((symbol, job.error))
+                self.download_stats['failed'] += 1
                 
-                # تاخیر بین درخواست‌ها
-                time.sleep(self.delay_between_requests)
+                if progress_callback:
+                    progress_callback(symbol, False, f"خطا در {symbol}: {job.error}")
         
         self.download_stats['end_time'] = datetime.now()
         
@@ -1158,8 +1508,17 @@ class Downloader:
         if failed_symbols:
             self.logger.warning(f"نمادهای ناموفق: {[s[0] for s in failed_symbols]}")
         
+        self.logger.info("زمان مراحل دانلود:\n%s", self.format_stage_summary())
+        self.logger.info(self.format_memory_cache_stats())
+        self.maintain_cache()
+        
         return results
     
+    def write_csv(self, df: pd.DataFrame, filepath: str, **to_csv_kwargs):
+        """نوشتن CSV به صورت اتمیک با checksum کنار فایل (UTF-8 با BOM برای سازگاری با Excel)"""
+        to_csv_kwargs.setdefault('index', False)
+        atomic_write(filepath, df.to_csv(**to_csv_kwargs).encode('utf-8-sig'), checksum=True)
+    
     def save_to_csv(self, df: pd.DataFrame, symbol: str, output_dir: str, 
                    add_timestamp: bool = False) -> Tuple[bool, str]:
         """ذخیره DataFrame به CSV با گزینه‌های مختلف"""
@@ -1178,12 +1537,12 @@ class Downloader:
             # تنظیمات ذخیره‌سازی
             save_kwargs = {
                 'index': False,
-                'encoding': 'utf-8-sig',  # UTF-8 با BOM برای سازگاری با Excel
                 'date_format': '%Y-%m-%d' if 'recDate' in df.columns else None
             }
             
             # ذخیره فایل
-            df.to_csv(filepath, **save_kwargs)
+            with self.stage('file_write', symbol):
+                self.write_csv(df, filepath, **save_kwargs)
             
             # بررسی ذخیره‌سازی
             if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
@@ -1208,15 +1567,16 @@ class Downloader:
             
             filepath = os.path.join(output_dir, f"{symbol}.xlsx")
             
-            # ایجاد writer Excel
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name=symbol[:31], index=False)  # نام شیت حداکثر 31 کاراکتر
-                
-                # تنظیم عرض ستون‌ها
-                worksheet = writer.sheets[symbol[:31]]
-                for i, column in enumerate(df.columns, 1):
-                    column_width = max(len(str(column)), df[column].astype(str).str.len().max())
-                    worksheet.column_dimensions[chr(64 + i)].width = min(column_width + 2, 50)
+            # ایجاد writer Excel (روی فایل موقت؛ پس از بستن جایگزین فایل اصلی می‌شود)
+            with atomic_file(filepath, checksum=True) as temp_path:
+                with pd.ExcelWriter(temp_path, engine='openpyxl') as writer:
+                    df.to_excel(writer, sheet_name=symbol[:31], index=False)  # نام شیت حداکثر 31 کاراکتر
+                    
+                    # تنظیم عرض ستون‌ها
+                    worksheet = writer.sheets[symbol[:31]]
+                    for i, column in enumerate(df.columns, 1):
+                        column_width = max(len(str(column)), df[column].astype(str).str.len().max())
+                        worksheet.column_dimensions[chr(64 + i)].width = min(column_width + 2, 50)
             
             self.logger.info(f"فایل Excel {symbol}.xlsx ذخیره شد")
             return True, filepath
@@ -1250,7 +1610,7 @@ class Downloader:
                 
                 # ذخیره به CSV
                 csv_path = os.path.join(output_dir, f"{filename}.csv")
-                merged_df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+                self.write_csv(merged_df, csv_path)
                 
                 self.logger.info(f"داده‌ها در {csv_path} ادغام شدند: {len(merged_df)} رکورد از {len(dataframes)} نماد")
                 return True, csv_path
@@ -1268,13 +1628,14 @@ class Downloader:
             
             zip_path = os.path.join(directory, f"{output_filename}.zip")
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(directory):
-                    for file in files:
-                        if file.endswith('.csv'):
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, directory)
-                            zipf.write(file_path, arcname)
+            with atomic_file(zip_path, checksum=True) as temp_path:
+                with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for root, dirs, files in os.walk(directory):
+                        for file in files:
+                            if file.endswith('.csv'):
+                                file_path = os.path.join(root, file)
+                                arcname = os.path.relpath(file_path, directory)
+                                zipf.write(file_path, arcname)
             
             self.logger.info(f"فایل‌ها در {zip_path} فشرده شدند")
             return True, zip_path
@@ -1292,6 +1653,19 @@ class Downloader:
             duration = self.download_stats['end_time'] - self.download_stats['start_time']
             self.download_stats['duration'] = str(duration)
         
+        # زمان مراحل (مجموع و به تفکیک نماد)
+        self.download_stats['stages'] = self.get_stage_summary()
+        with self._timing_lock:
+            self.download_stats['symbol_stages'] = {
+                symbol: dict(stages) for symbol, stages in self.symbol_timings.items()
+            }
+        
+        # درخواست‌هایی که به جای HTTP جدید به درخواست در جریان پیوستند
+        self.download_stats['coalesced_requests'] = self.coalesced_requests
+        self.download_stats['revalidated_requests'] = self.revalidated_requests
+        self.download_stats['memory_cache'] = self.memory_cache.stats()
+        self.download_stats['disk_cache'] = self.cache_manager.stats()
+        
         return self.download_stats
     
     def validate_internal_code(self, internal_code: str) -> bool:
@@ -1306,22 +1680,12 @@ class Downloader:
         return 5 <= len(cleaned) <= 15
     
     def cleanup_cache(self, older_than_hours: int = 24):
-        """پاکسازی فایل‌های کش قدیمی"""
+        """پاکسازی فایل‌های کشی که در older_than_hours ساعت گذشته استفاده نشده‌اند"""
         try:
-            cutoff_time = datetime.now() - timedelta(hours=older_than_hours)
-            deleted_count = 0
-            
-            for filename in os.listdir(self.cache_dir):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(self.cache_dir, filename)
-                    file_time = datetime.fromtimestamp(os.path.getmtime(filepath))
-                    
-                    if file_time < cutoff_time:
-                        os.remove(filepath)
-                        deleted_count += 1
+            deleted_count, freed = self.cache_manager.remove_older_than(older_than_hours)
             
             if deleted_count > 0:
-                self.logger.info(f"{deleted_count} فایل کش قدیمی پاک شد")
+                self.logger.info(f"{deleted_count} فایل کش قدیمی ({freed / 1024 / 1024:.1f} MB) پاک شد")
             
         except Exception as e:
             self.logger.error(f"خطا در پاکسازی کش: {str(e)}")
@@ -1336,7 +1700,7 @@ class Downloader:
             'price_url': self.config.settings.get("price_url", "").format(inscode="123456"),
             'dollar_url': self.config.settings.get("dollar_url", ""),
             'gold_url': self.config.settings.get("gold_url", ""),
-            'adjustment_url': f"https://cdn.tsetmc.com/api/Instrument/GetInstrumentShareChange/123456"
+            'adjustment_url': self.config.get_adjustment_url("123456")
         }
         
         for name, url in test_urls.items():
@@ -1386,7 +1750,7 @@ class Downloader:
                 
                 # ذخیره فایل
                 dollar_path = os.path.join(output_dir, 'dollar.csv')
-                dollar_df.to_csv(dollar_path, index=False, encoding='utf-8-sig', date_format='%Y%m%d')
+                self.write_csv(dollar_df, dollar_path, date_format='%Y%m%d')
                 messages.append(f'دلار: {len(dollar_df)} رکورد')
             
             # ذخیره فایل طلا
@@ -1414,7 +1778,7 @@ class Downloader:
                 
                 # ذخیره فایل
                 gold_path = os.path.join(output_dir, 'gold.csv')
-                gold_df.to_csv(gold_path, index=False, encoding='utf-8-sig', date_format='%Y%m%d')
+                self.write_csv(gold_df, gold_path, date_format='%Y%m%d')
                 messages.append(f'طلا: {len(gold_df)} رکورد')
             
             if messages:
@@ -1429,6 +1793,55 @@ class Downloader:
             return False, f"خطا در ذخیره فایل‌های ارز: {str(e)}"
 
 # تابع کمکی برای استفاده خارجی
+class CurrencySnapshot:
+    """داده‌های دلار و طلا به شکل قابل pickle برای SymbolAssembler
+
+    پردازه‌های ترکیب به جای DataLoader کامل (session، قفل‌ها) این نسخه را می‌گیرند.
+    """
+    
+    def __init__(self, dollar_data=None, gold_data=None):
+        self.dollar_data = dollar_data
+        self.gold_data = gold_data
+
+
+# ترکیب‌کننده هر پردازه ترکیب (با _init_cpu_worker ساخته می‌شود)
+_cpu_worker: Optional[SymbolAssembler] = None
+
+
+def _init_cpu_worker(currency: CurrencySnapshot):
+    """مقداردهی پردازه ترکیب: لاگ فقط هشدارها و SymbolAssembler با داده ارز ثابت"""
+    global _cpu_worker
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    
+    _cpu_worker = SymbolAssembler(currency)
+
+
+def _decode_payload(payload: Tuple[str, bytes]) -> Any:
+    """تبدیل JSON پاسخ خام (قالب کش دیسک و حافظه داده را در کلید data نگه می‌دارد)"""
+    source, body = payload
+    data = json.loads(body)
+    return data if source == 'network' else data.get('data')
+
+
+def assemble_in_worker(symbol: str, internal_code: str, payloads: Dict[str, Tuple[str, bytes]],
+                       apply_adjustment: bool = True) -> Tuple[bool, Any, Dict[str, float]]:
+    """مرحله CPU در پردازه ترکیب: بایت‌های خام ورودی، آرایه‌های ستونی و زمان مراحل خروجی"""
+    assembler = _cpu_worker
+    assembler.reset_stage_timings()
+    
+    success, result = assembler.assemble_payloads(symbol, internal_code, payloads, apply_adjustment)
+    if success:
+        columns = list(result.columns)
+        result = {'columns': columns, 'arrays': [result[col].to_numpy() for col in columns]}
+    
+    timings = {name: total[0] for name, total in assembler.stage_totals.items()}
+    return success, result, timings
+
+
 def create_downloader(config, data_loader):
     """ایجاد نمونه Downloader"""
     return Downloader(config, data_loader)
@@ -0,0 +1,184 @@
+# http_fixtures.py
+"""ضبط و پخش پاسخ‌های HTTP برای آزمون‌های کارایی قابل تکرار
+
+حالت از تنظیمات خوانده می‌شود:
+    "http_fixtures_mode": "off" | "record" | "replay"
+    "http_fixtures_file": مسیر آرشیو (JSON lines فشرده با gzip)
+    "http_fixtures_latency": "recorded" (تأخیر ضبط شده) یا "zero"
+"""
+import os
+import gzip
+import json
+import time
+import atexit
+import base64
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# هدرهایی که در آرشیو نگه داشته می‌شوند (بقیه برای پخش لازم نیستند)
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Date')
+
+logger = logging.getLogger(__name__)
+
+
+class FixtureArchive:
+    """آرشیو پاسخ‌ها: کلید (متد، URL) -> لیست پاسخ‌ها به ترتیب ضبط"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[tuple, List[Dict]] = {}
+        self._replay_positions: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def load(self):
+        """بارگذاری آرشیو از فایل (نبود فایل یعنی آرشیو خالی)"""
+        if not os.path.exists(self.path):
+            return self
+
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                entry['body'] = base64.b64decode(entry['body'])
+                self.entries.setdefault((entry['method'], entry['url']), []).append(entry)
+
+        logger.info("آرشیو HTTP بارگذاری شد: %d پاسخ از %s",
+                    sum(len(v) for v in self.entries.values()), self.path)
+        return self
+
+    def save(self):
+        """نوشتن آرشیو در فایل (فایل موقت و سپس جایگزینی)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [entry for items in self.entries.values() for entry in items]
+            self._dirty = False
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            for entry in entries:
+                record = dict(entry, body=base64.b64encode(entry['body']).decode('ascii'))
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(temp_path, self.path)
+        logger.info("آرشیو HTTP ذخیره شد: %d پاسخ در %s", len(entries), self.path)
+
+    def add(self, method: str, url: str, response: Response, elapsed: float):
+        entry = {
+            'method': method,
+            'url': url,
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k in KEPT_HEADERS},
+            'elapsed': round(elapsed, 4),
+            'body': response.content
+        }
+        with self._lock:
+            self.entries.setdefault((method, url), []).append(entry)
+            self._dirty = True
+
+    def next(self, method: str, url: str) -> Optional[Dict]:
+        """پاسخ بعدی برای یک درخواست (آخرین پاسخ ضبط شده تکرار می‌شود)"""
+        key = (method, url)
+        with self._lock:
+            items = self.entries.get(key)
+            if not items:
+                return None
+            position = self._replay_positions.get(key, 0)
+            self._replay_positions[key] = position + 1
+            return items[min(position, len(items) - 1)]
+
+
+# یک آرشیو برای هر فایل تا DataLoader و Downloader در همان آرشیو ضبط کنند
+_archives: Dict[str, FixtureArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def get_archive(path: str) -> FixtureArchive:
+    """آرشیو مشترک یک فایل (با ذخیره خودکار هنگام خروج)"""
+    path = os.path.abspath(path)
+    with _archives_lock:
+        if path not in _archives:
+            archive = FixtureArchive(path).load()
+            atexit.register(archive.save)
+            _archives[path] = archive
+        return _archives[path]
+
+
+class RecordingAdapter(HTTPAdapter):
+    """ارسال واقعی درخواست و ضبط پاسخ در آرشیو"""
+
+    def __init__(self, archive: FixtureArchive, **kwargs):
+        self.archive = archive
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        # خواندن بدنه پیش از ضبط (stream=False همین کار را می‌کرد)
+        response.content
+        self.archive.add(request.method, request.url, response, time.perf_counter() - start)
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    """پاسخ از آرشیو بدون شبکه؛ latency_scale=0 تأخیر را حذف می‌کند"""
+
+    def __init__(self, archive: FixtureArchive, latency_scale: float = 1.0, **kwargs):
+        self.archive = archive
+        self.latency_scale = latency_scale
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        entry = self.archive.next(request.method, request.url)
+        if entry is None:
+            raise ConnectionError(f"پاسخی در آرشیو برای {request.method} {request.url} وجود ندارد",
+                                  request=request)
+
+        if self.latency_scale > 0 and entry['elapsed'] > 0:
+            time.sleep(entry['elapsed'] * self.latency_scale)
+
+        response = Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['body']
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.reason = 'OK' if entry['status'] < 400 else 'Error'
+        return response
+
+
+def create_http_adapter(config, **adapter_kwargs) -> HTTPAdapter:
+    """ساخت adapter مناسب حالت ضبط/پخش تنظیمات (در حالت off همان HTTPAdapter معمولی)"""
+    mode = config.settings.get("http_fixtures_mode", "off")
+    if mode not in ("record", "replay"):
+        return HTTPAdapter(**adapter_kwargs)
+
+    archive = get_archive(config.settings.get("http_fixtures_file",
+                                              os.path.join("fixtures", "http_fixtures.jsonl.gz")))
+    if mode == "record":
+        return RecordingAdapter(archive, **adapter_kwargs)
+
+    latency_scale = 0.0 if config.settings.get("http_fixtures_latency", "recorded") == "zero" else 1.0
+    return ReplayAdapter(archive, latency_scale=latency_scale, **adapter_kwargs)
+
+
+def mount_fixture_adapter(session, config, **adapter_kwargs):
+    """نصب adapter ضبط/پخش روی session (در حالت off کاری انجام نمی‌شود)"""
+    if config.settings.get("http_fixtures_mode", "off") not in ("record", "replay"):
+        return session
+
+    adapter = create_http_adapter(config, **adapter_kwargs)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
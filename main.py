@@ -4,10 +4,15 @@ import threading
 import traceback
 import sys
 import os
+import time
+
+# زمان شروع برای اندازه‌گیری بودجه راه‌اندازی
+_START_TIME = time.perf_counter()
 
 # اضافه کردن مسیر
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# ماژول‌ها سبک هستند؛ pandas و requests و دانلودر با اولین استفاده بارگذاری می‌شوند
 from config import Config
 from data_loader import DataLoader
 from ui_manager import UIManager
@@ -25,6 +30,9 @@ class TSEClient4:
         # تنظیمات پنجره
         self.setup_window()
         
+        # اندازه‌گیری زمان نمایش پنجره پس از اولین چرخه رویداد
+        self.root.after_idle(self.report_startup_time)
+        
         # شروع بارگذاری داده
         self.load_data()
     
@@ -38,15 +46,41 @@ class TSEClient4:
         y = (self.root.winfo_screenheight() // 2) - (height // 2)
         self.root.geometry(f'{width}x{height}+{x}+{y}')
     
+    def report_startup_time(self):
+        """ثبت زمان نمایش پنجره و مقایسه با بودجه راه‌اندازی"""
+        elapsed_ms = (time.perf_counter() - _START_TIME) * 1000
+        budget_ms = self.config.settings.get("startup_budget_ms", 500)
+        heavy = [name for name in ("pandas", "requests", "tqdm", "openpyxl", "downloader") if name in sys.modules]
+        
+        if elapsed_ms > budget_ms:
+            self.config.logger.warning(
+                f"زمان نمایش پنجره {elapsed_ms:.0f} ms از بودجه {budget_ms} ms بیشتر است "
+                f"(ماژول‌های سنگین بارگذاری شده: {', '.join(heavy) or '-'})")
+        else:
+            self.config.logger.info(f"پنجره در {elapsed_ms:.0f} ms نمایش داده شد (بودجه: {budget_ms} ms)")
+    
     def load_data(self):
         """بارگذاری داده در رشته جداگانه"""
         def load_in_thread():
+            # warm start: نمایش فوری آخرین snapshot و به‌روزرسانی از شبکه در پس‌زمینه
+            # (در همین رشته تا import pandas پنجره را معطل نکند)
+            warm, warm_message = self.data_loader.load_snapshot()
+            if warm:
+                self.ui.post_ui(self.ui.on_data_loaded, True, warm_message)
+            
+            # پس از warm start داده تازه فقط تعدادها را تطبیق می‌دهد
+            on_market = self.ui.on_data_refreshed if warm else self.ui.on_data_loaded
+            
             try:
-                # بارگذاری داده‌های TSETMC و داده‌های خارجی (دلار و طلا)
-                success, message = self.data_loader.fetch_data()
+                # بارگذاری همزمان داده‌های TSETMC و داده‌های خارجی (دلار و طلا)
+                # UI به محض رسیدن MarketWatch به صفحه 1 می‌رود
+                self.data_loader.fetch_data(
+                    on_market_ready=lambda success, message: self.ui.post_ui(
+                        on_market, success, message)
+                )
                 
-                # ارسال نتیجه به UI در رشته اصلی
-                self.root.after(0, lambda: self.ui.on_data_loaded(success, message))
+                # ارسال وضعیت دلار و طلا به UI در رشته اصلی
+                self.ui.post_ui(self.ui.on_external_data_loaded)
                 
             except Exception as e:
                 error_msg = f"خطای بحرانی در بارگذاری داده: {str(e)}"
@@ -57,7 +91,7 @@ class TSEClient4:
                 self.save_error(error_msg)
                 
                 # نمایش خطا در UI
-                self.root.after(0, lambda: self.ui.on_data_loaded(False, error_msg))
+                self.ui.post_ui(on_market, False, error_msg)
         
         # ایجاد و شروع رشته بارگذاری
         thread = threading.Thread(target=load_in_thread, daemon=True)
@@ -113,34 +147,10 @@ def main():
             pass
 
 if __name__ == "__main__":
+    # پردازه‌های ترکیب دانلودر (spawn) در نسخه exe هم باید همین فایل را اجرا کنند
+    import multiprocessing
+    multiprocessing.freeze_support()
+    
     # import اضافی برای تابع save_error
     from datetime import datetime
     main()
-
-# --- IDE variable snapshot ---
-try:
-    import json
-    _vars_snapshot = {
-        k: v for k, v in globals().items()
-        if k not in ("__name__", "__file__", "__package__", "__loader__", "__spec__", "__builtins__")
-        and isinstance(v, (int, float, str, list, dict, tuple, bool))
-    }
-    with open(r"C:/tseclient4.0\vars_snapshot.json", "w", encoding="utf-8") as _f:
-        json.dump(_vars_snapshot, _f, ensure_ascii=False, indent=2)
-except Exception as _e:
-    print("خطا در ذخیره متغیرها:", _e)
-
-# --- IDE variable snapshot ---
-try:
-    import json
-    _vars_snapshot = {
-        k: v for k, v in globals().items()
-        if k not in ("__name__", "__file__", "__package__", "__loader__", "__spec__", "__builtins__")
-        and isinstance(v, (int, float, str, list, dict, tuple, bool))
-    }
-    with open(r"C:/tseclient4.0\vars_snapshot.json", "w", encoding="utf-8") as _f:
-        json.dump(_vars_snapshot, _f, ensure_ascii=False, indent=2)
-except Exception as _e:
-    print("خطا در ذخیره متغیرها:", _e)
-
-
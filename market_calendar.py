@@ -0,0 +1,87 @@
+# market_calendar.py
+"""تقویم معاملاتی بورس تهران برای انقضای کش
+
+داده روزانه نمادها فقط با پایان هر جلسه معاملاتی تغییر می‌کند؛ پس داده‌ای که
+دریافت شده تا پایان جلسه بعدی معتبر است (نه چند ساعت ثابت).
+"""
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Optional
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # پایتون قدیمی
+    ZoneInfo = None
+
+# روزهای معاملاتی (weekday پایتون: دوشنبه=0): شنبه تا چهارشنبه
+DEFAULT_TRADING_WEEKDAYS = (5, 6, 0, 1, 2)
+
+# ایران از 1401 ساعت تابستانی ندارد؛ اگر پایگاه منطقه زمانی نصب نباشد همین کافی است
+TEHRAN_FIXED_OFFSET = timezone(timedelta(hours=3, minutes=30), "IRST")
+
+logger = logging.getLogger(__name__)
+
+
+def tehran_timezone(name: str = "Asia/Tehran"):
+    """منطقه زمانی تهران (در ویندوز بدون بسته tzdata، اختلاف ثابت +03:30)"""
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(name)
+        except Exception:
+            logger.debug("منطقه زمانی %s در دسترس نیست؛ از +03:30 استفاده می‌شود", name)
+    return TEHRAN_FIXED_OFFSET
+
+
+class MarketCalendar:
+    """روزهای معاملاتی، ساعت پایان جلسه و تعطیلات رسمی بورس تهران
+
+    settle_minutes: فاصله پایان جلسه تا نهایی شدن داده‌های روز (حقیقی/حقوقی و قیمت پایانی)
+    holidays: تاریخ‌های میلادی تعطیل به شکل YYYY-MM-DD
+    """
+
+    def __init__(self, close_time: time = time(12, 30), settle_minutes: int = 30,
+                 trading_weekdays: Iterable[int] = DEFAULT_TRADING_WEEKDAYS,
+                 holidays: Iterable[str] = (), tz=None):
+        self.close_time = close_time
+        self.settle = timedelta(minutes=settle_minutes)
+        self.trading_weekdays = frozenset(int(day) for day in trading_weekdays)
+        self.holidays = frozenset(date.fromisoformat(str(day)) for day in holidays)
+        self.tz = tz or tehran_timezone()
+
+    @classmethod
+    def from_settings(cls, settings: Optional[dict] = None) -> "MarketCalendar":
+        """ساخت تقویم از تنظیمات (کلیدهای market_*)"""
+        settings = settings or {}
+        hour, minute = (int(part) for part in str(settings.get("market_close_time", "12:30")).split(":")[:2])
+        return cls(
+            close_time=time(hour, minute),
+            settle_minutes=int(settings.get("market_settle_minutes", 30)),
+            trading_weekdays=settings.get("market_trading_weekdays", DEFAULT_TRADING_WEEKDAYS),
+            holidays=settings.get("market_holidays", ()),
+            tz=tehran_timezone(settings.get("market_timezone", "Asia/Tehran"))
+        )
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() in self.trading_weekdays and day not in self.holidays
+
+    def _to_market_time(self, moment: datetime) -> datetime:
+        # زمان بدون منطقه زمانی (مثل زمان ذخیره کش) به وقت محلی همین سیستم است
+        return moment.astimezone(self.tz)
+
+    def next_close_after(self, moment: datetime) -> datetime:
+        """اولین زمان نهایی شدن داده (پایان جلسه + settle) پس از moment، به وقت تهران"""
+        local = self._to_market_time(moment)
+        day = local.date()
+        # بیش از یک سال تعطیلی پشت سر هم ممکن نیست؛ حلقه فقط برای تنظیمات خراب محدود شده
+        for _ in range(370):
+            if self.is_trading_day(day):
+                close = datetime.combine(day, self.close_time, tzinfo=self.tz) + self.settle
+                if close > local:
+                    return close
+            day += timedelta(days=1)
+        return local + timedelta(days=1)
+
+    def is_fresh(self, fetched_at: datetime, now: Optional[datetime] = None) -> bool:
+        """آیا داده دریافت شده در fetched_at هنوز تا پایان جلسه بعدی معتبر است؟"""
+        now = now or datetime.now(self.tz)
+        return self._to_market_time(now) < self.next_close_after(fetched_at)
@@ -0,0 +1,147 @@
+# search_index.py
+import gc
+from typing import Dict, List
+
+# نوع‌های جستجو (همان مقادیر Combobox صفحه 3)
+MATCH_CONTAINS = "شامل"
+MATCH_PREFIX = "شروع با"
+MATCH_SUFFIX = "پایان با"
+MATCH_EXACT = "دقیق"
+
+MATCH_TYPES = (MATCH_CONTAINS, MATCH_PREFIX, MATCH_SUFFIX, MATCH_EXACT)
+
+# محدوده‌های جستجو: نام نمایشی -> کلید متن در index
+SEARCH_FIELDS = {
+    "نماد": "symbol",
+    "نام شرکت": "company",
+    "هر دو": "both"
+}
+
+# بیشترین طول n-gram برای جستجوی "شامل"
+MAX_GRAM = 3
+
+
+class _Trie:
+    """درخت پیشوندی که در هر گره شناسه همه متن‌های زیر آن گره را نگه می‌دارد"""
+
+    __slots__ = ('root',)
+
+    def __init__(self):
+        self.root = ({}, [])
+
+    def add(self, text: str, item_id: int):
+        children, ids = self.root
+        ids.append(item_id)
+        for ch in text:
+            node = children.get(ch)
+            if node is None:
+                node = children[ch] = ({}, [])
+            children, ids = node
+            ids.append(item_id)
+
+    def find(self, prefix: str) -> List[int]:
+        node = self.root
+        for ch in prefix:
+            node = node[0].get(ch)
+            if node is None:
+                return []
+        return node[1]
+
+
+class _FieldIndex:
+    """index یک محدوده متنی: دقیق، پیشوندی، پسوندی و n-gram"""
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.exact: Dict[str, List[int]] = {}
+        self.prefix = _Trie()
+        self.suffix = _Trie()
+        self.grams: Dict[str, List[int]] = {}
+
+        for item_id, text in enumerate(texts):
+            self.exact.setdefault(text, []).append(item_id)
+            self.prefix.add(text, item_id)
+            self.suffix.add(text[::-1], item_id)
+
+            # شناسه‌ها به ترتیب افزوده می‌شوند، پس هر لیست مرتب و بدون تکرار می‌ماند
+            grams = self.grams
+            for gram in {text[start:start + size]
+                         for size in range(1, MAX_GRAM + 1)
+                         for start in range(len(text) - size + 1)}:
+                posting = grams.get(gram)
+                if posting is None:
+                    grams[gram] = [item_id]
+                else:
+                    posting.append(item_id)
+
+    def contains(self, term: str) -> List[int]:
+        if len(term) <= MAX_GRAM:
+            return self.grams.get(term, [])
+
+        # کوتاه‌ترین لیست n-gram نامزدها را می‌دهد؛ بقیه با اشتراک و تأیید نهایی حذف می‌شوند
+        postings = []
+        for start in range(len(term) - MAX_GRAM + 1):
+            ids = self.grams.get(term[start:start + MAX_GRAM])
+            if not ids:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+
+        candidates = postings[0]
+        for ids in postings[1:]:
+            if len(candidates) < 32:
+                break
+            other = set(ids)
+            candidates = [i for i in candidates if i in other]
+
+        texts = self.texts
+        return [i for i in candidates if term in texts[i]]
+
+
+class SymbolSearchIndex:
+    """index جستجوی نمادها روی نماد و نام شرکت نرمال‌شده
+
+    متن‌ها باید با DataLoader.normalize_text نرمال شده باشند؛ خروجی search
+    شماره ردیف‌ها در لیست‌های ورودی به ترتیب اصلی است.
+    """
+
+    def __init__(self, symbols: List[str], companies: List[str]):
+        symbol_texts = [str(s) for s in symbols]
+        company_texts = [str(c) for c in companies]
+
+        self.size = len(symbol_texts)
+
+        # ساخت ده‌ها هزار لیست/دیکشنری کوچک؛ GC چرخه‌ای در این مدت فقط کند می‌کند
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.fields = {
+                'symbol': _FieldIndex(symbol_texts),
+                'company': _FieldIndex(company_texts),
+                'both': _FieldIndex([f"{s} {c}" for s, c in zip(symbol_texts, company_texts)])
+            }
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def search(self, term: str, search_type: str = MATCH_CONTAINS, search_in: str = "نماد") -> List[int]:
+        """جستجوی عبارت نرمال‌شده و بازگرداندن شماره ردیف‌های منطبق
+
+        نوع یا محدوده ناشناخته ValueError می‌دهد (نه جستجوی بی‌صدای "شامل").
+        """
+        if search_type not in MATCH_TYPES:
+            raise ValueError(f"نوع جستجوی ناشناخته: {search_type!r}")
+        if search_in not in SEARCH_FIELDS:
+            raise ValueError(f"محدوده جستجوی ناشناخته: {search_in!r}")
+        if not term:
+            return list(range(self.size))
+
+        index = self.fields[SEARCH_FIELDS[search_in]]
+
+        if search_type == MATCH_EXACT:
+            return index.exact.get(term, [])
+        if search_type == MATCH_PREFIX:
+            return index.prefix.find(term)
+        if search_type == MATCH_SUFFIX:
+            return index.suffix.find(term[::-1])
+        return index.contains(term)
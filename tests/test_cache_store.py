@@ -0,0 +1,316 @@
+# test_cache_store.py
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import cache_store
+from cache_store import CacheManager, DiskCache, MemoryCache
+from config import checksum_path
+
+
+# ---------- MemoryCache ----------
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_bytes=30)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.encode(), 10)
+
+    # خواندن a آن را تازه می‌کند؛ پس b قدیمی‌ترین است
+    assert cache.get("a") == b"a"
+    cache.put("d", b"d", 10)
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == [b"a", b"c", b"d"]
+    assert cache.stats()['evictions'] == 1
+    assert cache.current_bytes == 30
+
+
+def test_memory_cache_replacing_key_updates_size_and_order():
+    cache = MemoryCache(max_bytes=30)
+    cache.put("a", b"a", 10)
+    cache.put("b", b"b", 10)
+    cache.put("a", b"A", 15)
+    cache.put("c", b"c", 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"A"
+    assert cache.current_bytes == 25
+
+
+def test_memory_cache_skips_value_larger_than_limit():
+    cache = MemoryCache(max_bytes=30)
+    cache.put("a", b"a", 10)
+    cache.put("big", b"x", 31)
+
+    assert cache.get("big") is None
+    assert cache.get("a") == b"a"
+
+
+def test_memory_cache_drops_stale_value():
+    cache = MemoryCache(max_bytes=30)
+    cache.put("a", b"a", 10)
+
+    assert cache.get("a", is_fresh=lambda value: False) is None
+    assert cache.current_bytes == 0
+    assert cache.stats()['misses'] == 1
+
+
+def test_memory_cache_disabled_with_zero_limit():
+    cache = MemoryCache(max_bytes=0)
+    cache.put("a", b"a", 1)
+    assert cache.get("a") is None
+
+
+def test_memory_cache_stats_hit_rate():
+    cache = MemoryCache(max_bytes=30)
+    cache.put("a", b"a", 10)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries'], stats['bytes']) == (2, 1, 1, 10)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    return DiskCache(str(tmp_path))
+
+
+# ---------- DiskCache: نوشتن اتمیک و checksum ----------
+
+def test_disk_cache_round_trip_with_checksum(disk_cache):
+    disk_cache.write("price_1", b'{"closingPriceDaily":[]}', etag='"v1"')
+
+    entry = disk_cache.read("price_1")
+
+    assert entry.body() == b'{"closingPriceDaily":[]}'
+    assert entry.etag == '"v1"'
+    assert os.path.exists(checksum_path(disk_cache.path("price_1")))
+
+
+def test_disk_cache_accepts_complete_entry_without_checksum(disk_cache):
+    disk_cache.write("price_1", b'[1,2,3]')
+    os.remove(checksum_path(disk_cache.path("price_1")))
+
+    assert disk_cache.read("price_1").data() == [1, 2, 3]
+
+
+def test_disk_cache_rejects_truncated_entry_without_checksum(disk_cache):
+    disk_cache.write("price_1", b'[1,2,3]')
+    path = disk_cache.path("price_1")
+    os.remove(checksum_path(path))
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:-6])
+
+    assert disk_cache.read("price_1") is None
+
+
+def test_disk_cache_removes_entry_with_wrong_checksum(disk_cache):
+    disk_cache.write("price_1", b'[1,2,3]')
+    path = disk_cache.path("price_1")
+    with open(path, 'ab') as f:
+        f.write(b"garbage")
+
+    assert disk_cache.read("price_1") is None
+    assert not os.path.exists(path)
+    assert not os.path.exists(checksum_path(path))
+
+
+# ---------- DiskCache: فشرده‌سازی ----------
+
+def test_gzip_entry_is_compressed_on_disk(disk_cache):
+    body = b'[' + b','.join(b'1234' for _ in range(1000)) + b']'
+    disk_cache.write("price_1", body)
+    path = disk_cache.path("price_1")
+
+    assert path.endswith(".json.gz")
+    assert os.path.getsize(path) < len(body) / 10
+    with open(path, 'rb') as f:
+        assert gzip.decompress(f.read()).startswith(b'{"timestamp"')
+
+
+def test_zstd_entry_round_trip_and_read_by_gzip_cache(tmp_path):
+    pytest.importorskip("zstandard")
+    zstd_cache = DiskCache(str(tmp_path), codec='zstd')
+    zstd_cache.write("price_1", b'[1,2]')
+    assert zstd_cache.path("price_1").endswith(".json.zst")
+
+    # تغییر کدک در تنظیمات: فایل‌های کدک قبلی همچنان خوانده می‌شوند
+    assert DiskCache(str(tmp_path), codec='gzip').read("price_1").data() == [1, 2]
+
+
+def test_zstd_falls_back_to_gzip_without_package(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_store, '_load_zstandard', lambda: None)
+    assert DiskCache(str(tmp_path), codec='zstd').codec == 'gzip'
+
+
+def test_legacy_json_entry_is_migrated(disk_cache):
+    legacy = {"timestamp": "2024-01-06T10:00:00", "etag": '"old"', "data": {"closingPriceDaily": [1]}}
+    with open(disk_cache.legacy_path("price_1"), 'w', encoding='utf-8') as f:
+        json.dump(legacy, f, ensure_ascii=False, indent=2)
+
+    entry = disk_cache.read("price_1")
+
+    assert entry.data() == {"closingPriceDaily": [1]}
+    assert entry.etag == '"old"'
+    assert not os.path.exists(disk_cache.legacy_path("price_1"))
+    migrated = disk_cache.read("price_1")
+    assert migrated.timestamp.isoformat() == "2024-01-06T10:00:00"
+    assert migrated.data() == {"closingPriceDaily": [1]}
+
+
+def test_writing_removes_other_codec_variants(tmp_path):
+    pytest.importorskip("zstandard")
+    DiskCache(str(tmp_path), codec='zstd').write("price_1", b'[1]')
+    gzip_cache = DiskCache(str(tmp_path), codec='gzip')
+    gzip_cache.write("price_1", b'[2]')
+
+    assert sorted(os.listdir(tmp_path)) == ["price_1.json.gz", "price_1.json.gz.sha256"]
+
+
+# ---------- DiskCache: سرآیند و درخواست شرطی ----------
+
+def test_header_fields_inside_body_do_not_override_header(disk_cache):
+    body = b'{"timestamp":"2001-01-01T00:00:00","etag":"body","last_modified":"old"}'
+    disk_cache.write("price_1", body, etag='"v2"')
+
+    entry = disk_cache.read("price_1")
+
+    assert entry.timestamp.year != 2001
+    assert entry.etag == '"v2"'
+    assert entry.last_modified is None
+    assert entry.body() == body
+    assert disk_cache.read_timestamp(disk_cache.path("price_1")).year != 2001
+
+
+def test_conditional_headers_from_validators():
+    entry = DiskCache.make_entry(b"[]", etag='"abc"', last_modified="Wed, 01 Jan 2025 00:00:00 GMT")
+    assert entry.conditional_headers() == {
+        'If-None-Match': '"abc"',
+        'If-Modified-Since': "Wed, 01 Jan 2025 00:00:00 GMT",
+    }
+    assert DiskCache.make_entry(b"[]").conditional_headers() == {}
+
+
+def test_body_survives_rewrite_after_not_modified(disk_cache):
+    body = '{"نماد":"فولاد","data":[1]}'.encode('utf-8')
+    disk_cache.write("client_1", body, etag='"v1"')
+    old = disk_cache.read("client_1")
+
+    # پاسخ 304: همان بدنه با زمان تازه دوباره نوشته می‌شود
+    disk_cache.write("client_1", old.body(), etag=old.etag)
+
+    entry = disk_cache.read("client_1")
+    assert entry.body() == body
+    assert entry.timestamp > old.timestamp
+
+
+# ---------- CacheManager ----------
+
+def write_entries(disk_cache, keys, size=4000):
+    """نوشتن ورودی‌ها با زمان استفاده صعودی (اولی کم‌استفاده‌ترین)"""
+    sizes = {}
+    for age, key in enumerate(reversed(keys), start=1):
+        disk_cache.write(key, os.urandom(size))
+        path = disk_cache.path(key)
+        os.utime(path, (1_000_000_000 - age * 60,) * 2)
+        sizes[key] = os.path.getsize(path)
+    return sizes
+
+
+def test_manager_removes_least_recently_used_until_under_target(disk_cache):
+    keys = [f"price_{i}" for i in range(5)]
+    write_entries(disk_cache, keys)
+    manager = CacheManager(disk_cache, max_bytes=3 * 4200, target_ratio=0.9)
+
+    removed, freed = manager.enforce_limit()
+
+    assert removed == 3
+    assert freed > 0
+    remaining = [key for key in keys if os.path.exists(disk_cache.path(key))]
+    assert remaining == ["price_3", "price_4"]
+    # فایل checksum همراه ورودی حذف می‌شود
+    assert not os.path.exists(disk_cache.path("price_0") + ".sha256")
+
+
+def test_manager_read_refreshes_lru_position(disk_cache):
+    keys = [f"client_{i}" for i in range(3)]
+    write_entries(disk_cache, keys)
+    assert disk_cache.read("client_0") is not None
+    manager = CacheManager(disk_cache, max_bytes=2 * 4200, target_ratio=1.0)
+
+    manager.enforce_limit()
+
+    assert os.path.exists(disk_cache.path("client_0"))
+    assert not os.path.exists(disk_cache.path("client_1"))
+
+
+def test_manager_ignores_non_cache_files(disk_cache, tmp_path):
+    write_entries(disk_cache, ["price_0", "price_1"])
+    snapshot = tmp_path / "market_snapshot.pkl.gz"
+    snapshot.write_bytes(os.urandom(20000))
+    manager = CacheManager(disk_cache, max_bytes=5000, target_ratio=1.0)
+
+    removed, _ = manager.enforce_limit()
+
+    assert removed == 1
+    assert snapshot.exists()
+
+
+def test_manager_without_limit_keeps_everything(disk_cache):
+    keys = [f"price_{i}" for i in range(3)]
+    write_entries(disk_cache, keys)
+    manager = CacheManager(disk_cache, max_bytes=0)
+
+    assert manager.enforce_limit() == (0, 0)
+    manager.note_write(10 ** 9)
+    assert all(os.path.exists(disk_cache.path(key)) for key in keys)
+
+
+def test_manager_removes_orphaned_temp_files(disk_cache, tmp_path):
+    old_temp = tmp_path / ".price_0.json.gz.tmp123"
+    new_temp = tmp_path / ".price_1.json.gz.tmp456"
+    old_temp.write_bytes(b"x")
+    new_temp.write_bytes(b"x")
+    os.utime(old_temp, (time.time() - 2 * 3600,) * 2)
+
+    CacheManager(disk_cache, max_bytes=0).enforce_limit()
+
+    assert not old_temp.exists()
+    # نوشتن در جریان رشته دیگر دست نمی‌خورد
+    assert new_temp.exists()
+
+
+def test_manager_counters_survive_restart(disk_cache):
+    manager = CacheManager(disk_cache, max_bytes=0)
+    manager.record("price_1", "memory")
+    manager.record("price_2", "miss")
+    manager.record("client_1", "disk")
+    manager.save_counters()
+
+    stats = CacheManager(disk_cache, max_bytes=0).stats()
+
+    assert stats['endpoints']['price']['hits'] == 1
+    assert stats['endpoints']['price']['lookups'] == 2
+    assert stats['endpoints']['client']['hit_rate'] == 1.0
+    assert stats['total']['lookups'] == 3
+
+
+def test_manager_stats_counts_entries_and_ages(disk_cache):
+    now = datetime.now()
+    disk_cache.store("price_1", disk_cache.make_entry(b"[]", timestamp=now - timedelta(minutes=5)))
+    disk_cache.store("price_2", disk_cache.make_entry(b"[]", timestamp=now - timedelta(days=2)))
+
+    row = CacheManager(disk_cache, max_bytes=0).stats(now=now)['endpoints']['price']
+
+    assert row['entries'] == 2
+    assert row['ages']['<1h'] == 1
+    assert row['ages']['1-7d'] == 1
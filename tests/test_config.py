@@ -0,0 +1,126 @@
+# test_config.py
+import hashlib
+import os
+from unittest import mock
+
+import pytest
+
+from config import (atomic_file, atomic_write, checksum_path, read_checksum, read_log_tail,
+                    verify_checksum)
+
+
+# ---------- نوشتن اتمیک ----------
+
+def test_atomic_write_replaces_file_and_records_checksum(tmp_path):
+    path = str(tmp_path / "out.csv")
+    atomic_write(path, b"old", checksum=True)
+    atomic_write(path, b"new", checksum=True)
+
+    with open(path, 'rb') as f:
+        assert f.read() == b"new"
+    assert read_checksum(path) == hashlib.sha256(b"new").hexdigest()
+    assert verify_checksum(path)
+    # بدون فایل موقت باقی‌مانده
+    assert sorted(os.listdir(tmp_path)) == ["out.csv", "out.csv.sha256"]
+
+
+def test_checksum_file_uses_sha256sum_format(tmp_path):
+    path = str(tmp_path / "out.csv")
+    atomic_write(path, b"data", checksum=True)
+
+    with open(checksum_path(path), encoding='utf-8') as f:
+        assert f.read() == f"{hashlib.sha256(b'data').hexdigest()}  out.csv\n"
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = str(tmp_path / "out.csv")
+    atomic_write(path, b"old")
+
+    with mock.patch('config.os.replace', side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            atomic_write(path, b"new")
+
+    with open(path, 'rb') as f:
+        assert f.read() == b"old"
+    assert os.listdir(tmp_path) == ["out.csv"]
+
+
+def test_durable_write_fsyncs_and_cache_write_does_not(tmp_path):
+    with mock.patch('config.os.fsync') as fsync:
+        atomic_write(str(tmp_path / "a"), b"x", checksum=True)
+        durable_calls = fsync.call_count
+        fsync.reset_mock()
+        atomic_write(str(tmp_path / "b"), b"x", checksum=True, durable=False)
+
+    assert durable_calls > 0
+    assert fsync.call_count == 0
+    assert verify_checksum(str(tmp_path / "b"))
+
+
+def test_atomic_file_replaces_only_on_success(tmp_path):
+    path = str(tmp_path / "out.xlsx")
+    with atomic_file(path, checksum=True) as temp_path:
+        with open(temp_path, 'wb') as f:
+            f.write(b"first")
+
+    with pytest.raises(RuntimeError):
+        with atomic_file(path, checksum=True) as temp_path:
+            with open(temp_path, 'wb') as f:
+                f.write(b"half")
+            raise RuntimeError("writer failed")
+
+    with open(path, 'rb') as f:
+        assert f.read() == b"first"
+    assert verify_checksum(path)
+    assert sorted(os.listdir(tmp_path)) == ["out.xlsx", "out.xlsx.sha256"]
+
+
+def test_verify_checksum_detects_changed_or_missing_sidecar(tmp_path):
+    path = str(tmp_path / "out.csv")
+    atomic_write(path, b"data", checksum=True)
+    with open(path, 'ab') as f:
+        f.write(b"!")
+    assert not verify_checksum(path)
+
+    os.remove(checksum_path(path))
+    assert read_checksum(path) is None
+    assert not verify_checksum(path)
+
+
+# ---------- خواندن انتهای لاگ ----------
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_bytes("".join(f"خط {i}\r\n" for i in range(100)).encode('utf-8'))
+    return str(path)
+
+
+@pytest.mark.parametrize("block_size", [7, 64, 1024 * 1024])
+def test_read_log_tail_returns_last_lines(log_file, block_size):
+    lines, start = read_log_tail(log_file, 5, block_size=block_size)
+
+    assert lines == [f"خط {i}" for i in range(95, 100)]
+    with open(log_file, 'rb') as f:
+        f.seek(start)
+        assert f.readline().decode('utf-8').rstrip() == "خط 95"
+
+
+@pytest.mark.parametrize("block_size", [7, 1024])
+def test_read_log_tail_pages_backwards_to_file_start(log_file, block_size):
+    pages = []
+    end = None
+    while end != 0:
+        lines, end = read_log_tail(log_file, 30, end=end, block_size=block_size)
+        pages.append(lines)
+
+    assert [len(page) for page in pages] == [30, 30, 30, 10]
+    assert [line for page in reversed(pages) for line in page] == [f"خط {i}" for i in range(100)]
+
+
+def test_read_log_tail_short_file_and_missing_final_newline(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_bytes(b"first\nsecond")
+
+    assert read_log_tail(str(path), 10) == (["first", "second"], 0)
+    assert read_log_tail(str(path), 1) == (["second"], 6)
@@ -0,0 +1,351 @@
+# test_data_loader.py
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from config import checksum_path
+from data_loader import DataLoader
+
+
+def instrument_row(inscode, symbol, company="شرکت", market="300", industry="27",
+                   isin=None, heven="123000", last_price="1000"):
+    """یک ردیف کامل بخش 2 MarketWatchPlus (26 ستون)"""
+    fields = [""] * 26
+    fields[0] = inscode
+    fields[1] = isin or f"IRO1{inscode[:4]}0001"
+    fields[2] = symbol
+    fields[3] = company
+    fields[4] = heven
+    fields[7] = last_price
+    fields[18] = industry
+    fields[22] = market
+    return ",".join(fields)
+
+
+ROWS = [
+    instrument_row("1001", "فولاد", "فولاد مبارکه", market="300", industry="27"),
+    instrument_row("1002", "فملی", "ملی مس", market="300", industry="27"),
+    instrument_row("1003", "خودرو", "ایران خودرو", market="303", industry="34"),
+    instrument_row("1004", "فولاد2", "فولاد بلوک", market="300", industry="27", isin="IRO1FOLD0002"),
+]
+
+
+@pytest.fixture
+def loader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = SimpleNamespace(settings={
+        "data_url": "http://tsetmc.test/MarketWatchPlus?h=0&r=0",
+        "snapshot_file": str(tmp_path / "market_watch.pkl.gz"),
+        "default_markets": [],
+    })
+    return DataLoader(config)
+
+
+def load_rows(loader, rows=ROWS):
+    loader.raw_data = loader._parse_instrument_rows(rows)
+    loader.filtered_data = loader.raw_data.copy()
+    loader._reset_inscode_index()
+    loader._build_symbol_counts()
+    return loader
+
+
+# ---------- نرمال‌سازی متن ----------
+
+@pytest.mark.parametrize("value", [None, float('nan'), pd.NA, pd.NaT])
+def test_normalize_text_empty_values(loader, value):
+    assert loader.normalize_text(value) == ''
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("كيميا", "کیمیا"),
+    ("\ufe91\ufe8e\ufee7\ufeda", "بانک"),
+    ("خودرو ۱۲٣", "خودرو 123"),
+    ("می\u200cشود", "می شود"),
+    ("  بانک   ملت\t", "بانک ملت"),
+    (1234, "1234"),
+])
+def test_normalize_text(loader, raw, expected):
+    assert loader.normalize_text(raw) == expected
+
+
+def test_normalize_series_matches_normalize_text(loader):
+    values = ["كيميا", None, "  \ufe91\ufe8e\ufee7\ufeda ۲ ", float('nan'), "می\u200cشود"]
+
+    result = loader.normalize_series(pd.Series(values, dtype=object)).tolist()
+
+    assert result == [loader.normalize_text(value) for value in values]
+
+
+# ---------- snapshot ----------
+
+def test_snapshot_round_trip(loader):
+    load_rows(loader)
+    loader.market_watch_refid = 42
+    assert loader.save_snapshot()
+
+    restored = DataLoader(loader.config)
+    success, _ = restored.load_snapshot()
+
+    assert success
+    assert restored.is_warm_start
+    assert restored.market_watch_refid == 42
+    assert restored.raw_data['نماد'].tolist() == loader.raw_data['نماد'].tolist()
+
+
+def test_snapshot_without_checksum_is_accepted_when_complete(loader):
+    load_rows(loader)
+    loader.save_snapshot()
+    os.remove(checksum_path(loader._snapshot_path()))
+
+    success, _ = DataLoader(loader.config).load_snapshot()
+
+    assert success
+
+
+def test_snapshot_with_wrong_checksum_is_rejected(loader):
+    load_rows(loader)
+    loader.save_snapshot()
+    with open(loader._snapshot_path(), 'ab') as f:
+        f.write(b"x")
+
+    success, _ = DataLoader(loader.config).load_snapshot()
+
+    assert not success
+
+
+def test_truncated_snapshot_without_checksum_is_rejected(loader):
+    load_rows(loader)
+    loader.save_snapshot()
+    path = loader._snapshot_path()
+    os.remove(checksum_path(path))
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    restored = DataLoader(loader.config)
+    success, _ = restored.load_snapshot()
+
+    assert not success
+    assert restored.raw_data is None
+
+
+# ---------- شمارش نمادها ----------
+
+COUNT_ROWS = ROWS + [
+    instrument_row("1005", "وبملت", market="300", industry="57"),
+    instrument_row("1006", "وبملت1", market="300", industry="57"),
+    instrument_row("1007", "اخابر", market="303", industry="64"),
+    instrument_row("1008", "", market="309", industry=" "),
+]
+
+
+@pytest.mark.parametrize("markets", [None, ["300"], ["303", "309"], ["999"]])
+@pytest.mark.parametrize("industries", [None, ["27"], ["57", "64"]])
+@pytest.mark.parametrize("remove_block_trades", [False, True])
+def test_count_symbols_matches_filtering(loader, markets, industries, remove_block_trades):
+    load_rows(loader, COUNT_ROWS)
+    df = loader.raw_data
+    mask = pd.Series(True, index=df.index)
+    if markets is not None:
+        mask &= df['کد_بازار'].isin(markets)
+    if industries is not None:
+        mask &= df['گروه_صنعت'].isin(industries)
+    if remove_block_trades:
+        mask &= loader._regular_symbol_mask(df)
+
+    assert loader.count_symbols(markets, industries, remove_block_trades) == int(mask.sum())
+
+
+def test_market_codes_and_industries_from_counts(loader):
+    load_rows(loader, COUNT_ROWS)
+
+    markets = {item['code']: item['count'] for item in loader.get_market_codes()}
+    assert markets == {"300": 5, "303": 2, "309": 1}
+
+    # بدون فیلتر بازار همه نمادها؛ صنعت خالی نمایش داده نمی‌شود
+    industries = {item['code']: item['count'] for item in loader.get_industries()}
+    assert industries == {"27": 3, "34": 1, "57": 2, "64": 1}
+
+    # با فیلتر بازار معاملات بلوکی (فولاد2، وبملت1) کنار می‌روند
+    loader.selected_markets = ["300"]
+    industries = {item['code']: item['count'] for item in loader.get_industries()}
+    assert industries == {"27": 2, "57": 1}
+
+
+def test_counts_match_applied_filters(loader):
+    load_rows(loader, COUNT_ROWS)
+    loader.apply_market_filter(["300", "303"], remove_block_trades=True)
+    loader.apply_industry_filter(["27", "64"])
+
+    assert len(loader.filtered_data) == loader.count_symbols(["300", "303"], ["27", "64"], True) == 3
+
+
+# ---------- بخش‌های MarketWatchPlus ----------
+
+def best_limit_row(inscode, level, bid, ask, bid_volume=100, ask_volume=200):
+    return f"{inscode},{level},3,4,{bid},{ask},{bid_volume},{ask_volume}"
+
+
+SECTION3 = ";".join([
+    best_limit_row("1001", 2, 990, 1020),
+    best_limit_row("1001", 1, 995, 1010),
+    best_limit_row("1002", 1, 500.5, 510),
+    "1003,1,bad",
+])
+
+
+def test_parse_instrument_rows(loader):
+    df = loader._parse_instrument_rows(ROWS)
+
+    assert df['ردیف'].tolist() == [1, 2, 3, 4]
+    assert df['نماد'].tolist() == ["فولاد", "فملی", "خودرو", "فولاد2"]
+    assert df.loc[0, 'کد_بازار'] == "300"
+    assert df.loc[2, 'گروه_صنعت'] == "34"
+    assert 'نام_صنعت' in df.columns
+
+
+def test_parse_extra_sections(loader):
+    load_rows(loader)
+    sections = ["", "overview,1,2", ";".join(ROWS), SECTION3, "98765"]
+
+    loader._parse_extra_sections(sections)
+
+    assert loader.market_overview == ["overview", "1", "2"]
+    assert loader.market_watch_refid == 98765
+    # ردیف ناقص کنار گذاشته می‌شود؛ مظنه‌ها به ترتیب ردیف مرتب‌اند
+    assert len(loader.best_limits) == 3
+    assert loader.best_limits.loc[("1001", 1), 'قیمت_خرید'] == 995
+    assert loader.get_top_of_book("1001")['قیمت_فروش'] == 1010
+    assert loader.get_top_of_book("1002")['قیمت_خرید'] == 500.5
+    assert loader.get_top_of_book("1003") is None
+
+
+def test_top_of_book_columns_for_symbol_list(loader):
+    load_rows(loader)
+    loader._parse_extra_sections(["", "", "", SECTION3])
+
+    columns = loader.get_top_of_book_columns(["1001", "1003", "1002"])
+
+    assert columns == {'قیمت_خرید': [995, '', 500.5], 'قیمت_فروش': [1010, '', 510]}
+
+
+def test_missing_sections_keep_defaults(loader):
+    load_rows(loader)
+    loader.market_watch_refid = 7
+
+    loader._parse_extra_sections(["", "", ";".join(ROWS)])
+
+    assert loader.best_limits.empty
+    assert loader.top_of_book == {}
+    assert loader.market_watch_refid == 7
+
+
+# ---------- به‌روزرسانی افزایشی (h/r) ----------
+
+class FakeSession:
+    """پاسخ‌های از پیش تعیین شده MarketWatchPlus به ترتیب درخواست"""
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        text = self.texts.pop(0)
+        return SimpleNamespace(text=text, content=text.encode('utf-8'), encoding=None,
+                               raise_for_status=lambda: None)
+
+
+def delta_row(inscode, heven, last_price):
+    # کد، زمان، اولین، پایانی، آخرین، تعداد، حجم، ارزش، کمترین، بیشترین
+    return f"{inscode},{heven},990,1000,{last_price},10,1000,1000000,980,1020"
+
+
+def filtered_symbols(loader):
+    return sorted(loader.filtered_data['نماد'].tolist())
+
+
+def test_delta_rows_update_prices_in_raw_and_filtered_data(loader):
+    load_rows(loader)
+    loader.apply_market_filter(["300"])
+
+    changed = loader._apply_instrument_changes([delta_row("1001", "124500", "1111"), delta_row("9999", "1", "5")])
+
+    assert changed == 1
+    assert loader.raw_data.loc[0, 'قیمت_آخرین_معامله'] == "1111"
+    assert loader.filtered_data.loc[0, 'قیمت_آخرین_معامله'] == "1111"
+    assert loader.market_watch_heven == 124500
+
+
+def test_new_row_is_counted_and_filtered(loader):
+    load_rows(loader)
+    loader.apply_market_filter(["300"])
+
+    loader._apply_instrument_changes([
+        instrument_row("1005", "شپنا", market="300", industry="23"),
+        instrument_row("1006", "اخابر", market="303", industry="64"),
+    ])
+
+    assert loader.get_symbol_info("شپنا") is not None
+    assert "اخابر" not in filtered_symbols(loader)
+    assert loader.count_symbols(markets=["300"], remove_block_trades=True) == 3
+    assert loader.count_symbols() == 6
+
+
+def test_reclassified_row_rebuilds_counts_and_filters(loader):
+    load_rows(loader)
+    loader.apply_market_filter(["300"])
+    loader.apply_industry_filter(["27"])
+    assert filtered_symbols(loader) == ["فملی", "فولاد"]
+
+    # فملی به بازار 303 و صنعت دیگر منتقل می‌شود
+    loader._apply_instrument_changes([instrument_row("1002", "فملی", "ملی مس", market="303", industry="29")])
+
+    assert filtered_symbols(loader) == ["فولاد"]
+    assert loader.count_symbols(markets=["300"]) == 2
+    assert loader.count_symbols(markets=["303"]) == 2
+    assert {item['code'] for item in loader.get_industries()} == {"27"}
+    assert {item['code']: item['count'] for item in loader.get_market_codes()} == {"300": 2, "303": 2}
+
+
+def test_unchanged_full_row_keeps_filtered_data(loader):
+    load_rows(loader)
+    loader.apply_market_filter(["300"])
+    filtered = loader.filtered_data
+
+    loader._apply_instrument_changes([instrument_row("1001", "فولاد", "فولاد مبارکه", last_price="1200")])
+
+    assert loader.filtered_data is filtered
+    assert loader.filtered_data.loc[0, 'قیمت_آخرین_معامله'] == "1200"
+
+
+def test_refresh_requests_delta_with_heven_and_refid(loader):
+    load_rows(loader)
+    loader.market_watch_heven = 123000
+    loader.market_watch_refid = 555
+    loader.session = FakeSession("@@" + delta_row("1003", "125959", "77") + "@@556")
+
+    success, _ = loader.refresh_market_watch()
+
+    assert success
+    assert "h=123000" in loader.session.urls[0] and "r=555" in loader.session.urls[0]
+    assert loader.market_watch_refid == 556
+    assert loader.market_watch_heven == 125959
+    assert loader.raw_data.loc[2, 'قیمت_آخرین_معامله'] == "77"
+
+
+def test_refresh_without_data_fetches_only_market_watch(loader, monkeypatch):
+    monkeypatch.setattr(loader, 'fetch_dollar_data', lambda: pytest.fail("دلار نباید دوباره دریافت شود"))
+    monkeypatch.setattr(loader, 'fetch_gold_data', lambda: pytest.fail("طلا نباید دوباره دریافت شود"))
+    monkeypatch.setattr(loader, 'save_snapshot', lambda: True)
+    loader.session = FakeSession("@@" + ";".join(ROWS) + "@@1")
+
+    success, _ = loader.refresh_market_watch()
+
+    assert success
+    assert len(loader.raw_data) == len(ROWS)
+    assert loader.market_watch_refid == 1
@@ -0,0 +1,136 @@
+# test_download_pipeline.py
+import threading
+import time
+from contextlib import contextmanager
+
+from download_pipeline import DownloadPipeline
+
+
+class FakeFrame:
+    """جایگزین DataFrame برای مرحله انتخاب ستون‌ها"""
+
+    empty = False
+    columns = ['a', 'b']
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.selected = None
+
+    def __getitem__(self, columns):
+        self.selected = columns
+        return self
+
+
+class FakeDownloader:
+    config = None
+    max_workers = 3
+    delay_between_requests = 0
+
+    def __init__(self, fetch_seconds=0.0, failing=()):
+        self.fetch_seconds = fetch_seconds
+        self.failing = set(failing)
+        self.fetched = []
+        self._lock = threading.Lock()
+
+    def get_cpu_workers(self):
+        return 0
+
+    def get_cpu_min_symbols(self):
+        return 20
+
+    def fetch_symbol_payloads(self, symbol, internal_code, apply_adjustment, cancel=None):
+        if self.fetch_seconds:
+            cancel.wait(self.fetch_seconds)
+        with self._lock:
+            self.fetched.append(symbol)
+        return {'client': ('network', internal_code.encode())}
+
+    def assemble_payloads(self, symbol, internal_code, payloads, apply_adjustment):
+        if symbol in self.failing:
+            return False, "ترکیب ناموفق"
+        return True, FakeFrame(symbol)
+
+    @contextmanager
+    def stage(self, name, symbol=None):
+        yield
+
+
+def symbols(count):
+    return [(f"s{i}", str(i)) for i in range(count)]
+
+
+def test_every_symbol_is_fetched_transformed_and_written():
+    written = []
+    pipeline = DownloadPipeline(FakeDownloader(), symbols(30), columns=['a'],
+                                writer=lambda symbol, frame: written.append(symbol) or "ok")
+
+    jobs = list(pipeline.run())
+
+    assert sorted(job.symbol for job in jobs) == sorted(s for s, _ in symbols(30))
+    assert all(job.success and job.message == "ok" for job in jobs)
+    assert all(job.frame.selected == ['a'] for job in jobs)
+    assert sorted(written) == sorted(s for s, _ in symbols(30))
+
+
+def test_failed_symbol_is_reported_and_not_written():
+    written = []
+    downloader = FakeDownloader(failing={"s2"})
+    pipeline = DownloadPipeline(downloader, symbols(5), writer=lambda symbol, frame: written.append(symbol))
+
+    jobs = {job.symbol: job for job in pipeline.run()}
+
+    assert jobs["s2"].error == "ترکیب ناموفق"
+    assert not jobs["s2"].success
+    assert "s2" not in written
+    assert len(written) == 4
+
+
+def test_small_queues_apply_backpressure_without_losing_symbols():
+    pipeline = DownloadPipeline(FakeDownloader(), symbols(50), writer=lambda symbol, frame: "ok")
+    pipeline.queue_size = 1
+
+    assert len(list(pipeline.run())) == 50
+
+
+def test_stop_cancels_remaining_symbols_promptly():
+    downloader = FakeDownloader(fetch_seconds=0.05)
+    pipeline = DownloadPipeline(downloader, symbols(200), writer=lambda symbol, frame: "ok")
+    pipeline.queue_size = 2
+    threading.Timer(0.2, pipeline.stop).start()
+
+    started = time.monotonic()
+    jobs = list(pipeline.run())
+
+    assert time.monotonic() - started < 2
+    assert len(jobs) < 200
+    assert len(downloader.fetched) < 200
+    assert not any(t.name.startswith("pipeline-") for t in threading.enumerate())
+
+
+def test_closing_consumer_early_stops_workers():
+    pipeline = DownloadPipeline(FakeDownloader(fetch_seconds=0.01), symbols(100), writer=lambda s, f: "ok")
+    run = pipeline.run()
+    next(run)
+    run.close()
+
+    assert not any(t.name.startswith("pipeline-") for t in threading.enumerate())
+
+
+def test_write_in_progress_completes_after_stop():
+    entered, release = threading.Event(), threading.Event()
+    written = []
+
+    def writer(symbol, frame):
+        entered.set()
+        release.wait(2)
+        written.append(symbol)
+        return "ok"
+
+    pipeline = DownloadPipeline(FakeDownloader(), symbols(1), writer=writer)
+    pipeline.write_workers = 1
+    threading.Thread(target=lambda: (entered.wait(2), pipeline.stop(), release.set()), daemon=True).start()
+
+    jobs = list(pipeline.run())
+
+    assert written == ["s0"]
+    assert [job.message for job in jobs] == ["ok"]
@@ -0,0 +1,315 @@
+# test_downloader.py
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+requests = pytest.importorskip("requests")
+
+import downloader as downloader_module
+from data_loader import DataLoader
+from downloader import CurrencySnapshot, Downloader, SymbolAssembler
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, headers=None):
+        self.content = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """session با پاسخ ثابت یا تابع دلخواه به جای شبکه"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.urls = []
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None, **kwargs):
+        with self._lock:
+            self.urls.append(url)
+        return self.handler(url)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = SimpleNamespace(
+        settings={
+            "client_url": "http://tsetmc.test/client/{inscode}",
+            "price_url": "http://tsetmc.test/price/{inscode}",
+            "memory_cache_mb": 1,
+        },
+        get_adjustment_url=lambda inscode: f"http://tsetmc.test/adjustment/{inscode}",
+    )
+    downloader = Downloader(config, None)
+    yield downloader
+    downloader.close_session()
+
+
+# ---------- یکی کردن درخواست‌های همزمان ----------
+
+def run_concurrently(count, target):
+    results = [None] * count
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, target())) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "شرط در مهلت برقرار نشد"
+        time.sleep(0.005)
+
+
+def test_concurrent_calls_share_one_execution(downloader):
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(2)
+        return "result"
+
+    threads, results = run_concurrently(5, lambda: downloader._single_flight(('price', '1', True), work))
+    wait_until(lambda: downloader.coalesced_requests == 4)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert calls == [1]
+    assert results == ["result"] * 5
+    assert downloader._inflight == {}
+
+
+def test_leader_exception_reaches_every_waiter(downloader):
+    release = threading.Event()
+    errors = []
+
+    def work():
+        release.wait(2)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            downloader._single_flight(('client', '1', True), work)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads, _ = run_concurrently(3, call)
+    wait_until(lambda: downloader.coalesced_requests == 2)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert errors == ["boom"] * 3
+    # کلید آزاد شده و فراخوانی بعدی دوباره اجرا می‌شود
+    assert downloader._single_flight(('client', '1', True), lambda: "again") == "again"
+
+
+def test_use_cache_is_part_of_the_key(downloader):
+    release = threading.Event()
+    calls = []
+    results = {}
+
+    def call(use_cache):
+        def work():
+            calls.append(use_cache)
+            release.wait(2)
+            return use_cache
+        results[use_cache] = downloader._single_flight(('price', '1', use_cache), work)
+
+    threads = [threading.Thread(target=call, args=(use_cache,)) for use_cache in (True, False)]
+    for thread in threads:
+        thread.start()
+    # هر دو اجرا همزمان شروع می‌شوند؛ فراخوان بدون کش به فراخوان با کش نمی‌پیوندد
+    wait_until(lambda: len(calls) == 2)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert results == {True: True, False: False}
+    assert downloader.coalesced_requests == 0
+
+
+def test_concurrent_fetches_make_one_request(downloader):
+    release = threading.Event()
+
+    def handler(url):
+        release.wait(2)
+        return FakeResponse(b'{"closingPriceDaily":[1]}')
+
+    downloader.session = FakeSession(handler)
+    threads, results = run_concurrently(4, lambda: downloader._fetch_raw('price', '42'))
+    wait_until(lambda: downloader.coalesced_requests == 3)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert downloader.session.urls == ["http://tsetmc.test/price/42"]
+    assert results == [('network', b'{"closingPriceDaily":[1]}')] * 4
+    # درخواست بعدی از کش حافظه پاسخ داده می‌شود
+    assert downloader._fetch_raw('price', '42')[0] == 'memory'
+
+
+# ---------- لغو ----------
+
+def test_cancel_skips_retry_wait_and_remaining_requests(downloader):
+    cancel = threading.Event()
+
+    def handler(url):
+        cancel.set()
+        raise requests.exceptions.ConnectionError("offline")
+
+    downloader.session = FakeSession(handler)
+    started = time.monotonic()
+
+    payloads = downloader.fetch_symbol_payloads("فولاد", "42", cancel=cancel)
+
+    assert payloads == {}
+    assert time.monotonic() - started < 0.5
+    # بدون تلاش مجدد و بدون درخواست قیمت و تعدیل
+    assert downloader.session.urls == ["http://tsetmc.test/client/42"]
+
+
+def test_already_cancelled_symbol_makes_no_requests(downloader):
+    cancel = threading.Event()
+    cancel.set()
+    downloader.session = FakeSession(lambda url: pytest.fail("درخواستی نباید ارسال شود"))
+
+    assert downloader.fetch_symbol_payloads("فولاد", "42", cancel=cancel) == {}
+
+
+def test_retry_without_cancel_still_retries(downloader, monkeypatch):
+    attempts = []
+
+    def handler(url):
+        attempts.append(url)
+        if len(attempts) < 3:
+            raise requests.exceptions.ConnectionError("flaky")
+        return FakeResponse(b'[1]')
+
+    monkeypatch.setattr("downloader.time.sleep", lambda seconds: None)
+    downloader.session = FakeSession(handler)
+
+    assert downloader._fetch_raw('client', '7') == ('network', b'[1]')
+    assert len(attempts) == 3
+
+
+# ---------- ترکیب بدون شبکه ----------
+
+DOLLAR = pd.DataFrame({
+    'recDate': ['20240110', '20240101', '20240105', '20240120'],
+    'dollar_close': [600000, 500000, 550000, 610000],
+})
+GOLD = pd.DataFrame({
+    'recDate': ['20240101', '20240120'],
+    'gold_close': [2000, 2100],
+})
+
+
+def symbol_payloads(days):
+    """پاسخ‌های خام حقیقی/حقوقی و قیمت برای (تاریخ، قیمت پایانی، حجم) هر روز"""
+    client = {'clientType': [
+        {'recDate': int(date), 'sell_I_Volume': volume, 'sell_N_Volume': 0, 'buy_I_Volume': volume}
+        for date, _, volume in days
+    ]}
+    price = {'closingPriceChartData': [
+        {'dEven': 0, 'pDrCotVal': close, 'priceFirst': close, 'priceMin': close, 'priceMax': close,
+         'qTotTran5J': volume}
+        for _, close, volume in reversed(days)
+    ]}
+    return {
+        'client': ('network', json.dumps(client).encode('utf-8')),
+        'price': ('network', json.dumps(price).encode('utf-8')),
+    }
+
+
+def test_assembler_builds_symbol_without_cache_or_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assembler = SymbolAssembler(CurrencySnapshot(DOLLAR, GOLD))
+    days = [('20240101', 1000, 100), ('20240105', 2000, 200), ('20240120', 3050, 300)]
+
+    success, df = assembler.assemble_payloads("فولاد", "42", symbol_payloads(days), apply_adjustment=False)
+
+    assert success
+    assert df['dollar'].tolist() == [500000, 550000, 610000]
+    assert df['ounces_gold'].tolist() == [2000, 2021, 2100]  # درونیابی بین 20240101 و 20240120
+    assert df['thousand_dollar'].tolist() == [500000, 275000, 200000]
+    assert df['one_ounce'].tolist() == [1000000, 555775, 420000]
+    assert {'json_decode', 'alignment', 'currency_columns', 'records'} <= set(assembler.stage_totals)
+    # بدون پوشه کش و فایل آمار
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_assemble_in_worker_returns_columns_and_timings(monkeypatch):
+    monkeypatch.setattr(downloader_module, '_cpu_worker', SymbolAssembler(CurrencySnapshot(DOLLAR, GOLD)))
+    days = [('20240101', 1000, 100), ('20240105', 2000, 200)]
+
+    success, result, timings = downloader_module.assemble_in_worker("فولاد", "42", symbol_payloads(days), False)
+
+    assert success
+    dollar = result['arrays'][result['columns'].index('dollar')]
+    assert dollar.tolist() == [500000, 550000]
+    assert timings['currency_columns'] >= 0
+
+
+def test_downloader_assembles_with_live_currency_data(downloader):
+    downloader.currency = SimpleNamespace(dollar_data=None, gold_data=None)
+    days = [('20240101', 1000, 100)]
+
+    success, df = downloader.assemble_payloads("فولاد", "42", symbol_payloads(days), apply_adjustment=False)
+    assert success and df['dollar'].tolist() == [0]
+
+    # داده ارز بعد از ساخت Downloader می‌رسد و جستجوی بعدی آن را می‌بیند
+    downloader.currency.dollar_data = DOLLAR
+    success, df = downloader.assemble_payloads("فولاد", "42", symbol_payloads(days), apply_adjustment=False)
+    assert df['dollar'].tolist() == [500000]
+    assert 'currency_columns' in downloader.stage_totals
+
+
+def test_currency_columns_match_per_row_lookup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    loader = DataLoader(SimpleNamespace(settings={
+        "data_url": "http://tsetmc.test/MarketWatchPlus?h=0&r=0",
+        "snapshot_file": str(tmp_path / "market_watch.pkl.gz"),
+        "default_markets": [],
+    }))
+    loader.dollar_data = DOLLAR.copy()
+    loader.gold_data = GOLD.copy()
+    # قبل از اولین تاریخ، دقیق، بین دو تاریخ، بعد از آخرین تاریخ و تاریخ نامعتبر
+    rec_dates = ['20231225', '20240101', 20240103, '20240107', '20240115', '20240120', '20240201', '']
+    pl_prices = [1000.0, 3.0, 0.0, 777.0, 1234.5, 9999.0, 10.0, 1000.0]
+
+    def expected_row(rec_date, pl_price):
+        dollar_price = loader.get_dollar_price(rec_date)
+        gold_price = loader.get_gold_price(rec_date)
+        thousand_dollar = int((dollar_price * 1000) // pl_price) if dollar_price > 0 and pl_price > 0 else 0
+        one_ounce = (int((gold_price * dollar_price) // pl_price)
+                     if dollar_price > 0 and gold_price > 0 and pl_price > 0 else 0)
+        return {'dollar': dollar_price, 'ounces_gold': gold_price,
+                'thousand_dollar': thousand_dollar, 'one_ounce': one_ounce}
+
+    columns = SymbolAssembler(loader)._calculate_new_columns(rec_dates, pl_prices)
+
+    rows = [{name: values[i] for name, values in columns.items()} for i in range(len(rec_dates))]
+    assert rows == [expected_row(rec_date, pl) for rec_date, pl in zip(rec_dates, pl_prices)]
+    assert rows[-1] == {'dollar': 0, 'ounces_gold': 0, 'thousand_dollar': 0, 'one_ounce': 0}
+
+
+def test_currency_columns_without_currency_data_are_zero():
+    columns = SymbolAssembler(CurrencySnapshot())._calculate_new_columns(['20240101', '20240102'], [1000.0, 0.0])
+
+    assert columns == {name: [0, 0] for name in ('dollar', 'ounces_gold', 'thousand_dollar', 'one_ounce')}
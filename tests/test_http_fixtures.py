@@ -0,0 +1,131 @@
+# test_http_fixtures.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+requests = pytest.importorskip("requests")
+from requests.adapters import HTTPAdapter
+
+import http_fixtures
+from http_fixtures import FixtureArchive, RecordingAdapter, ReplayAdapter, create_http_adapter, mount_fixture_adapter
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """هر درخواست بدنه‌ای با شماره درخواست برمی‌گرداند"""
+
+    count = 0
+
+    def do_GET(self):
+        type(self).count += 1
+        body = f'{{"path":"{self.path}","n":{self.count}}}'.encode('utf-8')
+        status = 404 if self.path == "/missing" else 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('ETag', f'"v{self.count}"')
+        self.send_header('X-Private', 'secret')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    CountingHandler.count = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def session_with(adapter):
+    session = requests.Session()
+    session.mount('http://', adapter)
+    return session
+
+
+def record(server, path):
+    archive = FixtureArchive(path)
+    session = session_with(RecordingAdapter(archive))
+    responses = [session.get(f"{server}/data"), session.get(f"{server}/data"), session.get(f"{server}/missing")]
+    archive.save()
+    return responses
+
+
+def test_replay_returns_recorded_responses_in_order(server, tmp_path):
+    path = str(tmp_path / "http.jsonl.gz")
+    recorded = record(server, path)
+
+    session = session_with(ReplayAdapter(FixtureArchive(path).load(), latency_scale=0))
+    replayed = [session.get(f"{server}/data") for _ in range(3)] + [session.get(f"{server}/missing")]
+
+    assert [r.json()['n'] for r in replayed[:3]] == [1, 2, 2]  # آخرین پاسخ تکرار می‌شود
+    assert replayed[0].content == recorded[0].content
+    assert replayed[3].status_code == 404
+    assert replayed[0].headers['ETag'] == '"v1"'
+    assert 'X-Private' not in replayed[0].headers
+    assert replayed[0].encoding == 'utf-8'
+    # پخش بدون شبکه: سرور فقط درخواست‌های ضبط را دیده است
+    assert CountingHandler.count == 3
+
+
+def test_replay_unknown_request_raises_connection_error(tmp_path):
+    session = session_with(ReplayAdapter(FixtureArchive(str(tmp_path / "empty.jsonl.gz")).load(), latency_scale=0))
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get("http://tsetmc.test/unknown")
+
+
+def test_replay_sleeps_for_recorded_latency(server, tmp_path, monkeypatch):
+    path = str(tmp_path / "http.jsonl.gz")
+    record(server, path)
+    archive = FixtureArchive(path).load()
+    for entries in archive.entries.values():
+        for entry in entries:
+            entry['elapsed'] = 0.25
+    sleeps = []
+    monkeypatch.setattr(http_fixtures.time, 'sleep', sleeps.append)
+
+    session_with(ReplayAdapter(archive, latency_scale=2.0)).get(f"{server}/data")
+
+    assert sleeps == [0.5]
+
+
+def test_save_without_new_responses_does_not_write(tmp_path):
+    path = tmp_path / "http.jsonl.gz"
+    FixtureArchive(str(path)).save()
+    assert not path.exists()
+
+
+@pytest.mark.parametrize("mode, adapter_type", [
+    ("off", HTTPAdapter),
+    ("record", RecordingAdapter),
+    ("replay", ReplayAdapter),
+])
+def test_adapter_follows_settings(tmp_path, mode, adapter_type):
+    config = SimpleNamespace(settings={
+        "http_fixtures_mode": mode,
+        "http_fixtures_file": str(tmp_path / f"{mode}.jsonl.gz"),
+        "http_fixtures_latency": "zero",
+    })
+
+    adapter = create_http_adapter(config)
+
+    assert type(adapter) is adapter_type
+    if mode == "replay":
+        assert adapter.latency_scale == 0
+
+
+def test_mount_is_noop_when_off():
+    session = requests.Session()
+    adapters = dict(session.adapters)
+
+    mount_fixture_adapter(session, SimpleNamespace(settings={"http_fixtures_mode": "off"}))
+
+    assert dict(session.adapters) == adapters
@@ -0,0 +1,84 @@
+# test_market_calendar.py
+import time as _time
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+
+from market_calendar import TEHRAN_FIXED_OFFSET, MarketCalendar
+
+TEHRAN = TEHRAN_FIXED_OFFSET
+
+
+def tehran(year, month, day, hour=0, minute=0):
+    return datetime(year, month, day, hour, minute, tzinfo=TEHRAN)
+
+
+@pytest.fixture
+def calendar():
+    # پایان جلسه 12:30 و نهایی شدن داده 13:00
+    return MarketCalendar(close_time=time(12, 30), settle_minutes=30, tz=TEHRAN)
+
+
+def test_before_close_expires_same_day(calendar):
+    # 2024-01-06 شنبه است
+    assert calendar.next_close_after(tehran(2024, 1, 6, 10)) == tehran(2024, 1, 6, 13)
+
+
+def test_wednesday_after_close_expires_saturday(calendar):
+    # 2024-01-03 چهارشنبه؛ پنجشنبه و جمعه تعطیل‌اند
+    assert calendar.next_close_after(tehran(2024, 1, 3, 14)) == tehran(2024, 1, 6, 13)
+
+
+def test_close_moment_itself_moves_to_next_session(calendar):
+    assert calendar.next_close_after(tehran(2024, 1, 6, 13)) == tehran(2024, 1, 7, 13)
+
+
+def test_holidays_are_skipped():
+    calendar = MarketCalendar(holidays=["2024-01-06", "2024-01-07"], tz=TEHRAN)
+    assert not calendar.is_trading_day(tehran(2024, 1, 6).date())
+    assert calendar.next_close_after(tehran(2024, 1, 3, 14)) == tehran(2024, 1, 8, 13)
+
+
+def test_weekend_is_not_trading_day(calendar):
+    assert not calendar.is_trading_day(tehran(2024, 1, 4).date())  # پنجشنبه
+    assert not calendar.is_trading_day(tehran(2024, 1, 5).date())  # جمعه
+    assert calendar.is_trading_day(tehran(2024, 1, 3).date())
+
+
+def test_aware_moment_in_other_zone_is_converted(calendar):
+    # 09:15 UTC همان 12:45 تهران است: پس از پایان جلسه و پیش از نهایی شدن
+    moment = datetime(2024, 1, 6, 9, 15, tzinfo=timezone.utc)
+    assert calendar.next_close_after(moment) == tehran(2024, 1, 6, 13)
+
+
+def test_naive_moment_is_system_local_time(calendar, monkeypatch):
+    if not hasattr(_time, 'tzset'):
+        pytest.skip("تغییر منطقه زمانی سیستم فقط در یونیکس")
+    monkeypatch.setenv('TZ', 'UTC')
+    _time.tzset()
+    try:
+        # 09:40 محلی (UTC) همان 13:10 تهران است؛ جلسه همان روز تمام شده
+        assert calendar.next_close_after(datetime(2024, 1, 6, 9, 40)) == tehran(2024, 1, 7, 13)
+        assert calendar.next_close_after(datetime(2024, 1, 6, 9, 20)) == tehran(2024, 1, 6, 13)
+    finally:
+        monkeypatch.delenv('TZ')
+        _time.tzset()
+
+
+def test_is_fresh_until_next_close(calendar):
+    fetched = tehran(2024, 1, 3, 14)
+    assert calendar.is_fresh(fetched, now=tehran(2024, 1, 5, 20))
+    assert calendar.is_fresh(fetched, now=tehran(2024, 1, 6, 12, 59))
+    assert not calendar.is_fresh(fetched, now=tehran(2024, 1, 6, 13))
+
+
+def test_from_settings():
+    calendar = MarketCalendar.from_settings({
+        "market_close_time": "15:00",
+        "market_settle_minutes": 0,
+        "market_holidays": ["2024-01-06"],
+        "market_timezone": "Asia/Tehran",
+    })
+    close = calendar.next_close_after(datetime(2024, 1, 3, 16, tzinfo=calendar.tz))
+    assert close.replace(tzinfo=None) == datetime(2024, 1, 7, 15)
+    assert close.utcoffset() == timedelta(hours=3, minutes=30)
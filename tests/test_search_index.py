@@ -0,0 +1,57 @@
+# test_search_index.py
+import pytest
+
+from search_index import MATCH_CONTAINS, MATCH_EXACT, MATCH_PREFIX, MATCH_SUFFIX, SymbolSearchIndex
+
+SYMBOLS = ["فولاد", "فملی", "خودرو", "فولاژ", "شپنا"]
+COMPANIES = ["فولاد مبارکه", "ملی مس", "ایران خودرو", "فولاد اژند", "پالایش نفت اصفهان"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SymbolSearchIndex(SYMBOLS, COMPANIES)
+
+
+def brute_force(term, search_type, texts):
+    checks = {
+        MATCH_CONTAINS: lambda text: term in text,
+        MATCH_PREFIX: lambda text: text.startswith(term),
+        MATCH_SUFFIX: lambda text: text.endswith(term),
+        MATCH_EXACT: lambda text: text == term,
+    }
+    return [i for i, text in enumerate(texts) if checks[search_type](text)]
+
+
+def test_empty_term_returns_all_rows(index):
+    assert index.search("") == list(range(len(SYMBOLS)))
+
+
+@pytest.mark.parametrize("search_type", [MATCH_CONTAINS, MATCH_PREFIX, MATCH_SUFFIX, MATCH_EXACT])
+@pytest.mark.parametrize("term", ["ف", "فو", "فولا", "فولاد", "لاد", "ملی", "رو", "مس", "نیست"])
+def test_symbol_search_matches_brute_force(index, search_type, term):
+    assert index.search(term, search_type, "نماد") == brute_force(term, search_type, SYMBOLS)
+
+
+@pytest.mark.parametrize("term", ["فولاد", "ایران خ", "اصفهان", "مس"])
+def test_company_search_matches_brute_force(index, term):
+    assert index.search(term, MATCH_CONTAINS, "نام شرکت") == brute_force(term, MATCH_CONTAINS, COMPANIES)
+
+
+def test_both_fields_search_symbol_and_company(index):
+    # "مس" فقط در نام شرکت فملی است و "شپنا" فقط در نماد
+    assert index.search("مس", MATCH_CONTAINS, "هر دو") == [1]
+    assert index.search("شپنا", MATCH_PREFIX, "هر دو") == [4]
+
+
+def test_results_keep_original_order(index):
+    result = index.search("و", MATCH_CONTAINS, "نماد")
+    assert result == sorted(result)
+
+
+@pytest.mark.parametrize("search_type, search_in", [("شامل ", "نماد"), ("regex", "نماد"), (MATCH_PREFIX, "همه")])
+def test_unknown_type_or_field_raises(index, search_type, search_in):
+    with pytest.raises(ValueError):
+        index.search("ف", search_type, search_in)
+    # عبارت خالی هم مقدار نادرست را پنهان نمی‌کند
+    with pytest.raises(ValueError):
+        index.search("", search_type, search_in)
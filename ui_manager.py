@@ -6,34 +6,60 @@ import os
 import webbrowser
 from datetime import datetime
 import threading
-import pandas as pd
+import time
+import logging
+import queue
+from collections import deque
 import sys
 import traceback
+from config import CHECKSUM_SUFFIX, lazy_import, latest_log_file, read_log_tail
+from search_index import SymbolSearchIndex
+
+# pandas فقط هنگام دانلود لازم است
+pd = lazy_import('pandas')
 
 class UIManager:
+    # نشانه‌های وضعیت انتخاب در ستون چک‌باکس لیست نمادها
+    CHECKED = "☑"
+    UNCHECKED = "☐"
+    
+    # کانال رویدادهای رشته‌ها به UI: فاصله تخلیه (حدود 20 فریم در ثانیه) و حداکثر رویداد در هر نوبت
+    UI_PUMP_INTERVAL_MS = 50
+    UI_PUMP_BATCH = 500
+    
+    # سقف خطوط نمایش لاگ (بافر حلقوی) و تعداد خطوط هر صفحه از فایل لاگ
+    LOG_VIEW_MAX_LINES = 5000
+    LOG_PAGE_LINES = 1000
+    
     def __init__(self, root, config, data_loader):
         self.root = root
         self.config = config
         self.data_loader = data_loader
         
-        # دانلودر - اصلاح import
-        try:
-            from downloader import Downloader
-            self.downloader = Downloader(config, data_loader)
-        except ImportError as e:
-            self.log_error(f"خطا در بارگذاری دانلودر: {e}")
-            messagebox.showerror("خطای بارگذاری", "ماژول دانلودر یافت نشد.")
-            raise
+        # دانلودر با اولین استفاده (صفحه 5) ساخته می‌شود
+        self._downloader = None
+        
+        # رشته‌های پس‌زمینه فقط در این صف می‌نویسند؛ ویجت‌ها فقط در _pump_ui_events تغییر می‌کنند
+        self.ui_events = queue.SimpleQueue()
+        
+        # آخرین خطوط لاگ دانلود (قدیمی‌ترها خودکار حذف می‌شوند)
+        self.download_log_lines = deque(maxlen=self.LOG_VIEW_MAX_LINES)
         
         # وضعیت برنامه
         self.current_page = 0
         self.is_downloading = False
         self.download_thread = None
+        self.download_pipeline = None  # خط لوله در حال اجرا (stop_download مستقیم متوقفش می‌کند)
         
         # متغیرهای UI
         self.market_vars = {}
         self.industry_vars = {}
-        self.symbol_vars = {}
+        self.symbol_selection = set()  # شناسه ردیف‌های انتخاب شده در لیست نمادها
+        self.visible_symbol_ids = []
+        self.all_symbols = []
+        self.symbol_inscodes = []  # کد داخلی هر ردیف لیست نمادها (برای به‌روزرسانی مظنه‌ها)
+        self.symbol_index = None
+        self._search_after_id = None  # جستجوی زمان‌بندی شده (debounce)
         self.column_vars = {}
                 # متغیر برای چک‌باکس تعدیل
         self.adjustment_var = None
@@ -44,6 +70,89 @@ class UIManager:
         
         # نمایش صفحه بارگذاری
         self.show_loading_page()
+        
+        # شروع تخلیه دوره‌ای صف رویدادهای UI
+        self.root.after(self.UI_PUMP_INTERVAL_MS, self._pump_ui_events)
+    
+    def post_ui(self, callback, *args):
+        """اجرای تابع در رشته اصلی (قابل فراخوانی از هر رشته)"""
+        self.ui_events.put(('call', callback, args))
+    
+    def post_log(self, widget, message):
+        """افزودن یک خط به ویجت متنی از هر رشته"""
+        self.ui_events.put(('log', widget, message))
+    
+    def post_progress(self, progress, symbol, current, total):
+        """ارسال وضعیت پیشرفت دانلود؛ فقط آخرین وضعیت هر نوبت نمایش داده می‌شود"""
+        self.ui_events.put(('progress', None, (progress, symbol, current, total)))
+    
+    def _pump_ui_events(self):
+        """تخلیه دسته‌ای صف رویدادها: یک درج برای هر ویجت و یک به‌روزرسانی پیشرفت در هر نوبت"""
+        # نوبت بعد از ابتدا زمان‌بندی می‌شود تا پنجره‌های modal داخل callbackها صف را متوقف نکنند
+        self.root.after(self.UI_PUMP_INTERVAL_MS, self._pump_ui_events)
+        
+        pending_logs = {}
+        pending_progress = None
+        
+        def flush():
+            nonlocal pending_progress
+            for widget, lines in pending_logs.items():
+                try:
+                    widget.insert(tk.END, "\n".join(lines) + "\n")
+                    self.trim_text_widget(widget)
+                    widget.see(tk.END)
+                except tk.TclError:
+                    pass  # ویجت (مثلاً پنجره بسته شده) دیگر وجود ندارد
+            pending_logs.clear()
+            
+            if pending_progress is not None:
+                self.update_progress(*pending_progress)
+                pending_progress = None
+        
+        for _ in range(self.UI_PUMP_BATCH):
+            try:
+                kind, target, payload = self.ui_events.get_nowait()
+            except queue.Empty:
+                break
+            
+            if kind == 'log':
+                pending_logs.setdefault(target, []).append(payload)
+            elif kind == 'progress':
+                pending_progress = payload
+            else:
+                # ترتیب نسبت به خطوط لاگ قبلی حفظ می‌شود
+                flush()
+                try:
+                    target(*payload)
+                except Exception as e:
+                    self.log_error(f"خطا در رویداد UI: {e}")
+        
+        flush()
+    
+    def trim_text_widget(self, widget, max_lines=None, from_end=False):
+        """محدود کردن تعداد خطوط ویجت متنی (حذف قدیمی‌ترین یا انتهایی‌ترین خطوط)"""
+        max_lines = max_lines or self.LOG_VIEW_MAX_LINES
+        line_count = int(widget.index('end-1c').split('.')[0])
+        excess = line_count - max_lines
+        if excess <= 0:
+            return
+        if from_end:
+            widget.delete(f"{max_lines + 1}.0", tk.END)
+        else:
+            widget.delete('1.0', f"{excess + 1}.0")
+    
+    @property
+    def downloader(self):
+        """دانلودر - import تنبل تا ماژول‌های سنگین (tqdm، concurrent.futures) زمان راه‌اندازی را نگیرند"""
+        if self._downloader is None:
+            try:
+                from downloader import Downloader
+                self._downloader = Downloader(self.config, self.data_loader)
+            except ImportError as e:
+                self.log_error(f"خطا در بارگذاری دانلودر: {e}")
+                messagebox.showerror("خطای بارگذاری", "ماژول دانلودر یافت نشد.")
+                raise
+        return self._downloader
     
     def setup_ui(self):
         """راه‌اندازی رابط کاربری"""
@@ -108,6 +217,10 @@ class UIManager:
         file_menu.add_command(label="بارگذاری مجدد داده", 
                             command=self.reload_data,
                             accelerator="Ctrl+R")
+        self.watch_var = tk.BooleanVar(value=False)
+        file_menu.add_checkbutton(label="پایش زنده بازار", 
+                                variable=self.watch_var,
+                                command=self.toggle_watch)
         file_menu.add_separator()
         file_menu.add_command(label="خروج", 
                             command=self.root.quit,
@@ -132,6 +245,8 @@ class UIManager:
         tools_menu.add_command(label="بررسی APIها", 
                              command=self.check_apis)
         tools_menu.add_separator()
+        tools_menu.add_command(label="آمار کش", 
+                             command=self.show_cache_stats)
         tools_menu.add_command(label="پاک کردن حافظه کش", 
                              command=self.clear_cache)
         
@@ -147,8 +262,10 @@ class UIManager:
         log_menu.add_command(label="پاک کردن لاگ", 
                            command=self.clear_log)
         log_menu.add_separator()
-        log_menu.add_command(label="لاگ سطح بالا", 
-                           command=self.enable_debug_log)
+        self.debug_log_var = tk.BooleanVar(value=logging.getLogger().getEffectiveLevel() <= logging.DEBUG)
+        log_menu.add_checkbutton(label="لاگ سطح بالا", 
+                               variable=self.debug_log_var,
+                               command=self.toggle_debug_log)
         
         # منوی راهنما
         help_menu = Menu(menubar, tearoff=0)
@@ -315,7 +432,7 @@ class UIManager:
         block_check = ttk.Checkbutton(options_frame, 
                                     text="حذف معاملات بلوکی از نتایج",
                                     variable=self.remove_block_var,
-                                    command=self.save_settings)
+                                    command=self.on_block_trades_changed)
         block_check.pack(anchor=tk.W)
         
         # دکمه‌های عملیاتی
@@ -473,7 +590,7 @@ class UIManager:
         self.search_var = tk.StringVar()
         self.search_entry = ttk.Entry(search_row1, textvariable=self.search_var, width=30)
         self.search_entry.pack(side=tk.LEFT, padx=(0, 10))
-        self.search_entry.bind("<KeyRelease>", lambda e: self.filter_symbols())
+        self.search_entry.bind("<KeyRelease>", lambda e: self.schedule_symbol_search())
         
         # دکمه‌های جستجو
         search_row2 = ttk.Frame(search_frame)
@@ -515,26 +632,41 @@ class UIManager:
         list_frame = ttk.LabelFrame(main_container, text="لیست نمادها", padding=5)
         list_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
-        # ایجاد اسکرول‌بار برای لیست چک‌باکس‌ها
-        canvas_container = ttk.Frame(list_frame)
-        canvas_container.pack(fill=tk.BOTH, expand=True)
-        
-        canvas = tk.Canvas(canvas_container, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(canvas_container, orient="vertical", command=canvas.yview)
-        
-        self.symbol_checkbox_frame = ttk.Frame(canvas)
-        
-        self.symbol_checkbox_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        # لیست مجازی: Treeview فقط ردیف‌های قابل مشاهده را رسم می‌کند
+        tree_container = ttk.Frame(list_frame)
+        tree_container.pack(fill=tk.BOTH, expand=True)
+        
+        columns = ("check", "row", "symbol", "company", "market", "industry", "bid", "ask")
+        self.symbol_tree = ttk.Treeview(tree_container, 
+                                        columns=columns,
+                                        show="headings",
+                                        selectmode="extended")
+        
+        headings = {
+            "check": ("", 40, tk.CENTER),
+            "row": ("ردیف", 60, tk.CENTER),
+            "symbol": ("نماد", 120, tk.W),
+            "company": ("نام شرکت", 320, tk.W),
+            "market": ("بازار", 70, tk.CENTER),
+            "industry": ("صنعت", 260, tk.W),
+            "bid": ("بهترین خرید", 90, tk.CENTER),
+            "ask": ("بهترین فروش", 90, tk.CENTER)
+        }
+        for col, (text, width, anchor) in headings.items():
+            self.symbol_tree.heading(col, text=text)
+            self.symbol_tree.column(col, width=width, anchor=anchor, stretch=(col in ("company", "industry")))
         
-        canvas.create_window((0, 0), window=self.symbol_checkbox_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(tree_container, orient="vertical", command=self.symbol_tree.yview)
+        self.symbol_tree.configure(yscrollcommand=scrollbar.set)
         
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.symbol_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # تغییر وضعیت انتخاب با کلیک روی ستون چک‌باکس، دوبار کلیک یا کلید فاصله
+        self.symbol_tree.bind("<Button-1>", self.on_symbol_tree_click)
+        self.symbol_tree.bind("<Double-1>", lambda e: self.toggle_symbols(self.symbol_tree.selection()))
+        self.symbol_tree.bind("<space>", lambda e: self.toggle_symbols(self.symbol_tree.selection()))
+        
         # اطلاعات آماری
         info_frame = ttk.LabelFrame(main_container, text="آمار", padding=10)
         info_frame.pack(fill=tk.X)
@@ -854,6 +986,7 @@ class UIManager:
             elif page_num == 4:
                 self.load_columns()
             elif page_num == 5:
+                self.downloader  # بارگذاری ماژول دانلودر هنگام ورود به صفحه 5
                 self.output_dir_var.set(self.config.settings.get("output_dir", "."))
                 self.update_download_info()
         
@@ -915,45 +1048,16 @@ class UIManager:
         self.show_page(0)
     
     def on_data_loaded(self, success, message):
-        """وقتی داده بارگذاری شد"""
+        """وقتی داده MarketWatch بارگذاری شد (دلار و طلا ممکن است هنوز در راه باشند)"""
         self.progress_bar.stop()
         
         if success:
             self.loading_label.config(text="داده‌ها با موفقیت بارگذاری شد!")
-            
-            # وضعیت داده‌های خارجی
-            external_status = []
-            
-            # بررسی داده دلار
-            if self.data_loader.dollar_data is not None:
-                dollar_count = len(self.data_loader.dollar_data)
-                if dollar_count > 0:
-                    last_date = self.data_loader.dollar_data['recDate'].iloc[-1]
-                    external_status.append(f"دلار: {dollar_count} روز (تا {last_date})")
-                else:
-                    external_status.append("دلار: ۰ روز")
-            else:
-                external_status.append("دلار: ❌")
-            
-            # بررسی داده طلا
-            if self.data_loader.gold_data is not None:
-                gold_count = len(self.data_loader.gold_data)
-                if gold_count > 0:
-                    last_date = self.data_loader.gold_data['recDate'].iloc[-1]
-                    external_status.append(f"طلا: {gold_count} روز (تا {last_date})")
-                else:
-                    external_status.append("طلا: ۰ روز")
-            else:
-                external_status.append("طلا: ❌")
-            
-            # نمایش وضعیت
-            external_msg = " | ".join(external_status)
-            self.external_status_label.config(text=external_msg, foreground=self.colors['success'])
             self.status_label.config(text=f"{message}", foreground=self.colors['success'])
             self.progress_percent.config(text="100%")
             
-            # تاخیر قبل از رفتن به صفحه بعد
-            self.root.after(1500, lambda: self.show_page(1))
+            # رفتن فوری به صفحه بعد؛ وضعیت دلار و طلا بعداً به‌روز می‌شود
+            self.show_page(1)
         else:
             self.loading_label.config(text="خطا در بارگذاری داده‌ها!")
             self.status_label.config(text=f"خطا: {message}", foreground=self.colors['danger'])
@@ -963,6 +1067,59 @@ class UIManager:
             messagebox.showerror("خطا در بارگذاری", message)
             self.root.after(2000, lambda: self.show_page(1))
     
+    def on_data_refreshed(self, success, message):
+        """وقتی داده تازه MarketWatch پس از warm start از snapshot رسید"""
+        if not success:
+            self.status_label.config(text=f"به‌روزرسانی ناموفق، داده ذخیره شده نمایش داده می‌شود: {message}",
+                                     foreground=self.colors['warning'])
+            return
+        
+        self.status_label.config(text=f"{message}", foreground=self.colors['success'])
+        
+        # تطبیق تعداد نمادها در صفحه جاری بدون از دست رفتن انتخاب‌های کاربر
+        if self.current_page == 1:
+            selected = {code for code, var in self.market_vars.items() if var.get()}
+            self.load_markets()
+            for code, var in self.market_vars.items():
+                var.set(code in selected)
+            self.update_market_stats()
+        elif self.current_page == 2:
+            selected = {code for code, var in self.industry_vars.items() if var.get()}
+            self.load_industries()
+            for item in self.industry_items:
+                item['var'].set(item['code'] in selected)
+            self.update_industry_stats()
+    
+    def on_external_data_loaded(self):
+        """وقتی دریافت دلار و طلا (همزمان با MarketWatch) تمام شد"""
+        # وضعیت داده‌های خارجی
+        external_status = []
+        # بررسی داده دلار
+        if self.data_loader.dollar_data is not None:
+            dollar_count = len(self.data_loader.dollar_data)
+            if dollar_count > 0:
+                last_date = self.data_loader.dollar_data['recDate'].iloc[-1]
+                external_status.append(f"دلار: {dollar_count} روز (تا {last_date})")
+            else:
+                external_status.append("دلار: ۰ روز")
+        else:
+            external_status.append("دلار: ❌")
+        
+        # بررسی داده طلا
+        if self.data_loader.gold_data is not None:
+            gold_count = len(self.data_loader.gold_data)
+            if gold_count > 0:
+                last_date = self.data_loader.gold_data['recDate'].iloc[-1]
+                external_status.append(f"طلا: {gold_count} روز (تا {last_date})")
+            else:
+                external_status.append("طلا: ۰ روز")
+        else:
+            external_status.append("طلا: ❌")
+        
+        # نمایش وضعیت
+        external_msg = " | ".join(external_status)
+        self.external_status_label.config(text=external_msg, foreground=self.colors['success'])
+    
     def load_markets(self):
         """بارگذاری کدهای بازار"""
         for widget in self.market_frame.winfo_children():
@@ -1001,7 +1158,8 @@ class UIManager:
                 cb = ttk.Checkbutton(self.market_frame, 
                                     text=text, 
                                     variable=var,
-                                    style="Bold.TCheckbutton")
+                                    style="Bold.TCheckbutton",
+                                    command=self.update_market_stats)
                 cb.pack(anchor=tk.W, padx=20, pady=2)
         
         # نمایش سایر بازارها
@@ -1017,7 +1175,8 @@ class UIManager:
                 text = f"{market['code']} - {market['label']} ({market['count']} نماد)"
                 cb = ttk.Checkbutton(self.market_frame, 
                                     text=text, 
-                                    variable=var)
+                                    variable=var,
+                                    command=self.update_market_stats)
                 cb.pack(anchor=tk.W, padx=20, pady=2)
         
         # به‌روزرسانی آمار
@@ -1026,8 +1185,15 @@ class UIManager:
     def update_market_stats(self):
         """به‌روزرسانی آمار بازارها"""
         total = len(self.market_vars)
-        selected = sum(1 for var in self.market_vars.values() if var.get())
-        self.page1_info.config(text=f"تعداد بازارها: {total} | انتخاب شده: {selected}")
+        selected = [code for code, var in self.market_vars.items() if var.get()]
+        remaining = self.data_loader.count_symbols(selected, None, self.remove_block_var.get())
+        self.page1_info.config(
+            text=f"تعداد بازارها: {total} | انتخاب شده: {len(selected)} | نمادهای باقی‌مانده: {remaining}")
+    
+    def on_block_trades_changed(self):
+        """ذخیره گزینه معاملات بلوکی و به‌روزرسانی تعداد نمادها"""
+        self.save_settings()
+        self.update_market_stats()
     
     def select_all_markets(self):
         """انتخاب همه بازارها"""
@@ -1103,7 +1269,8 @@ class UIManager:
             text = f"{item['code']} - {item['name']} ({item['count']} نماد)"
             cb = ttk.Checkbutton(self.industry_frame, 
                                 text=text, 
-                                variable=item['var'])
+                                variable=item['var'],
+                                command=self.update_industry_stats)
             cb.pack(anchor=tk.W, padx=10, pady=2)
             item['widget'] = cb
             displayed += 1
@@ -1126,8 +1293,11 @@ class UIManager:
     def update_industry_stats(self):
         """به‌روزرسانی آمار صنایع"""
         total = len(self.industry_items)
-        selected = sum(1 for item in self.industry_items if item['var'].get())
-        self.page2_info.config(text=f"تعداد صنایع: {total} | انتخاب شده: {selected}")
+        selected = [item['code'] for item in self.industry_items if item['var'].get()]
+        remaining = self.data_loader.count_symbols(
+            self.data_loader.selected_markets or None, selected, self.data_loader.remove_block_trades)
+        self.page2_info.config(
+            text=f"تعداد صنایع: {total} | انتخاب شده: {len(selected)} | نمادهای باقی‌مانده: {remaining}")
     
     def select_all_industries(self):
         """انتخاب همه صنایع"""
@@ -1149,130 +1319,96 @@ class UIManager:
         self.update_industry_stats()
     
     def load_symbols_list(self):
-        """بارگذاری لیست نمادها با چک‌باکس مربعی"""
-        # پاک کردن فریم قبلی
-        for widget in self.symbol_checkbox_frame.winfo_children():
-            widget.destroy()
+        """بارگذاری لیست نمادها در Treeview (یک بار برای هر ورود به صفحه)"""
+        self.symbol_tree.delete(*self.symbol_tree.get_children())
+        self.symbol_selection = set()
+        self.visible_symbol_ids = []
         
-        self.symbol_vars = {}
-        self.symbol_widgets = []
-        symbols = self.data_loader.get_symbols()
+        columns = self.data_loader.get_symbol_columns()
+        symbols = columns.get('نماد', [])
+        
+        # ذخیره نمادها و ساخت index جستجو (یک بار برای هر بارگذاری)
+        self.all_symbols = symbols
+        self.symbol_index = SymbolSearchIndex(symbols, columns.get('نام_شرکت', []))
         
         if not symbols:
-            ttk.Label(self.symbol_checkbox_frame, 
-                     text="هیچ نمادی یافت نشد!",
-                     foreground=self.colors['danger']).pack(pady=20)
+            self.page3_info.config(text="هیچ نمادی یافت نشد!")
+            self.update_symbol_stats()
             return
         
-        # ذخیره نمادها برای فیلتر و مرتب‌سازی
-        self.all_symbols = symbols
+        # بهترین مظنه‌ها از بخش 3 همان پاسخ MarketWatchPlus (بدون درخواست جداگانه برای هر نماد)
+        self.symbol_inscodes = columns['کد_داخلی']
+        quotes = self.data_loader.get_top_of_book_columns(self.symbol_inscodes)
+        
+        # همه ردیف‌ها یک بار درج می‌شوند؛ جستجو فقط آنها را جدا/وصل می‌کند
+        rows = zip(symbols, columns['نام_شرکت'], columns['کد_بازار'], columns['نام_صنعت'],
+                   quotes['قیمت_خرید'], quotes['قیمت_فروش'])
+        for idx, (symbol, company, market, industry, bid, ask) in enumerate(rows):
+            iid = str(idx)
+            self.symbol_tree.insert('', tk.END, iid=iid,
+                                    values=(self.CHECKED, idx + 1, symbol, company, market, industry, bid, ask))
+        self.symbol_selection = {str(idx) for idx in range(len(symbols))}
         
         # نمایش نمادها
         self.display_symbols()
-        
-        # به‌روزرسانی آمار
-        self.update_symbol_stats()
 
     def display_symbols(self):
-        """نمایش نمادها با چک‌باکس مربعی"""
-        # پاک کردن فریم قبلی
-        for widget in self.symbol_checkbox_frame.winfo_children():
-            widget.destroy()
-        
-        self.symbol_vars = {}
-        self.symbol_widgets = []
-        
-        search_term = self.search_var.get().strip()
+        """نمایش نمادهای منطبق با جستجو (بدون ساخت دوباره ردیف‌ها)"""
+        # نرمال‌سازی ورودی کاربر با همان جدول داده‌ها (ی/ک عربی، ارقام، نیم‌فاصله)
+        search_term = self.data_loader.normalize_text(self.search_var.get())
         search_type = self.search_type_var.get()
         search_in = self.search_in_var.get()
         
-        # فیلتر کردن نمادها
-        filtered_symbols = []
-        for symbol in self.all_symbols:
-            symbol_text = symbol.get('نماد', '')
-            company_text = symbol.get('نام_شرکت', '')
-            
-            # اعمال فیلتر جستجو
-            if search_term:
-                if search_in == "نماد":
-                    search_text = symbol_text
-                elif search_in == "نام شرکت":
-                    search_text = company_text
-                else:  # "هر دو"
-                    search_text = f"{symbol_text} {company_text}"
-                
-                match = False
-                if search_type == "شامل":
-                    match = search_term in search_text
-                elif search_type == "شروع با":
-                    match = search_text.startswith(search_term)
-                elif search_type == "پایان با":
-                    match = search_text.endswith(search_term)
-                elif search_type == "دقیق":
-                    match = search_text == search_term
-                
-                if not match:
-                    continue
-            
-            filtered_symbols.append(symbol)
-        
-        if not filtered_symbols and search_term:
-            ttk.Label(self.symbol_checkbox_frame, 
-                     text="هیچ نمادی با مشخصات جستجو یافت نشد!",
-                     foreground=self.colors['warning']).pack(pady=20)
-            return
+        # جستجو در index از پیش ساخته شده (بدون پیمایش همه نمادها)
+        visible = []
+        if self.symbol_index is not None:
+            visible = [str(idx) for idx in self.symbol_index.search(search_term, search_type, search_in)]
         
-        # نمایش نمادها با چک‌باکس مربعی
-        for idx, symbol in enumerate(filtered_symbols, 1):
-            frame = ttk.Frame(self.symbol_checkbox_frame)
-            frame.pack(fill=tk.X, padx=5, pady=2)
-            
-            # ایجاد چک‌باکس مربعی
-            var = tk.BooleanVar(value=True)
-            self.symbol_vars[symbol['نماد']] = var
-            
-            # تابع callback برای به‌روزرسانی آمار
-            def update_stats(var=var, symbol=symbol['نماد']):
-                self.update_symbol_stats()
-            
-            # ✅ استفاده از چک‌باکس استاندارد Tkinter (مربعی)
-            cb = tk.Checkbutton(frame, 
-                              variable=var,
-                              command=update_stats,
-                              bg='white',
-                              activebackground='white')
-            cb.pack(side=tk.LEFT, padx=(0, 10))
-            
-            # اطلاعات نماد
-            info_text = f"{idx}. {symbol['نماد']} - {symbol['نام_شرکت']}"
-            label = tk.Label(frame, 
-                            text=info_text,
-                            font=("Tahoma", 9),
-                            bg='white',
-                            anchor='w',
-                            justify='left')
-            label.pack(side=tk.LEFT, fill=tk.X, expand=True)
-            
-            # اطلاعات اضافی
-            market_info = ttk.Label(frame, 
-                                  text=f"{symbol.get('کد_بازار', '')} | {symbol.get('نام_صنعت', '')}",
-                                  font=("Tahoma", 8),
-                                  foreground=self.colors['dark'])
-            market_info.pack(side=tk.RIGHT, padx=(10, 0))
-            
-            self.symbol_widgets.append({
-                'frame': frame,
-                'var': var,
-                'symbol': symbol['نماد'],
-                'checkbox': cb,
-                'label': label
-            })
+        # یک فراخوانی Tk: ردیف‌های غیرمنطبق جدا و منطبق‌ها به ترتیب وصل می‌شوند
+        self.visible_symbol_ids = visible
+        self.symbol_tree.set_children('', *visible)
         
         # به‌روزرسانی آمار
         self.update_symbol_stats()
     
+    def on_symbol_tree_click(self, event):
+        """تغییر وضعیت انتخاب با کلیک روی ستون چک‌باکس"""
+        if self.symbol_tree.identify_region(event.x, event.y) != "cell":
+            return
+        if self.symbol_tree.identify_column(event.x) != "#1":
+            return
+        
+        iid = self.symbol_tree.identify_row(event.y)
+        if iid:
+            self.toggle_symbols([iid])
+            return "break"
+    
+    def toggle_symbols(self, iids):
+        """معکوس کردن وضعیت انتخاب ردیف‌های داده شده"""
+        for iid in iids:
+            self.set_symbol_checked(iid, iid not in self.symbol_selection)
+        self.update_symbol_stats()
+    
+    def set_symbol_checked(self, iid, checked):
+        """تنظیم وضعیت انتخاب یک ردیف در مجموعه و نمایش آن"""
+        if checked:
+            self.symbol_selection.add(iid)
+        else:
+            self.symbol_selection.discard(iid)
+        self.symbol_tree.set(iid, "check", self.CHECKED if checked else self.UNCHECKED)
+    
+    def schedule_symbol_search(self):
+        """زمان‌بندی جستجو پس از توقف تایپ (هر کلید جستجوی قبلی را لغو می‌کند)"""
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        delay = self.config.settings.get("search_debounce_ms", 150)
+        self._search_after_id = self.root.after(delay, self.filter_symbols)
+
     def filter_symbols(self):
         """فیلتر کردن نمادها بر اساس جستجو"""
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+            self._search_after_id = None
         self.display_symbols()
 
     def clear_symbol_search(self):
@@ -1286,56 +1422,46 @@ class UIManager:
         self.display_symbols()
 
     def select_all_symbols(self):
-        """انتخاب همه نمادها"""
-        for widget in self.symbol_widgets:
-            widget['var'].set(True)
-            widget['checkbox'].select()  # انتخاب چک‌باکس
+        """انتخاب همه نمادهای قابل مشاهده"""
+        for iid in self.visible_symbol_ids:
+            self.set_symbol_checked(iid, True)
         self.update_symbol_stats()
 
     def deselect_all_symbols(self):
-        """لغو انتخاب همه نمادها"""
-        for widget in self.symbol_widgets:
-            widget['var'].set(False)
-            widget['checkbox'].deselect()  # لغو انتخاب چک‌باکس
+        """لغو انتخاب همه نمادهای قابل مشاهده"""
+        for iid in self.visible_symbol_ids:
+            self.set_symbol_checked(iid, False)
         self.update_symbol_stats()
 
     def invert_symbol_selection(self):
-        """معکوس کردن انتخاب نمادها"""
-        for widget in self.symbol_widgets:
-            current = widget['var'].get()
-            widget['var'].set(not current)
-            if not current:
-                widget['checkbox'].select()
-            else:
-                widget['checkbox'].deselect()
-        self.update_symbol_stats()
+        """معکوس کردن انتخاب نمادهای قابل مشاهده"""
+        self.toggle_symbols(self.visible_symbol_ids)
 
     def select_random_symbols(self):
         """انتخاب تصادفی 10 نماد"""
         import random
-        if self.symbol_widgets:
+        if self.visible_symbol_ids:
             # انتخاب 10 نماد تصادفی یا کمتر اگر کل نمادها کمتر از 10 باشد
-            num_to_select = min(10, len(self.symbol_widgets))
-            selected_indices = random.sample(range(len(self.symbol_widgets)), num_to_select)
-            
-            # ابتدا همه را لغو انتخاب کنیم
-            for widget in self.symbol_widgets:
-                widget['var'].set(False)
-                widget['checkbox'].deselect()
+            num_to_select = min(10, len(self.visible_symbol_ids))
+            selected = set(random.sample(self.visible_symbol_ids, num_to_select))
             
-            # سپس موارد تصادفی را انتخاب کنیم
-            for idx in selected_indices:
-                self.symbol_widgets[idx]['var'].set(True)
-                self.symbol_widgets[idx]['checkbox'].select()
+            for iid in self.visible_symbol_ids:
+                self.set_symbol_checked(iid, iid in selected)
             
             self.update_symbol_stats()
 
+    def get_selected_symbols(self):
+        """نام نمادهای قابل مشاهده و انتخاب شده به ترتیب لیست"""
+        return [self.all_symbols[int(iid)] for iid in self.visible_symbol_ids
+                if iid in self.symbol_selection]
+
     def update_symbol_stats(self):
         """به‌روزرسانی آمار نمادها"""
-        total = len(self.symbol_widgets)
-        selected = sum(1 for widget in self.symbol_widgets if widget['var'].get())
+        total = len(self.visible_symbol_ids)
+        selected = sum(1 for iid in self.visible_symbol_ids if iid in self.symbol_selection)
         
-        self.page3_info.config(text=f"تعداد نمادها: {total}")
+        if self.all_symbols:
+            self.page3_info.config(text=f"تعداد نمادها: {total}")
         self.selected_count_label.config(text=f"انتخاب شده: {selected}")
         
         # تغییر رنگ برچسب تعداد انتخاب شده
@@ -1519,11 +1645,8 @@ class UIManager:
                 return success, message
                 
             elif self.current_page == 3:
-                # دریافت نمادهای انتخاب شده از چک‌باکس‌ها
-                selected = []
-                for widget in self.symbol_widgets:
-                    if widget['var'].get():
-                        selected.append(widget['symbol'])
+                # دریافت نمادهای انتخاب شده (قابل مشاهده و تیک خورده)
+                selected = self.get_selected_symbols()
                 
                 if not selected:
                     return False, "لطفاً حداقل یک نماد انتخاب کنید"
@@ -1621,6 +1744,7 @@ class UIManager:
         self.progress_percent_label.config(text="0%")
         self.current_symbol_label.config(text="")
         self.log_text.delete(1.0, tk.END)
+        self.download_log_lines.clear()
         
         # شروع دانلود در رشته جداگانه
         self.is_downloading = True
@@ -1640,24 +1764,29 @@ class UIManager:
             # ایجاد پوشه خروجی اگر وجود ندارد
             os.makedirs(output_dir, exist_ok=True)
             
+            # زمان‌سنجی مراحل از صفر برای این اجرا
+            self.downloader.reset_stage_timings()
+            
+            # ستون‌های دلار و طلا به داده‌های خارجی نیاز دارند که همزمان با MarketWatch دریافت می‌شوند
+            if not self.data_loader.wait_for_external_data(timeout=0):
+                self.log_download("در انتظار دریافت داده‌های دلار و طلا...")
+                # انتظار تکه‌تکه تا توقف کاربر منتظر پایان آن نماند
+                deadline = time.monotonic() + 60
+                while self.is_downloading and time.monotonic() < deadline:
+                    if self.data_loader.wait_for_external_data(timeout=0.5):
+                        break
+            
             # حذف فایل‌های قدیمی اگر انتخاب شده
             if self.delete_old_var.get():
                 self.log_download("در حال حذف فایل‌های قدیمی...")
                 for file in os.listdir(output_dir):
-                    if file.endswith('.csv'):
+                    if file.endswith('.csv') or file.endswith(f'.csv{CHECKSUM_SUFFIX}'):
                         os.remove(os.path.join(output_dir, file))
                 self.log_download("فایل‌های قدیمی حذف شدند.")
             
-            for i, symbol in enumerate(selected_symbols, 1):
-                if not self.is_downloading:
-                    self.log_download("دانلود توسط کاربر متوقف شد.")
-                    break
-                
-                # به‌روزرسانی وضعیت جاری
-                progress = (i / total_symbols) * 100
-                self.root.after(0, self.update_progress, progress, symbol, i, total_symbols)
-                
-                # دریافت اطلاعات نماد
+            # کد داخلی همه نمادها پیش از شروع خط لوله
+            symbols_data = []
+            for symbol in selected_symbols:
                 symbol_info = self.data_loader.get_symbol_info(symbol)
                 
                 if symbol_info is None or (isinstance(symbol_info, pd.Series) and symbol_info.empty):
@@ -1677,52 +1806,60 @@ class UIManager:
                     failed_downloads.append(symbol)
                     continue
                 
-                # دانلود داده نماد
-                # دانلود داده نماد با در نظر گرفتن وضعیت تعدیل
-                apply_adjustment = self.adjustment_var.get()
-                self.log_download(f"در حال دانلود داده برای نماد {symbol} (تعدیل: {'فعال' if apply_adjustment else 'غیرفعال'})...")
-                success, data = self.downloader.download_symbol_data(symbol, internal_code, apply_adjustment)
+                symbols_data.append((symbol, internal_code))
+            
+            # دانلود داده نماد با در نظر گرفتن وضعیت تعدیل
+            apply_adjustment = self.adjustment_var.get()
+            add_timestamp = self.add_timestamp_var.get()
+            self.log_download(f"در حال دانلود داده {len(symbols_data)} نماد (تعدیل: {'فعال' if apply_adjustment else 'غیرفعال'})...")
+            
+            def write_csv(symbol, data):
+                """مرحله نوشتن خط لوله: ذخیره CSV یک نماد"""
+                filename = f"{symbol}.csv"
+                if add_timestamp:
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    filename = f"{symbol}_{timestamp}.csv"
                 
-                if success and data is not None and not data.empty:
-                    # فیلتر کردن ستون‌ها
-                    available_columns = [col for col in selected_columns if col in data.columns]
-                    if available_columns:
-                        data = data[available_columns]
-                    else:
-                        self.log_download(f"هشدار: هیچ ستون انتخابی برای {symbol} موجود نیست")
-                        available_columns = [col for col in data.columns if col in selected_columns]
-                        if available_columns:
-                            data = data[available_columns]
-                    
-                    # ذخیره فایل
-                    filename = f"{symbol}.csv"
-                    if self.add_timestamp_var.get():
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"{symbol}_{timestamp}.csv"
-                    
-                    filepath = os.path.join(output_dir, filename)
-                    
-                    try:
-                        data.to_csv(filepath, index=False, encoding='utf-8-sig')
-                        self.log_download(f"فایل {filename} ذخیره شد ({len(data)} ردیف)")
-                        successful_downloads += 1
-                    except Exception as e:
-                        self.log_download(f"خطا در ذخیره فایل {filename}: {str(e)}")
-                        failed_downloads.append(symbol)
-                else:
-                    error_msg = data if isinstance(data, str) else "داده‌ای دریافت نشد"
-                    self.log_download(f"خطا در دانلود داده {symbol}: {error_msg}")
-                    failed_downloads.append(symbol)
+                filepath = os.path.join(output_dir, filename)
+                with self.downloader.stage('file_write', symbol):
+                    self.downloader.write_csv(data, filepath)
+                return f"فایل {filename} ذخیره شد ({len(data)} ردیف)"
+            
+            # دریافت ← ترکیب ← انتخاب ستون‌ها ← نوشتن، با صف‌های محدود بین مراحل
+            from download_pipeline import DownloadPipeline
+            pipeline = DownloadPipeline(self.downloader, symbols_data, apply_adjustment,
+                                        columns=selected_columns, writer=write_csv)
+            # ثبت پیش از بررسی وضعیت: توقفی که همین حالا زده شده یکی از این دو را می‌بیند
+            self.download_pipeline = pipeline
+            if not self.is_downloading:
+                pipeline.stop()
+            
+            # نمادهای بدون کد داخلی هم در پیشرفت شمرده می‌شوند
+            for i, job in enumerate(pipeline.run(), len(failed_downloads) + 1):
+                # به‌روزرسانی وضعیت جاری
+                progress = (i / total_symbols) * 100
+                self.post_progress(progress, job.symbol, i, total_symbols)
                 
-                # تاخیر برای جلوگیری از محدودیت API
-                import time
-                time.sleep(0.1)
+                if job.success:
+                    self.log_download(job.message)
+                    successful_downloads += 1
+                else:
+                    self.log_download(f"خطا در دانلود داده {job.symbol}: {job.error}")
+                    failed_downloads.append(job.symbol)
+            
+            if not self.is_downloading:
+                self.log_download("دانلود توسط کاربر متوقف شد.")
+            
+            # شمارنده‌های کش، حذف ورودی‌های استفاده نشده و سقف حجم (در همین رشته، نه رشته UI)
+            self.downloader.maintain_cache()
             
             # پایان دانلود
-            self.root.after(0, self.download_finished, successful_downloads, failed_downloads)
+            self.post_ui(self.download_finished, successful_downloads, failed_downloads)
             
         except Exception as e:
-            self.root.after(0, self.download_error, str(e))
+            self.post_ui(self.download_error, str(e))
+        finally:
+            self.download_pipeline = None
     
     def update_progress(self, progress, symbol, current, total):
         """به‌روزرسانی نوار پیشرفت"""
@@ -1750,6 +1887,10 @@ class UIManager:
         if failed:
             self.log_download(f"نمادهای ناموفق: {', '.join(failed)}")
         
+        # جدول زمان مراحل دانلود
+        self.log_download(f"زمان مراحل دانلود:\n{self.downloader.format_stage_summary()}")
+        self.log_download(self.downloader.format_memory_cache_stats())
+        
         # ذخیره فایل‌های دلار و طلا
         output_dir = self.output_dir_var.get()
         currency_success, currency_message = self.downloader.save_currency_files(output_dir)
@@ -1781,25 +1922,31 @@ class UIManager:
         messagebox.showerror("خطا در دانلود", f"خطایی رخ داد:\n{error}")
     
     def stop_download(self):
-        """توقف دانلود"""
+        """توقف دانلود
+
+        خط لوله همین حالا متوقف می‌شود؛ دکمه شروع تا پایان رشته دانلود (download_finished
+        یا download_error) غیرفعال می‌ماند تا دو دانلود همزمان در یک فایل ننویسند.
+        """
         self.is_downloading = False
-        self.log_download("دانلود متوقف شد...")
+        pipeline = self.download_pipeline
+        if pipeline is not None:
+            pipeline.stop()
+        self.log_download("در حال توقف دانلود...")
         
-        # فعال کردن دکمه شروع
-        self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
     
     def clear_download_log(self):
         """پاک کردن لاگ دانلود"""
         self.log_text.delete(1.0, tk.END)
+        self.download_log_lines.clear()
         self.log_download("لاگ پاک شد.")
     
     def log_download(self, message):
-        """افزودن پیام به لاگ دانلود"""
+        """افزودن پیام به لاگ دانلود (قابل فراخوانی از رشته دانلود)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.log_text.update()
+        line = f"[{timestamp}] {message}"
+        self.download_log_lines.append(line)
+        self.post_log(self.log_text, line)
     
     def add_context_menu(self, widget):
         """افزودن منوی راست کلیک به ویجت"""
@@ -1852,11 +1999,46 @@ class UIManager:
             self.show_loading_page()
             
             def load_in_thread():
-                success, message = self.data_loader.fetch_data()
-                self.root.after(0, lambda: self.on_data_loaded(success, message))
+                self.data_loader.fetch_data(
+                    on_market_ready=lambda success, message: self.post_ui(
+                        self.on_data_loaded, success, message)
+                )
+                self.post_ui(self.on_external_data_loaded)
             
             threading.Thread(target=load_in_thread, daemon=True).start()
     
+    def toggle_watch(self):
+        """روشن/خاموش کردن حالت پایش (به‌روزرسانی افزایشی MarketWatch)"""
+        if self.watch_var.get():
+            interval = self.config.settings.get("watch_interval", 5)
+            self.data_loader.start_watch(
+                interval=interval,
+                on_update=lambda success, message: self.post_ui(self.on_watch_update, success, message)
+            )
+            self.log_download(f"پایش زنده بازار فعال شد (هر {interval} ثانیه)")
+        else:
+            # درخواست در جریان در پس‌زمینه تمام می‌شود؛ رشته UI منتظر نمی‌ماند
+            self.data_loader.stop_watch(timeout=0)
+            self.log_download("پایش زنده بازار متوقف شد")
+    
+    def on_watch_update(self, success, message):
+        """پس از هر به‌روزرسانی افزایشی: تازه کردن مظنه‌های لیست نمادها"""
+        if not success:
+            self.log_download(f"به‌روزرسانی پایش ناموفق: {message}")
+            return
+        
+        if self.current_page != 3 or not self.symbol_inscodes:
+            return
+        
+        # فقط خانه‌های تغییر کرده (هر فراخوانی set یک دستور Tk است)
+        quotes = self.data_loader.get_top_of_book_columns(self.symbol_inscodes)
+        for idx, (bid, ask) in enumerate(zip(quotes['قیمت_خرید'], quotes['قیمت_فروش'])):
+            iid = str(idx)
+            values = self.symbol_tree.item(iid, "values")
+            if str(values[6]) != str(bid) or str(values[7]) != str(ask):
+                self.symbol_tree.set(iid, "bid", bid)
+                self.symbol_tree.set(iid, "ask", ask)
+    
     def show_settings(self):
         """نمایش تنظیمات"""
         dialog = tk.Toplevel(self.root)
@@ -2031,9 +2213,7 @@ class UIManager:
             results = []
             
             for name, url in apis:
-                result_text.insert(tk.END, f"در حال بررسی {name}...\n")
-                result_text.see(tk.END)
-                dialog.update()
+                self.post_log(result_text, f"در حال بررسی {name}...")
                 
                 try:
                     start_time = time.time()
@@ -2050,7 +2230,13 @@ class UIManager:
                 
                 time.sleep(0.5)
             
-            # نمایش نتایج
+            # نمایش نتایج در رشته اصلی
+            self.post_ui(show_results, results)
+        
+        def show_results(results):
+            if not dialog.winfo_exists():
+                return
+            
             result_text.delete(1.0, tk.END)
             result_text.insert(1.0, "\n".join(results))
             
@@ -2066,23 +2252,91 @@ class UIManager:
                   command=dialog.destroy).pack(pady=(10, 0))
     
     def clear_cache(self):
-        """پاک کردن حافظه کش"""
+        """پاک کردن فایل‌های کش پاسخ‌ها و کش حافظه (تنظیمات، لاگ و snapshot بازار حفظ می‌شوند)"""
+        if self.is_downloading:
+            messagebox.showwarning("پاک کردن کش", "در حین دانلود نمی‌توان کش را پاک کرد.")
+            return
+        
         if messagebox.askyesno("پاک کردن کش", 
                              "آیا می‌خواهید حافظه کش برنامه پاک شود؟"):
-            # پاک کردن داده‌های بارگذاری شده
-            self.data_loader.raw_data = None
-            self.data_loader.filtered_data = None
+            removed, freed = self.downloader.clear_cache()
+            messagebox.showinfo("موفق", f"حافظه کش پاک شد ({removed} فایل، {freed / 1024 / 1024:.1f} MB).")
+    
+    def show_cache_stats(self):
+        """نمایش آمار کش به تفکیک نقطه: تعداد، حجم، نرخ hit و عمر داده‌ها"""
+        from cache_store import AGE_BUCKETS
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("آمار کش")
+        dialog.geometry("900x360")
+        
+        main_frame = ttk.Frame(dialog, padding=10)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # دانلودر (بارگذاری تنبل) در رشته UI ساخته می‌شود
+        downloader = self.downloader
+        
+        age_labels = [label for label, _ in AGE_BUCKETS]
+        columns = ("endpoint", "entries", "size", "hit_rate", "memory", "disk", "stale", "miss",
+                   "revalidated") + tuple(age_labels)
+        headings = ("نقطه", "تعداد", "حجم (MB)", "نرخ hit", "حافظه", "دیسک", "منقضی", "miss",
+                    "304") + tuple(age_labels)
+        
+        tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=8)
+        for column, heading in zip(columns, headings):
+            tree.heading(column, text=heading)
+            tree.column(column, width=110 if column == "endpoint" else 65, anchor=tk.CENTER)
+        tree.pack(fill=tk.BOTH, expand=True)
+        
+        summary_label = ttk.Label(main_frame, text="در حال خواندن پوشه کش...")
+        summary_label.pack(fill=tk.X, pady=(10, 0))
+        
+        def show_stats(stats):
+            if not dialog.winfo_exists():
+                return
             
-            # پاک کردن فایل‌های موقت
-            temp_files = ["tsetmc_config.json", "error.log"]
-            for file in temp_files:
-                if os.path.exists(file):
-                    try:
-                        os.remove(file)
-                    except:
-                        pass
+            tree.delete(*tree.get_children())
+            rows = list(stats['endpoints'].items()) + [("مجموع", stats['total'])]
+            for endpoint, row in rows:
+                tree.insert("", tk.END, values=(
+                    endpoint, row['entries'], f"{row['bytes'] / 1024 / 1024:.2f}",
+                    f"{row['hit_rate'] * 100:.0f}%", row['memory'], row['disk'], row['stale'],
+                    row['miss'], row['revalidated']
+                ) + tuple(row['ages'][label] for label in age_labels))
             
-            messagebox.showinfo("موفق", "حافظه کش پاک شد.")
+            limit = f"{stats['max_bytes'] / 1024 / 1024:.0f} MB" if stats['max_bytes'] else "بدون سقف"
+            summary_label.config(text=f"حجم کل: {stats['total']['bytes'] / 1024 / 1024:.1f} MB از {limit} - "
+                                      f"حذف شده در این اجرا: {stats['evicted']} فایل")
+        
+        def refresh(action=None):
+            """خواندن آمار (و اجرای action) در رشته جداگانه؛ پیمایش پوشه کش ممکن است طول بکشد"""
+            def worker():
+                try:
+                    if action is not None:
+                        action()
+                    self.post_ui(show_stats, downloader.cache_manager.stats())
+                except Exception as e:
+                    self.post_ui(messagebox.showerror, "خطا", f"خطا در خواندن آمار کش: {str(e)}")
+            
+            threading.Thread(target=worker, daemon=True).start()
+        
+        def clear():
+            if self.is_downloading:
+                messagebox.showwarning("پاک کردن کش", "در حین دانلود نمی‌توان کش را پاک کرد.")
+                return
+            if messagebox.askyesno("پاک کردن کش", "همه فایل‌های کش پاک شوند؟", parent=dialog):
+                refresh(downloader.clear_cache)
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        ttk.Button(button_frame, text="به‌روزرسانی", command=refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="اعمال سقف حجم",
+                   command=lambda: refresh(downloader.cache_manager.enforce_limit)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="پاک کردن کش", command=clear).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="بستن", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        
+        refresh()
     
     def show_log(self):
         """نمایش لاگ"""
@@ -2111,23 +2365,63 @@ class UIManager:
         download_log_text = scrolledtext.ScrolledText(download_log_frame, wrap=tk.WORD)
         download_log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        # بارگذاری لاگ‌ها
+        # وضعیت صفحه‌بندی لاگ برنامه: فایل و موقعیت بایتی ابتدای بخش نمایش داده شده
+        log_state = {'path': None, 'start': 0}
+        
+        # بارگذاری لاگ‌ها (فقط انتهای فایل)
         def load_logs():
             # لاگ برنامه
-            log_content = self.get_log_content()
-            app_log_text.insert(1.0, log_content or "فایل لاگی یافت نشد")
-            self.add_context_menu(app_log_text)
+            app_log_text.delete(1.0, tk.END)
+            log_state['path'] = latest_log_file()
+            log_state['start'] = 0
+            if log_state['path'] is None:
+                app_log_text.insert(1.0, "فایل لاگی یافت نشد")
+            else:
+                try:
+                    lines, log_state['start'] = read_log_tail(log_state['path'], self.LOG_PAGE_LINES)
+                    app_log_text.insert(1.0, "\n".join(lines))
+                    app_log_text.see(tk.END)
+                except Exception as e:
+                    app_log_text.insert(1.0, f"خطا در خواندن لاگ: {str(e)}")
+            update_older_button()
             
             # لاگ دانلود
-            download_log_text.insert(1.0, self.log_text.get(1.0, tk.END))
-            self.add_context_menu(download_log_text)
+            download_log_text.delete(1.0, tk.END)
+            download_log_text.insert(1.0, "\n".join(self.download_log_lines))
         
-        load_logs()
+        def load_older_logs():
+            """افزودن صفحه قبلی فایل لاگ به بالای نمایش"""
+            if log_state['path'] is None or log_state['start'] <= 0:
+                return
+            try:
+                lines, log_state['start'] = read_log_tail(
+                    log_state['path'], self.LOG_PAGE_LINES, end=log_state['start'])
+            except Exception as e:
+                messagebox.showerror("خطا", f"خطا در خواندن لاگ: {str(e)}")
+                return
+            
+            if lines:
+                app_log_text.insert(1.0, "\n".join(lines) + "\n")
+                # بافر نمایش محدود می‌ماند: با رفتن به عقب، انتهایی‌ترین خطوط حذف می‌شوند
+                self.trim_text_widget(app_log_text, from_end=True)
+                app_log_text.see(1.0)
+            update_older_button()
+        
+        def update_older_button():
+            older_btn.config(state=tk.NORMAL if log_state['start'] > 0 else tk.DISABLED)
+        
+        self.add_context_menu(app_log_text)
+        self.add_context_menu(download_log_text)
         
         # دکمه‌ها
         btn_frame = ttk.Frame(main_frame)
         btn_frame.pack(pady=(10, 0))
         
+        older_btn = ttk.Button(btn_frame, 
+                              text="لاگ‌های قدیمی‌تر", 
+                              command=load_older_logs)
+        older_btn.pack(side=tk.LEFT, padx=5)
+        
         ttk.Button(btn_frame, 
                   text="بارگذاری مجدد", 
                   command=load_logs).pack(side=tk.LEFT, padx=5)
@@ -2139,21 +2433,22 @@ class UIManager:
         ttk.Button(btn_frame, 
                   text="بستن", 
                   command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        
+        load_logs()
     
-    def get_log_content(self):
-        """دریافت محتوای لاگ"""
+    def get_log_content(self, max_lines=None):
+        """دریافت خطوط پایانی آخرین فایل لاگ"""
         log_dir = "logs"
         if not os.path.exists(log_dir):
             return "پوشه لاگ وجود ندارد"
         
         try:
-            log_files = sorted([f for f in os.listdir(log_dir) if f.endswith('.log')], reverse=True)
-            if not log_files:
+            latest_log = latest_log_file(log_dir)
+            if latest_log is None:
                 return "فایل لاگی یافت نشد"
             
-            latest_log = os.path.join(log_dir, log_files[0])
-            with open(latest_log, 'r', encoding='utf-8') as f:
-                return f.read()
+            lines, _ = read_log_tail(latest_log, max_lines or self.LOG_VIEW_MAX_LINES)
+            return "\n".join(lines)
         except Exception as e:
             return f"خطا در خواندن لاگ: {str(e)}"
     
@@ -2182,7 +2477,8 @@ class UIManager:
             if os.path.exists(log_dir):
                 try:
                     for file in os.listdir(log_dir):
-                        if file.endswith('.log'):
+                        # شامل فایل‌های چرخش‌یافته (مثل .log.1)
+                        if file.endswith('.log') or '.log.' in file:
                             os.remove(os.path.join(log_dir, file))
                     messagebox.showinfo("موفق", "لاگ‌ها پاک شدند.")
                 except Exception as e:
@@ -2190,11 +2486,14 @@ class UIManager:
             else:
                 messagebox.showinfo("اطلاع", "پوشه لاگ وجود ندارد.")
     
-    def enable_debug_log(self):
-        """فعال‌سازی لاگ سطح بالا"""
-        import logging
-        logging.getLogger().setLevel(logging.DEBUG)
-        messagebox.showinfo("لاگ سطح بالا", "لاگ سطح بالا فعال شد.")
+    def toggle_debug_log(self):
+        """روشن/خاموش کردن لاگ سطح بالا فقط برای همین اجرا (تنظیم ذخیره شده تغییر نمی‌کند)"""
+        if self.debug_log_var.get():
+            self.config.set_log_level("DEBUG", save=False)
+            messagebox.showinfo("لاگ سطح بالا", "لاگ سطح بالا تا بستن برنامه فعال شد.")
+        else:
+            self.config.set_log_level(self.config.settings.get("log_level", "INFO"), save=False)
+            messagebox.showinfo("لاگ سطح بالا", "لاگ به سطح عادی برگشت.")
     
     def show_help(self):
         """نمایش راهنما"""